@@ -0,0 +1,152 @@
+##
+# Copyright 2022
+#
+# @file memory.py
+# @author xkrato61 Pavel Kratochvil
+#
+# @brief Measures memory used by interpret.py per loaded instruction and per frame of a recursive call
+#
+##
+
+import argparse
+import gc
+import importlib.util
+import io
+import json
+import os
+import sys
+import tracemalloc
+
+DEFAULT_INTERPRET = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'interpret.py')
+
+
+def import_interpret(path: str, module_name: str):
+    """Imports interpret.py from given path under given module name"""
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def program_api(path: str):
+    """Finds out from the source of interpret.py which parts of the embedding API it has
+
+    Versions without Program.load and Program.run parse arguments and run when they are imported, so they
+    are never imported to find out.
+    """
+    with open(path) as f:
+        source = f.read()
+    return {
+        'program': 'def load(cls' in source and 'def run(self, input_source' in source,
+        'stats': 'class ExecutionStats' in source,
+    }
+
+
+def to_xml(lines: list):
+    """Builds source XML of given [(opcode, [(type, text), ...]), ...] instructions"""
+    out = ['<?xml version="1.0" encoding="UTF-8"?>', '<program language="IPPcode22">']
+    for order, (opcode, args) in enumerate(lines, 1):
+        out.append(f'<instruction order="{order}" opcode="{opcode}">')
+        out.extend(f'<arg{number} type="{kind}">{text}</arg{number}>' for number, (kind, text) in enumerate(args, 1))
+        out.append('</instruction>')
+    out.append('</program>')
+    return '\n'.join(out).encode()
+
+
+def straight_program(count: int):
+    """Program of count instructions with distinct operands, so that no operand is shared"""
+    lines = [('DEFVAR', [('var', 'GF@a')]), ('DEFVAR', [('var', 'GF@b')])]
+    while len(lines) < count:
+        number = len(lines)
+        lines.append(('MOVE', [('var', 'GF@a'), ('int', str(number))]))
+        lines.append(('ADD', [('var', 'GF@b'), ('var', 'GF@a'), ('int', str(number + 1))]))
+        lines.append(('CONCAT', [('var', 'GF@a'), ('string', f's{number}'), ('string', f't{number}')]))
+    return to_xml(lines[:count])
+
+
+def recursive_program(depth: int):
+    """Program which recurses to given depth, every level has its own frame with one variable"""
+    return to_xml([
+        ('DEFVAR', [('var', 'GF@n')]),
+        ('MOVE', [('var', 'GF@n'), ('int', str(depth))]),
+        ('CALL', [('label', 'f')]),
+        ('EXIT', [('int', '0')]),
+        ('LABEL', [('label', 'f')]),
+        ('CREATEFRAME', []),
+        ('PUSHFRAME', []),
+        ('DEFVAR', [('var', 'LF@x')]),
+        ('MOVE', [('var', 'LF@x'), ('var', 'GF@n')]),
+        ('SUB', [('var', 'GF@n'), ('var', 'GF@n'), ('int', '1')]),
+        ('JUMPIFEQ', [('label', 'end'), ('var', 'GF@n'), ('int', '0')]),
+        ('CALL', [('label', 'f')]),
+        ('LABEL', [('label', 'end')]),
+        ('POPFRAME', []),
+        ('RETURN', []),
+    ])
+
+
+def bytes_per_instruction(interpret, count: int):
+    """Memory held by a loaded program divided by the number of its instructions"""
+    source = straight_program(count)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    program = interpret.Program.load(source)
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del program
+    return (after - before) / count
+
+
+def peak_of_run(interpret, source: bytes):
+    program = interpret.Program.load(source)
+    gc.collect()
+    tracemalloc.start()
+    program.run(io.StringIO(), io.StringIO(), io.StringIO())
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def bytes_per_frame(interpret, depth: int):
+    """Difference of peak memory of a deep and a shallow recursion divided by the difference of depths"""
+    shallow = depth // 10
+    return (peak_of_run(interpret, recursive_program(depth)) -
+            peak_of_run(interpret, recursive_program(shallow))) / (depth - shallow)
+
+
+def parse_input_arguments():
+    """Parses and checks input arguments, returns them as a dictionary"""
+    parser = argparse.ArgumentParser(description='Measures memory used by interpret.py.')
+    parser.add_argument('interprets', nargs='*', default=[DEFAULT_INTERPRET],
+                        help='paths to interpret.py versions to compare, defaults to the one in this repository')
+    parser.add_argument('--instructions', type=int, default=100000, help='number of loaded instructions')
+    parser.add_argument('--depth', type=int, default=20000, help='depth of recursion')
+    arguments = vars(parser.parse_args())
+    if arguments['instructions'] < 1 or arguments['depth'] < 10:
+        parser.error('too small instruction count or depth')
+    return arguments
+
+
+def main():
+    arguments = parse_input_arguments()
+    results = []
+    for number, path in enumerate(arguments['interprets']):
+        if not program_api(path)['program']:
+            results.append({'interpret': path, 'error': 'interpret.py has no Program.load and Program.run, '
+                                                        'its memory can not be measured'})
+            continue
+        interpret = import_interpret(path, f'interpret_{number}')
+        results.append({
+            'interpret': path,
+            'bytes_per_instruction': round(bytes_per_instruction(interpret, arguments['instructions']), 1),
+            'bytes_per_frame': round(bytes_per_frame(interpret, arguments['depth']), 1),
+        })
+    json.dump(results, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,330 @@
+##
+# Copyright 2022
+#
+# @file suite.py
+# @author xkrato61 Pavel Kratochvil
+#
+# @brief Generates benchmark programs for the hot paths of interpret.py and measures instructions per second,
+# load time and peak RSS of one or more versions of interpret.py
+#
+##
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from memory import DEFAULT_INTERPRET, import_interpret, program_api, to_xml
+
+# number of variables in the frame of the frames benchmark
+FRAME_VARIABLES = 1000
+# number of recursions of the recursion benchmark
+RECURSIONS = 5
+
+
+def loop_program(size: int):
+    """Tight integer loop of size iterations"""
+    return to_xml([
+        ('DEFVAR', [('var', 'GF@i')]),
+        ('DEFVAR', [('var', 'GF@c')]),
+        ('MOVE', [('var', 'GF@i'), ('int', '0')]),
+        ('LABEL', [('label', 'loop')]),
+        ('ADD', [('var', 'GF@i'), ('var', 'GF@i'), ('int', '1')]),
+        ('LT', [('var', 'GF@c'), ('var', 'GF@i'), ('int', str(size))]),
+        ('JUMPIFEQ', [('label', 'loop'), ('var', 'GF@c'), ('bool', 'true')]),
+        ('WRITE', [('var', 'GF@i')]),
+    ]), ''
+
+
+def frames_program(size: int):
+    """Loop of size iterations, every one of them updates 16 of FRAME_VARIABLES variables of a local frame"""
+    lines = [('CREATEFRAME', []), ('PUSHFRAME', [])]
+    for number in range(FRAME_VARIABLES):
+        lines.append(('DEFVAR', [('var', f'LF@v{number}')]))
+        lines.append(('MOVE', [('var', f'LF@v{number}'), ('int', str(number))]))
+    lines += [
+        ('DEFVAR', [('var', 'LF@i')]),
+        ('DEFVAR', [('var', 'LF@c')]),
+        ('MOVE', [('var', 'LF@i'), ('int', '0')]),
+        ('LABEL', [('label', 'loop')]),
+    ]
+    for number in range(16):
+        # variables spread over the whole frame
+        dest, source = number * 61 % FRAME_VARIABLES, number * 97 % FRAME_VARIABLES
+        lines.append(('ADD', [('var', f'LF@v{dest}'), ('var', f'LF@v{source}'), ('int', '1')]))
+    lines += [
+        ('ADD', [('var', 'LF@i'), ('var', 'LF@i'), ('int', '1')]),
+        ('LT', [('var', 'LF@c'), ('var', 'LF@i'), ('int', str(size))]),
+        ('JUMPIFEQ', [('label', 'loop'), ('var', 'LF@c'), ('bool', 'true')]),
+        ('WRITE', [('var', 'LF@v0')]),
+    ]
+    return to_xml(lines), ''
+
+
+def recursion_program(size: int):
+    """RECURSIONS recursive sums of numbers up to size, every level has its own frame"""
+    return to_xml([
+        ('DEFVAR', [('var', 'GF@r')]),
+        ('DEFVAR', [('var', 'GF@k')]),
+        ('MOVE', [('var', 'GF@k'), ('int', '0')]),
+        ('LABEL', [('label', 'again')]),
+        ('CREATEFRAME', []),
+        ('DEFVAR', [('var', 'TF@n')]),
+        ('MOVE', [('var', 'TF@n'), ('int', str(size))]),
+        ('CALL', [('label', 'sum')]),
+        ('MOVE', [('var', 'GF@r'), ('var', 'TF@ret')]),
+        ('ADD', [('var', 'GF@k'), ('var', 'GF@k'), ('int', '1')]),
+        ('JUMPIFNEQ', [('label', 'again'), ('var', 'GF@k'), ('int', str(RECURSIONS))]),
+        ('WRITE', [('var', 'GF@r')]),
+        ('EXIT', [('int', '0')]),
+        ('LABEL', [('label', 'sum')]),
+        ('PUSHFRAME', []),
+        ('DEFVAR', [('var', 'LF@ret')]),
+        ('JUMPIFEQ', [('label', 'base'), ('var', 'LF@n'), ('int', '0')]),
+        ('CREATEFRAME', []),
+        ('DEFVAR', [('var', 'TF@n')]),
+        ('SUB', [('var', 'TF@n'), ('var', 'LF@n'), ('int', '1')]),
+        ('CALL', [('label', 'sum')]),
+        ('ADD', [('var', 'LF@ret'), ('var', 'LF@n'), ('var', 'TF@ret')]),
+        ('POPFRAME', []),
+        ('RETURN', []),
+        ('LABEL', [('label', 'base')]),
+        ('MOVE', [('var', 'LF@ret'), ('int', '0')]),
+        ('POPFRAME', []),
+        ('RETURN', []),
+    ]), ''
+
+
+def strings_program(size: int):
+    """Builds string of size characters one by one with CONCAT and then rewrites all of them with SETCHAR"""
+    return to_xml([
+        ('DEFVAR', [('var', 'GF@s')]),
+        ('DEFVAR', [('var', 'GF@i')]),
+        ('DEFVAR', [('var', 'GF@c')]),
+        ('MOVE', [('var', 'GF@s'), ('string', '')]),
+        ('MOVE', [('var', 'GF@i'), ('int', '0')]),
+        ('LABEL', [('label', 'build')]),
+        ('CONCAT', [('var', 'GF@s'), ('var', 'GF@s'), ('string', 'a')]),
+        ('ADD', [('var', 'GF@i'), ('var', 'GF@i'), ('int', '1')]),
+        ('JUMPIFNEQ', [('label', 'build'), ('var', 'GF@i'), ('int', str(size))]),
+        ('MOVE', [('var', 'GF@i'), ('int', '0')]),
+        ('LABEL', [('label', 'edit')]),
+        ('SETCHAR', [('var', 'GF@s'), ('var', 'GF@i'), ('string', 'b')]),
+        ('ADD', [('var', 'GF@i'), ('var', 'GF@i'), ('int', '1')]),
+        ('JUMPIFNEQ', [('label', 'edit'), ('var', 'GF@i'), ('int', str(size))]),
+        ('STRLEN', [('var', 'GF@c'), ('var', 'GF@s')]),
+        ('WRITE', [('var', 'GF@c')]),
+    ]), ''
+
+
+def write_program(size: int):
+    """Writes size lines, each of them by two WRITEs"""
+    return to_xml([
+        ('DEFVAR', [('var', 'GF@i')]),
+        ('MOVE', [('var', 'GF@i'), ('int', '0')]),
+        ('LABEL', [('label', 'loop')]),
+        ('WRITE', [('var', 'GF@i')]),
+        ('WRITE', [('string', '\\032line\\010')]),
+        ('ADD', [('var', 'GF@i'), ('var', 'GF@i'), ('int', '1')]),
+        ('JUMPIFNEQ', [('label', 'loop'), ('var', 'GF@i'), ('int', str(size))]),
+    ]), ''
+
+
+def read_program(size: int):
+    """Reads input of size lines, numbers and words in turn, until its end and sums the numbers"""
+    source = to_xml([
+        ('DEFVAR', [('var', 'GF@x')]),
+        ('DEFVAR', [('var', 'GF@s')]),
+        ('DEFVAR', [('var', 'GF@t')]),
+        ('DEFVAR', [('var', 'GF@sum')]),
+        ('MOVE', [('var', 'GF@sum'), ('int', '0')]),
+        ('LABEL', [('label', 'loop')]),
+        ('READ', [('var', 'GF@x'), ('type', 'int')]),
+        ('TYPE', [('var', 'GF@t'), ('var', 'GF@x')]),
+        ('JUMPIFEQ', [('label', 'end'), ('var', 'GF@t'), ('string', 'nil')]),
+        ('ADD', [('var', 'GF@sum'), ('var', 'GF@sum'), ('var', 'GF@x')]),
+        ('READ', [('var', 'GF@s'), ('type', 'string')]),
+        ('JUMP', [('label', 'loop')]),
+        ('LABEL', [('label', 'end')]),
+        ('WRITE', [('var', 'GF@sum')]),
+    ])
+    return source, ''.join(f'{number}\nword{number}\n' for number in range(size // 2))
+
+
+# {name: (generator, default size), ...}, default sizes take about a second each
+BENCHMARKS = {
+    'loop': (loop_program, 300000),
+    'frames': (frames_program, 20000),
+    'recursion': (recursion_program, 20000),
+    'strings': (strings_program, 150000),
+    'write': (write_program, 150000),
+    'read': (read_program, 200000),
+}
+
+
+def write_programs(directory: str, scale: float, names: list):
+    """Writes generated programs as tests (.src, .in) to directory, returns {name: (size, path_to_test), ...}"""
+    os.makedirs(directory, exist_ok=True)
+    tests = {}
+    for name in names:
+        generator, default_size = BENCHMARKS[name]
+        size = max(1, int(default_size * scale))
+        source, input_text = generator(size)
+        path_to_test = os.path.join(directory, name)
+        with open(path_to_test + '.src', 'wb') as f:
+            f.write(source)
+        with open(path_to_test + '.in', 'w') as f:
+            f.write(input_text)
+        tests[name] = size, path_to_test
+    return tests
+
+
+def run_worker(interpret_path: str, path_to_test: str, count: bool):
+    """Loads and runs one test with imported interpret.py and prints its times as JSON, executed instructions
+    are counted by ExecutionStats instead of measuring time if count is set"""
+    interpret = import_interpret(interpret_path, 'interpret')
+    with open(path_to_test + '.src', 'rb') as f:
+        source = f.read()
+    start = time.perf_counter()
+    program = interpret.Program.load(source)
+    load_time = time.perf_counter() - start
+    # versions older than ExecutionStats do not take stats at all
+    kwargs = {'stats': interpret.ExecutionStats()} if count else {}
+    with open(path_to_test + '.in') as input_file, open(os.devnull, 'w') as devnull:
+        start = time.perf_counter()
+        result = program.run(input_file, devnull, devnull, **kwargs)
+        run_time = time.perf_counter() - start
+    json.dump({
+        'exit_code': result.exit_code,
+        'load_time': load_time,
+        'run_time': run_time,
+        'instructions': kwargs['stats'].executed if count else None,
+    }, sys.stdout)
+
+
+def wait_for(process: subprocess.Popen):
+    """Waits for process, returns its exit code and peak RSS in kilobytes"""
+    # rusage of this very process, rusage of all children would keep the peak of the largest one
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return process.returncode, usage.ru_maxrss // 1024 if sys.platform == 'darwin' else usage.ru_maxrss
+
+
+def measure_cli(interpret_path: str, path_to_test: str):
+    """Runs interpret.py without Program API as a command and times the whole process, load time is unknown"""
+    command = [sys.executable, interpret_path, '--source=' + path_to_test + '.src',
+               '--input=' + path_to_test + '.in']
+    # versions which cache programs by default get an empty cache, so that every run loads its program
+    with tempfile.TemporaryDirectory() as cache_dir, open(os.devnull, 'w') as devnull:
+        start = time.perf_counter()
+        process = subprocess.Popen(command, stdout=devnull, stderr=devnull,
+                                   env=dict(os.environ, IPP_CACHE_DIR=cache_dir))
+        exit_code, peak_rss = wait_for(process)
+        run_time = time.perf_counter() - start
+    return {'exit_code': exit_code, 'load_time': None, 'run_time': run_time, 'peak_rss_kb': peak_rss}
+
+
+def measure(interpret_path: str, path_to_test: str, count: bool = False):
+    """Runs worker in a new process, returns its result with peak RSS of the process in kilobytes"""
+    command = [sys.executable, os.path.abspath(__file__), '--worker', path_to_test, interpret_path]
+    if count:
+        command.append('--count')
+    process = subprocess.Popen(command, stdout=subprocess.PIPE)
+    output = process.stdout.read()
+    process.stdout.close()
+    worker_code, peak_rss = wait_for(process)
+    if worker_code:
+        sys.exit(f'worker failed on {path_to_test}')
+    result = json.loads(output)
+    result['peak_rss_kb'] = peak_rss
+    return result
+
+
+def run_suite(interprets: list, tests: dict, repeat: int):
+    """Measures every test with every interpret.py, best of repeat runs is taken
+
+    Versions without Program API (older than the embedding API) are run as commands, their run time
+    includes start of the interpreter and loading of the program.
+    """
+    apis = {path: program_api(path) for path in interprets}
+    # executed instructions do not depend on interpret.py version, they are counted once by the first one
+    # which has ExecutionStats, instructions per second are unknown if none of them has it
+    counting = next((path for path in interprets if apis[path]['stats']), None)
+    counts = {name: measure(counting, path_to_test, count=True)['instructions'] if counting else None
+              for name, (_, path_to_test) in tests.items()}
+    results = []
+    for path in interprets:
+        run = measure if apis[path]['program'] else measure_cli
+        benchmarks = {}
+        for name, (size, path_to_test) in tests.items():
+            runs = [run(path, path_to_test) for _ in range(repeat)]
+            run_time = min(result['run_time'] for result in runs)
+            load_time = None if runs[0]['load_time'] is None else min(result['load_time'] for result in runs)
+            benchmarks[name] = {
+                'size': size,
+                'exit_code': runs[0]['exit_code'],
+                'instructions': counts[name],
+                'load_time': None if load_time is None else round(load_time, 6),
+                'run_time': round(run_time, 6),
+                'instructions_per_second': round(counts[name] / run_time) if counts[name] and run_time else None,
+                'peak_rss_kb': min(result['peak_rss_kb'] for result in runs),
+            }
+        results.append({'interpret': path, 'mode': 'import' if apis[path]['program'] else 'command',
+                        'benchmarks': benchmarks})
+    return results
+
+
+def parse_input_arguments():
+    """Parses and checks input arguments, returns them as a dictionary"""
+    parser = argparse.ArgumentParser(description='Measures instructions per second, load time and peak RSS '
+                                                 'of interpret.py on generated benchmark programs.')
+    parser.add_argument('interprets', nargs='*', default=[DEFAULT_INTERPRET],
+                        help='paths to interpret.py versions to compare, defaults to the one in this repository')
+    parser.add_argument('--benchmarks', nargs='+', choices=list(BENCHMARKS), default=list(BENCHMARKS),
+                        help='benchmarks to run, defaults to all of them')
+    parser.add_argument('--scale', type=float, default=1.0, help='multiplier of default sizes of benchmarks')
+    parser.add_argument('--repeat', type=int, default=3, help='number of runs of every benchmark, the best one '
+                                                              'is reported')
+    parser.add_argument('--write-programs', dest='write_programs', default=None,
+                        help='only write generated programs as tests (.src, .in) to given directory')
+    parser.add_argument('--output', default=None, help='write JSON results to file instead of stdout')
+    parser.add_argument('--worker', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--count', action='store_true', help=argparse.SUPPRESS)
+    arguments = vars(parser.parse_args())
+    if arguments['scale'] <= 0 or arguments['repeat'] < 1:
+        parser.error('too small scale or repeat')
+    return arguments
+
+
+def main():
+    arguments = parse_input_arguments()
+    if arguments['worker']:
+        run_worker(arguments['interprets'][0], arguments['worker'], arguments['count'])
+        return
+    if arguments['write_programs']:
+        write_programs(arguments['write_programs'], arguments['scale'], arguments['benchmarks'])
+        return
+    interprets = [os.path.abspath(path) for path in arguments['interprets']]
+    with tempfile.TemporaryDirectory() as directory:
+        tests = write_programs(directory, arguments['scale'], arguments['benchmarks'])
+        report = {
+            'python': platform.python_version(),
+            'scale': arguments['scale'],
+            'repeat': arguments['repeat'],
+            'results': run_suite(interprets, tests, arguments['repeat']),
+        }
+    text = json.dumps(report, indent=2) + '\n'
+    if arguments['output']:
+        with open(arguments['output'], 'w') as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
+
+
+if __name__ == '__main__':
+    main()
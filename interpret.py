@@ -10,9 +10,40 @@
 
 import xml.etree.ElementTree as eT
 import sys
+import os
+import io
 import argparse
+import array
+import collections
+import gc
+import hashlib
+import json
+import operator
+import pickle
+import re
+import signal
+import struct
+import tempfile
+import threading
+import time
+
+# version of the interpreter, part of the program cache key (cached programs of other versions are never used)
+__version__ = '1.6.0'
+
+# default directory of the program cache used by --cache, can be overridden with IPP_CACHE_DIR or --cache-dir
+CACHE_DIR = os.environ.get('IPP_CACHE_DIR') or os.path.join(os.path.expanduser('~'), '.cache', 'ipp-interpret')
+# total size of cached programs in bytes, least recently used entries are evicted above it
+CACHE_MAX_SIZE = 64 * 1024 * 1024
+# number of results of pure subroutine calls kept by --memoize
+MEMO_MAX_SIZE = 4096
+# formats of source programs, XML written by parse.php or IPPcode22 source text
+SOURCE_FORMATS = ('xml', 'ippcode')
 
 err_nums = {
+    11: "Input file can not be opened or is invalid.",
+    21: "Invalid header line.",
+    22: "Incorrect opcode.",
+    23: "Incorrect command parameters.",
     31: "Invalid XML format.",
     32: "Unexpected XML structure.",
     52: "Undefined label, or redefinition.",
@@ -21,48 +52,251 @@ err_nums = {
     55: "Empty local frame stack before POPFRAME command.",
     56: "Empty call/data stack.",
     57: "Runtime error. Division by zero or invalid return value of EXIT.",
-    58: "Invalid string operation(out of range)."
+    58: "Invalid string operation(out of range).",
+    # codes of exceeded limits of ExecutionBudget
+    60: "Step limit exceeded.",
+    61: "Time limit exceeded.",
+    62: "Data stack limit exceeded.",
+    63: "Call stack limit exceeded.",
+    64: "String length limit exceeded.",
 }
 
+
+class InterpretExit(Exception):
+    """InterpretExit exception
+
+    Ends loading or execution of a program with given exit code. Raised by exit_error and by EXIT,
+    message is empty for EXIT.
+    """
+    def __init__(self, code: int, message: str = ''):
+        super().__init__(code, message)
+        self.code = code
+        self.message = message
+
+
 def exit_error(err_number):
-    """Prints error message from err_nums dict to stderr and exits with given code"""
-    print(err_nums[err_number], file=sys.stderr)
-    sys.exit(err_number)
+    """Ends loading or execution with given code and error message from err_nums dict"""
+    raise InterpretExit(err_number, err_nums[err_number])
+
+
+class Nil:
+    """Nil class
+
+    Type of the only nil value NIL. Runtime values of other types are plain Python int, str and bool,
+    so the type of a value is its class and uninitialized variables hold None.
+    """
+    def __repr__(self):
+        return 'NIL'
+
+    def __reduce__(self):
+        # unpickled programs share the module singleton
+        return 'NIL'
+
+
+NIL = Nil()
+
+# strings shorter than this are appended to by CONCAT as str, longer ones are turned into StringBuffer
+STRING_BUFFER_MIN_LEN = 64
+
+# {class of runtime value: IPPcode22 type name, ...}
+TYPE_NAMES = {int: 'int', str: 'string', bool: 'bool', Nil: 'nil'}
+
+
+def value_to_str(value):
+    """Converts runtime value to its IPPcode22 text form"""
+    if value is True:
+        return 'true'
+    if value is False:
+        return 'false'
+    if value is NIL:
+        return 'nil'
+    return str(value)
+
+
+class StringBuffer:
+    """StringBuffer class
+
+    String of a variable edited in place by CONCAT and SETCHAR, so that building or editing a string of N
+    characters one by one takes O(N) instead of O(N^2). A buffer never leaves its variable, every other
+    read gets str made by materialize, which is cached until the next change.
+    """
+    __slots__ = ('chars', 'text')
+
+    def __init__(self, text: str):
+        self.chars = list(text)
+        self.text = text
+
+    def __len__(self):
+        return len(self.chars)
+
+    def __getitem__(self, index):
+        return self.chars[index]
+
+    def append(self, text: str):
+        self.chars.extend(text)
+        self.text = None
+
+    def set_char(self, index: int, char: str):
+        self.chars[index] = char
+        self.text = None
+
+    def materialize(self):
+        if self.text is None:
+            self.text = ''.join(self.chars)
+        return self.text
+
+
+class OutputBuffer:
+    """OutputBuffer class
+
+    Collects output of WRITE, DPRINT and BREAK and writes it to stdout or stderr in large batches.
+    Only one stream is buffered at a time, switching streams flushes the pending text first,
+    so relative order of stdout and stderr output is kept.
+    """
+    def __init__(self, stdout=None, stderr=None, limit=1 << 16):
+        self.streams = (stdout or sys.stdout, stderr or sys.stderr)
+        self.limit = limit
+        # pending text and its length, all of it belongs to self.streams[self.current]
+        self.chunks = []
+        self.size = 0
+        self.current = 0
+
+    def write(self, text: str):
+        """Buffers text for stdout"""
+        if self.current:
+            self.flush()
+            self.current = 0
+        self.chunks.append(text)
+        self.size += len(text)
+        if self.size >= self.limit:
+            self.flush()
+
+    def write_err(self, text: str):
+        """Buffers text for stderr"""
+        if not self.current:
+            self.flush()
+            self.current = 1
+        self.chunks.append(text)
+        self.size += len(text)
+        if self.size >= self.limit:
+            self.flush()
+
+    def flush(self):
+        """Writes all pending text to its stream"""
+        if self.chunks:
+            stream = self.streams[self.current]
+            stream.write(''.join(self.chunks))
+            stream.flush()
+            self.chunks = []
+            self.size = 0
+
+    def position(self):
+        """Flushes pending text and returns position in stdout, None if stdout can not seek"""
+        self.flush()
+        try:
+            return self.streams[0].tell() if self.streams[0].seekable() else None
+        except (OSError, ValueError):
+            return None
+
+    def restore(self, position):
+        """Drops stdout written after position, so that output of a resumed run is not repeated
+
+        Nothing is dropped if stdout can not seek or if it is shorter than position (e.g. truncated by the shell).
+        """
+        stream = self.streams[0]
+        try:
+            if position is not None and stream.seekable() and stream.seek(0, io.SEEK_END) >= position:
+                stream.seek(position)
+                stream.truncate()
+        except (OSError, ValueError):
+            pass
+
 
 class Stack:
     """Stack class
 
-    Used for data stack, call stack and frame stack during execution of code.
+    Used for frame stack during execution of code, values are stored directly in a list.
     """
+    __slots__ = ('stack',)
+
     def __init__(self):
         self.stack = []
-        self.stack_len = 0
 
-    def push_value(self, value_type: str, value):
-        self.stack.append([value_type, value])
-        self.stack_len += 1
+    @property
+    def stack_len(self):
+        return len(self.stack)
+
+    def push_value(self, value):
+        self.stack.append(value)
 
     def pop_value(self):
-        if self.stack_len != 0:
-            self.stack_len -= 1
-            return self.stack.pop()
-        else:
+        if not self.stack:
             exit_error(55)
+        return self.stack.pop()
 
     def is_empty(self):
-        return not self.stack_len
+        return not self.stack
 
     def top(self):
-        if len(self.stack) == 1:
-            return self.stack[0]
         return self.stack[-1]
 
 
+class CallStack(Stack):
+    """CallStack class
+
+    Stack of return addresses, stored as machine integers in an array.
+    """
+    __slots__ = ()
+
+    def __init__(self):
+        self.stack = array.array('q')
+
+
+class DataStack:
+    """DataStack class
+
+    Data stack used by PUSHS, POPS and instructions of the STACK extension. Runtime values carry their
+    type, so they are kept in a plain list and no container is allocated for a pushed value.
+    """
+    __slots__ = ('values',)
+
+    def __init__(self):
+        self.values = []
+
+    @property
+    def stack_len(self):
+        return len(self.values)
+
+    def push_value(self, value):
+        self.values.append(value)
+
+    def pop_value(self):
+        if not self.values:
+            exit_error(56)
+        return self.values.pop()
+
+    def pop_two(self):
+        """Pops two values, returns (value1, value2) where the second one was on the top"""
+        values = self.values
+        if len(values) < 2:
+            exit_error(56)
+        value2 = values.pop()
+        return values.pop(), value2
+
+    def is_empty(self):
+        return not self.values
+
+    def clear(self):
+        self.values.clear()
+
+
 class Instruction:
     """Instruction class
 
     Used for saving opcode blocks loaded from XML file and linking arguments to instructions.
     """
+    __slots__ = ('inst_opcode', 'order', 'args')
+
     def __init__(self, inst_opcode, order):
         self.inst_opcode = inst_opcode
         self.order = order
@@ -75,22 +309,23 @@ class Argument:
 
     Used for saving arguments of instruction.
     """
+    __slots__ = ('kind', 'value', 'name', 'frame', 'pure_name', 'arg_order')
+
     def __init__(self, kind, value=None, name=None, arg_order=None):
         # var | int | string | bool | label
         self.kind = kind
         self.value = value
         self.name = name
         self.frame = None
+        # key of variable in its frame, resolved once when the argument is loaded
+        self.pure_name = None
         self.arg_order = arg_order
         self.assign_frame()
 
     def assign_frame(self):
         if self.name is not None and self.kind == 'var':
             self.frame = self.name[:2]
-
-    def get_pure_name(self):
-        if self.name is not None and self.kind == 'var':
-            return self.name[3:]
+            self.pure_name = self.name[3:]
 
 
 class Variable:
@@ -98,74 +333,545 @@ class Variable:
 
     Used for storing runtime variables during execution of code.
     """
-    def __init__(self, name=None, type_v=None, initialized=False, value=None):
-        self.type_v = type_v
-        self.pure_name = None
+    __slots__ = ('name', 'value')
+
+    def __init__(self, name=None, value=None):
         self.name = name
-        self.initialized = initialized
+        # runtime value (int, str, bool or NIL), None until the variable is initialized
         self.value = value
 
-        self.assign_pure_name()
 
-    def assign_pure_name(self):
-        if self.name is not None:
-            self.pure_name = self.name[3:]
+class InputReader:
+    """InputReader class
 
+    Reads input of READ line by line from a file, a text stream or stdin. A file is opened when the run
+    starts and only consumed lines are decoded, so memory use does not depend on input size.
+    """
+    def __init__(self, source=None, output: OutputBuffer = None):
+        # None (stdin) | path | text stream
+        self.source = source
+        self.output = output
+        self.stream = None
+        self.interactive = False
+        # number of lines already consumed by READ
+        self.lines_read = 0
+
+    def open(self):
+        if self.stream is not None:
+            return
+        if self.source is None:
+            self.stream = sys.stdin
+            self.interactive = sys.stdin.isatty()
+        elif isinstance(self.source, (str, os.PathLike)):
+            try:
+                self.stream = open(self.source)
+            except OSError:
+                exit_error(11)
+        else:
+            self.stream = self.source
+
+    def read_line(self):
+        """Returns next line without line ending or None at the end of input"""
+        if self.stream is None:
+            self.open()
+        if self.interactive and self.output is not None:
+            # prompt written by the program must be visible before waiting for user
+            self.output.flush()
+        line = self.stream.readline()
+        if not line:
+            return None
+        self.lines_read += 1
+        # lines of given input are trimmed, lines typed on stdin lose only their line ending
+        return line.strip() if self.source is not None else line.rstrip('\n')
+
+    def position(self):
+        """Returns (number of read lines, position in input file or None for other sources)"""
+        if self.stream is None or not isinstance(self.source, (str, os.PathLike)):
+            return self.lines_read, None
+        return self.lines_read, self.stream.tell()
+
+    def restore(self, lines_read: int, offset):
+        """Continues reading where a previous run stopped, lines of streams without offset are skipped"""
+        self.open()
+        if offset is not None:
+            self.stream.seek(offset)
+        else:
+            for _ in range(lines_read):
+                if not self.stream.readline():
+                    break
+        self.lines_read = lines_read
+
+    def close(self):
+        """Closes input file opened by this reader"""
+        if self.stream is not None and isinstance(self.source, (str, os.PathLike)):
+            self.stream.close()
+
+
+# opcode classes used for time statistics
+OPCODE_CLASSES = {
+    'MOVE': 'frame', 'CREATEFRAME': 'frame', 'PUSHFRAME': 'frame', 'POPFRAME': 'frame', 'DEFVAR': 'frame',
+    'CALL': 'flow', 'RETURN': 'flow', 'LABEL': 'flow', 'JUMP': 'flow', 'JUMPIFEQ': 'flow', 'JUMPIFNEQ': 'flow',
+    'EXIT': 'flow',
+    'PUSHS': 'stack', 'POPS': 'stack',
+    'ADD': 'arithmetic', 'SUB': 'arithmetic', 'MUL': 'arithmetic', 'IDIV': 'arithmetic',
+    'LT': 'relational', 'GT': 'relational', 'EQ': 'relational',
+    'AND': 'boolean', 'OR': 'boolean', 'NOT': 'boolean',
+    'INT2CHAR': 'conversion', 'STRI2INT': 'conversion',
+    'READ': 'io', 'WRITE': 'io',
+    'CONCAT': 'string', 'STRLEN': 'string', 'GETCHAR': 'string', 'SETCHAR': 'string',
+    'TYPE': 'type',
+    'DPRINT': 'debug', 'BREAK': 'debug',
+    'CLEARS': 'stack', 'ADDS': 'stack', 'SUBS': 'stack', 'MULS': 'stack', 'IDIVS': 'stack', 'LTS': 'stack',
+    'GTS': 'stack', 'EQS': 'stack', 'ANDS': 'stack', 'ORS': 'stack', 'NOTS': 'stack', 'INT2CHARS': 'stack',
+    'STRI2INTS': 'stack', 'JUMPIFEQS': 'flow', 'JUMPIFNEQS': 'flow',
+}
 
-class Interpreter:
-    """Interpreter class
+# opcodes which never change number of initialized variables
+OPCODES_KEEPING_VARS = {'LABEL', 'JUMP', 'JUMPIFEQ', 'JUMPIFNEQ', 'CALL', 'RETURN', 'PUSHS', 'WRITE', 'DPRINT',
+                        'BREAK', 'EXIT', 'DEFVAR', 'PUSHFRAME', 'CLEARS', 'ADDS', 'SUBS', 'MULS', 'IDIVS', 'LTS',
+                        'GTS', 'EQS', 'ANDS', 'ORS', 'NOTS', 'INT2CHARS', 'STRI2INTS', 'JUMPIFEQS', 'JUMPIFNEQS'}
 
-    Main class of this script. Parses inputarguments and input XML file, saves
-    it to classes(Instruction, Argument), archives labels in code for later jumps,
-    creates and stores all runtime information during execution of IPPcode22.
-    """
 
-    # stores names for recurrence check
-    label_list = []
-    # stores order numbers for recurrence check
-    order_numbers = []
+class ExecutionStats:
+    """ExecutionStats class
 
+    Opt-in statistics of one run in the spirit of the STATI extension: executed instructions per opcode
+    and per order, time spent in every opcode class, peak depths of data, call and frame stacks and peak
+    number of initialized variables in all frames.
+    """
     def __init__(self):
-        # storing instructions in a ordered list is necessary during execution
-        self.instructions = []
+        self.executed = 0
+        self.opcode_counts = {}
+        self.order_counts = {}
+        self.class_times = {}
+        self.max_data_stack = 0
+        self.max_call_stack = 0
+        self.max_frame_stack = 0
+        self.max_initialized_vars = 0
+
+    def add_counts(self, instructions: list, counts: list, times: list):
+        """Aggregates per-instruction execution counts and times collected by the interpreter"""
+        for inst, count, spent in zip(instructions, counts, times):
+            if not count:
+                continue
+            opcode = inst.inst_opcode.upper()
+            op_class = OPCODE_CLASSES.get(opcode, 'other')
+            self.executed += count
+            self.opcode_counts[opcode] = self.opcode_counts.get(opcode, 0) + count
+            self.order_counts[inst.order] = self.order_counts.get(inst.order, 0) + count
+            self.class_times[op_class] = self.class_times.get(op_class, 0.0) + spent
+
+    def to_dict(self):
+        return {
+            'executed': self.executed,
+            'opcodes': dict(sorted(self.opcode_counts.items(), key=lambda item: -item[1])),
+            'orders': {str(order): count for order, count in sorted(self.order_counts.items())},
+            'class_times': {op_class: round(spent, 6) for op_class, spent in sorted(self.class_times.items())},
+            'max_data_stack': self.max_data_stack,
+            'max_call_stack': self.max_call_stack,
+            'max_frame_stack': self.max_frame_stack,
+            'max_initialized_vars': self.max_initialized_vars,
+        }
+
+    def write(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+            f.write('\n')
+
+
+class ExecutionBudget:
+    """ExecutionBudget class
+
+    Limits of one run, None for no limit. A run over its budget ends with the code of the exceeded limit:
+
+        60  max_steps          executed instructions, a fused sequence of instructions counts as one step
+        61  timeout            wall-clock time in seconds
+        62  max_data_stack     values on the data stack
+        63  max_call_stack     return addresses on the call stack
+        64  max_string_length  total length of strings in variables of all frames
+
+    Limits are checked once per check_interval instructions, so the checks do not slow down execution and
+    a limit may be exceeded for up to check_interval instructions. Strings are counted less often the more
+    variables there are, but every result of CONCAT is checked at once, because it may double a string.
+    """
+    def __init__(self, max_steps=None, timeout=None, max_data_stack=None, max_call_stack=None,
+                 max_string_length=None, check_interval=4096):
+        self.max_steps = max_steps
+        self.timeout = timeout
+        self.max_data_stack = max_data_stack
+        self.max_call_stack = max_call_stack
+        self.max_string_length = max_string_length
+        self.check_interval = check_interval
+
+
+class CallMemo:
+    """CallMemo class
+
+    Results of CALLs of pure subroutines found by CallAnalysis in one run, keyed by everything the subroutine
+    reads: values on the data stack it pops, its temporary frame and global variables. A result is the
+    temporary frame and the values on the data stack after RETURN. At most max_size results are kept, the
+    least recently used one is dropped first.
+    """
+    # key of a global variable which does not exist
+    missing = object()
+
+    def __init__(self, max_size=MEMO_MAX_SIZE):
+        self.max_size = max_size
+        self.results = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # [(depth of call stack inside the call, key, subroutine), ...] of calls whose result is stored by RETURN
+        self.pending = []
 
-        # variables for saving input arguments
-        self.source_file = None
-        self.source_is_file = False
-        self.input_file = None
-        self.input_is_file = False
-        self.input_file_is_opened = False
-        self.input_file_content = None
-        self.input_file_line_counter = 0
+    @staticmethod
+    def key_value(value):
+        """Hashable form of runtime value, bool values are told apart from equal int values"""
+        if type(value) is bool:
+            return bool, value
+        if type(value) is StringBuffer:
+            return value.materialize()
+        return value
+
+    def store(self, key: tuple, result: tuple):
+        self.results[key] = result
+        if len(self.results) > self.max_size:
+            self.results.popitem(last=False)
+            self.evictions += 1
+
+    def to_dict(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self.results),
+            'evictions': self.evictions,
+        }
+
+    def write(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+            f.write('\n')
+
+
+class Checkpoint:
+    """Checkpoint class
+
+    Snapshots of runtime state of a run written to path every interval steps (if given) and whenever the
+    process gets SIGUSR1. The state is checked for a snapshot once per check_interval steps. It is pickled
+    right away and written by a background thread to a temporary file which then replaces the previous
+    snapshot, so the run only waits for the pickling and the file always holds a complete snapshot. A failed
+    write keeps the previous snapshot.
+    """
+    def __init__(self, path: str, interval=None, check_interval=4096):
+        self.path = path
+        self.interval = interval
+        self.check_interval = check_interval
+        # a snapshot was requested by a signal
+        self.requested = False
+        self.writer = None
+        self.previous_handler = None
+
+    def request(self, signum=None, frame=None):
+        self.requested = True
+
+    def start(self):
+        """Takes a snapshot on SIGUSR1, signals can be handled only by the main thread"""
+        try:
+            self.previous_handler = signal.signal(signal.SIGUSR1, self.request)
+        except (AttributeError, ValueError):
+            self.previous_handler = None
+
+    def save(self, state: dict):
+        data = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+        self.requested = False
+        self.wait()
+        self.writer = threading.Thread(target=self.write, args=(data,))
+        self.writer.start()
+
+    def write(self, data: bytes):
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+
+    def wait(self):
+        if self.writer is not None:
+            self.writer.join()
+            self.writer = None
+
+    def close(self):
+        """Waits for the last snapshot and restores previous handler of SIGUSR1"""
+        self.wait()
+        if self.previous_handler is not None:
+            signal.signal(signal.SIGUSR1, self.previous_handler)
+            self.previous_handler = None
 
-        # {label_name: index_of_instruction, ...}
-        self.labels = {}
-        # stack of values
-        self.data_stack = Stack()
+    @staticmethod
+    def load(path: str):
+        """Returns state saved by save, raises InterpretExit if the file is not a snapshot"""
+        # the same as for the program cache, collector passes over unpickled objects would dominate load time
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            with open(path, 'rb') as f:
+                state = pickle.load(f)
+        except Exception:
+            state = None
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        if not isinstance(state, dict):
+            exit_error(11)
+        return state
+
+
+class TraceRecorder:
+    """TraceRecorder class
+
+    Binary log of executed instructions. The file starts with b'IPPT', length of a JSON header (opcode
+    names, label orders, jump opcodes, record format) and the header, followed by one record per executed instruction:
+    order, opcode id, flags and up to 255 bytes of resolved operands separated by \\x1f. With ring_size
+    set only the last ring_size records are kept in memory and written when the run ends.
+    Decoded by trace_decode.py.
+    """
+    magic = b'IPPT'
+    record_format = struct.Struct('<IBBB')
+    # flags of a record
+    JUMP = 1
+    END = 2
+
+    def __init__(self, path: str, ring_size: int = 0):
+        self.path = path
+        self.ring_size = ring_size
+        self.records = collections.deque(maxlen=ring_size) if ring_size else None
+        self.file = None
+        self.header = b''
+
+    def start(self, program):
+        """Builds header of given program, returns opcode id of every instruction"""
+        opcodes, opcode_ids = [], []
+        for inst in program.instructions:
+            opcode = inst.inst_opcode.upper()
+            if opcode not in opcodes:
+                opcodes.append(opcode)
+            opcode_ids.append(opcodes.index(opcode))
+        header = json.dumps({
+            'version': 1,
+            'record': self.record_format.format,
+            'opcodes': opcodes,
+            'labels': {label: program.instructions[index].order for label, index in program.labels.items()},
+            # opcodes which jump to their label operand, CALL returns and LABEL only marks a place
+            'jumps': sorted(opcode for opcode, kinds in Program.signatures.items()
+                            if kinds[:1] == ('label',) and opcode not in ('CALL', 'LABEL')),
+            'ring_size': self.ring_size,
+        }).encode()
+        self.header = self.magic + struct.pack('<I', len(header)) + header
+        if self.records is None:
+            self.file = open(self.path, 'wb', buffering=1 << 20)
+            self.file.write(self.header)
+        return opcode_ids
+
+    def emit(self, record: bytes):
+        if self.records is None:
+            self.file.write(record)
+        else:
+            self.records.append(record)
+
+    def close(self):
+        if self.records is not None:
+            with open(self.path, 'wb') as f:
+                f.write(self.header)
+                f.writelines(self.records)
+        elif self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class ProgramCache:
+    """ProgramCache class
+
+    On-disk cache of loaded programs (sorted instructions and linked labels) keyed by
+    a hash of the source XML and interpreter version. Entries are evicted least recently
+    used first once their total size exceeds max_size. Any cache failure is treated as a miss.
+    Cached entries are unpickled, so the directory is created private and a directory which
+    other users can write to is never used.
+    """
+    suffix = '.ippc'
+    # file with the total size of entries, it is updated by every store and recounted by evict
+    size_name = 'size'
 
-        # stack of call frames, basically just a stack of program counter integers
-        self.call_stack = Stack()
-        self.local_frame = Stack()
+    def __init__(self, directory=CACHE_DIR, max_size=CACHE_MAX_SIZE):
+        self.directory = directory
+        self.max_size = max_size
 
-        self.global_frame = []
+    @staticmethod
+    def source_key(source, source_format='xml'):
+        """Hashes source program (path or bytes) together with its format and interpreter version
+
+        Module name is hashed too, pickled classes of a script run differ from those of an imported module.
+        """
+        digest = hashlib.sha256(f'{__version__}:{__name__}:{source_format}'.encode())
+        if isinstance(source, bytes):
+            digest.update(source)
+        else:
+            with open(source, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(chunk)
+        return digest.hexdigest()
 
-        self.temp_frame = []
-        self.temp_frame_valid = False
+    def entry_path(self, key: str):
+        return os.path.join(self.directory, key + self.suffix)
 
-        self.inst_num = 0
-        self.xml_root = None
+    def trusted(self):
+        """Checks that the cache directory belongs to the current user and only they can write to it"""
+        try:
+            stat = os.stat(self.directory)
+        except OSError:
+            return False
+        if hasattr(os, 'getuid') and stat.st_uid != os.getuid():
+            return False
+        return not stat.st_mode & 0o022
+
+    def load(self, key: str):
+        """Returns (instructions, labels) of a cached program or None"""
+        if not self.trusted():
+            return None
+        path = self.entry_path(key)
+        # unpickling creates many objects at once, collector passes over them would dominate load time
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            with open(path, 'rb') as f:
+                instructions, labels = pickle.load(f)
+            # mark entry as recently used
+            os.utime(path)
+        except Exception:
+            return None
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        return instructions, labels
+
+    def store(self, key: str, instructions: list, labels: dict):
+        """Atomically writes program to the cache, old entries are evicted only if the cache is over max_size"""
+        try:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            if not self.trusted():
+                return
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump((instructions, labels), f, protocol=pickle.HIGHEST_PROTOCOL)
+                size = f.tell()
+            os.replace(tmp_path, self.entry_path(key))
+            total_size = self.read_size()
+            if total_size is None or total_size + size > self.max_size:
+                self.evict()
+            else:
+                self.write_size(total_size + size)
+        except OSError:
+            pass
 
-        self.parse_input_arguments()
-        self.parse_source()
-        self.check_root()
-        self.parse_element_tree()
-        self.sort_instructions()
-        self.find_labels()
-        self.execute_code()
+    def read_size(self):
+        """Returns total size of entries kept in the cache directory or None if it is not known"""
+        try:
+            with open(os.path.join(self.directory, self.size_name)) as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def write_size(self, total_size: int):
+        with open(os.path.join(self.directory, self.size_name), 'w') as f:
+            f.write(str(total_size))
+
+    def evict(self):
+        """Recounts entries and removes least recently used ones until the cache fits into max_size"""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(self.suffix):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total_size -= size
+        self.write_size(total_size)
 
-    @staticmethod
-    def print_help():
-        print("Usage: interpret.py [--help] {[--input=<input_file>] [--source=<source_file>]}")
+
+class Program:
+    """Program class
+
+    Loaded and validated IPPcode22 program. Parses input XML, saves it to classes (Instruction, Argument),
+    archives labels in code for later jumps and decodes instructions for execution. A program can be run
+    any number of times, every run gets its own Interpreter.
+    """
+    # {opcode: operand kinds, ...} of all instructions, symb is a variable or a constant
+    signatures = {
+        'MOVE': ('var', 'symb'), 'CREATEFRAME': (), 'PUSHFRAME': (), 'POPFRAME': (), 'DEFVAR': ('var',),
+        'CALL': ('label',), 'RETURN': (), 'PUSHS': ('symb',), 'POPS': ('var',),
+        'ADD': ('var', 'symb', 'symb'), 'SUB': ('var', 'symb', 'symb'), 'MUL': ('var', 'symb', 'symb'),
+        'IDIV': ('var', 'symb', 'symb'), 'LT': ('var', 'symb', 'symb'), 'GT': ('var', 'symb', 'symb'),
+        'EQ': ('var', 'symb', 'symb'), 'AND': ('var', 'symb', 'symb'), 'OR': ('var', 'symb', 'symb'),
+        'NOT': ('var', 'symb'), 'INT2CHAR': ('var', 'symb'), 'STRI2INT': ('var', 'symb', 'symb'),
+        'READ': ('var', 'type'), 'WRITE': ('symb',), 'CONCAT': ('var', 'symb', 'symb'), 'STRLEN': ('var', 'symb'),
+        'GETCHAR': ('var', 'symb', 'symb'), 'SETCHAR': ('var', 'symb', 'symb'), 'TYPE': ('var', 'symb'),
+        'LABEL': ('label',), 'JUMP': ('label',), 'JUMPIFEQ': ('label', 'symb', 'symb'),
+        'JUMPIFNEQ': ('label', 'symb', 'symb'), 'EXIT': ('symb',), 'DPRINT': ('symb',), 'BREAK': (),
+        'CLEARS': (), 'ADDS': (), 'SUBS': (), 'MULS': (), 'IDIVS': (), 'LTS': (), 'GTS': (), 'EQS': (),
+        'ANDS': (), 'ORS': (), 'NOTS': (), 'INT2CHARS': (), 'STRI2INTS': (),
+        'JUMPIFEQS': ('label',), 'JUMPIFNEQS': ('label',),
+    }
+    # name of a variable or a label, lexical rules of source text are the same as in parse.php
+    identifier = re.compile(r'[a-zA-Z_$&%*!?-][a-zA-Z0-9_$&%*!?-]*\Z')
+    # integer literals accepted by parse.php, decimal or hexadecimal
+    decimal = re.compile(r'[+-]?[0-9]+\Z')
+    hexadecimal = re.compile(r'0x[0-9a-fA-F]+\Z')
+    # backslash which does not start an escape sequence \ddd
+    invalid_escape = re.compile(r'\\(?![0-9]{3})')
+    escape = re.compile(r'\\([0-9]{3})')
+    # instructions after which a new basic block begins
+    block_terminators = {'JUMP', 'JUMPIFEQ', 'JUMPIFNEQ', 'JUMPIFEQS', 'JUMPIFNEQS', 'CALL', 'RETURN', 'EXIT'}
+
+    def __init__(self):
+        # storing instructions in a ordered list is necessary during execution
+        self.instructions = []
+        # stores order numbers for recurrence check
+        self.order_numbers = set()
+        # {(kind, value, name, arg_order): Argument, ...} for sharing equal operands between instructions
+        self.argument_pool = {}
+        # {label_name: index_of_instruction, ...}
+        self.labels = {}
+        self.xml_root = None
+        # [(handler, operands), ...] built from self.instructions by decode_instructions
+        self.code = []
+        # the same as self.code, but with hot sequences of instructions fused into one handler
+        self.fused_code = []
+        # [(pattern, order), ...] of fused sequences, pattern is like 'ADD+JUMPIFEQ'
+        self.fusions = []
+        # block functions generated by BlockCompiler for compiled runs, built by the first one
+        self.blocks = None
+        # indexes of instructions whose operands have the right types on every path, found by TypeAnalysis
+        self.unchecked = set()
+        # the same as self.fused_code, but with CALLs of pure subroutines memoized, built by the first memoized run
+        self.memo_code = None
+        # hash of instructions computed by fingerprint
+        self.digest = None
+
+    @classmethod
+    def parse_int(cls, text: str):
+        """Value of an integer literal accepted by parse.php (decimal or hexadecimal) or None"""
+        if cls.decimal.match(text):
+            return int(text)
+        if cls.hexadecimal.match(text):
+            return int(text, 16)
+        return None
 
     @staticmethod
     def check_int_in_str(string: str):
@@ -173,6 +879,136 @@ class Interpreter:
             return string[1:].isdigit()
         return string.isdigit()
 
+    @classmethod
+    def load(cls, source=None, use_cache=False, cache_dir=CACHE_DIR, optimize=False, source_format='xml'):
+        """Loads program from source given as a path, bytes, a binary stream or None for stdin
+
+        source_format is 'xml' for XML written by parse.php or 'ippcode' for IPPcode22 source text.
+
+        Sorted instructions and labels of paths and bytes are taken from the program cache if use_cache
+        is set, the program is optimized by Optimizer if optimize is set. Every instruction is verified and
+        every label resolved before the program can run, so invalid programs fail without any output. Raises
+        InterpretExit if the program is invalid.
+        """
+        program = cls()
+        cache = None
+        if use_cache and isinstance(source, (str, os.PathLike, bytes)):
+            cache = ProgramCache(cache_dir)
+            try:
+                key = cache.source_key(source, source_format)
+            except OSError:
+                exit_error(11)
+            cached = cache.load(key)
+            if cached is not None:
+                program.instructions, program.labels = cached
+                cache = None
+        if not program.instructions:
+            if source_format == 'ippcode':
+                program.parse_text(source)
+            else:
+                program.parse_source(source)
+            program.sort_instructions()
+            program.verify_instructions()
+            program.find_labels()
+            program.verify_labels()
+        if cache is not None:
+            cache.store(key, program.instructions, program.labels)
+        if optimize:
+            program.optimize()
+        program.decode_instructions()
+        return program
+
+    def optimize(self):
+        """Optimizes instructions in place and finds labels of the optimized program again"""
+        Optimizer(self).run()
+        self.labels = {}
+        self.find_labels()
+
+    @staticmethod
+    def encode_string(value: str):
+        """Escapes string constant back to the IPPcode22 form, the inverse of parse_argument"""
+        return ''.join(f'\\{ord(char):03d}' if ord(char) <= 32 or char in '#\\' else char for char in value)
+
+    def write_xml(self, path: str):
+        """Writes instructions as XML in the format of parse.php"""
+        root = eT.Element('program', language='IPPcode22')
+        for inst in self.instructions:
+            element = eT.SubElement(root, 'instruction', order=str(inst.order), opcode=inst.inst_opcode)
+            for arg in inst.args:
+                if arg.kind == 'var':
+                    kind, text = 'var', arg.name
+                elif arg.value is None:
+                    kind, text = 'type', arg.kind
+                elif arg.kind == 'string':
+                    kind, text = 'string', self.encode_string(arg.value)
+                else:
+                    kind, text = arg.kind, value_to_str(arg.value)
+                eT.SubElement(element, f'arg{arg.arg_order}', type=kind).text = text
+        eT.indent(root)
+        eT.ElementTree(root).write(path, encoding='UTF-8', xml_declaration=True)
+
+    def run(self, input_source=None, stdout=None, stderr=None, stats=None, trace=None, compiled=False,
+            budget=None, memo=None, checkpoint=None, resume=None):
+        """Executes program in a fresh Interpreter and returns its RunResult
+
+        input_source is a path or text stream for READ (stdin if None), stdout and stderr are text
+        streams for program output (process streams if None). ExecutionStats given as stats are filled in,
+        executed instructions are logged to TraceRecorder given as trace. Blocks compiled to Python
+        functions are run instead of single instructions if compiled is set and neither stats nor trace is given.
+        The run is limited by ExecutionBudget given as budget. Results of CALLs of pure subroutines are kept in
+        CallMemo given as memo, which is not used by compiled or instrumented runs. Snapshots of the run are
+        taken by Checkpoint given as checkpoint and the run continues from state loaded by Checkpoint.load given
+        as resume. compiled is ignored when a budget or a checkpoint is given, neither of them can be combined
+        with stats or trace (ValueError is raised).
+        """
+        return Interpreter(self, input_source, stdout, stderr, stats, trace, compiled, budget, memo, checkpoint,
+                           resume).run()
+
+    def fingerprint(self):
+        """Hash of instructions, a snapshot of a run can be resumed only by the same program"""
+        if self.digest is None:
+            digest = hashlib.sha256(__version__.encode())
+            for inst in self.instructions:
+                operands = [(arg.kind, arg.value, arg.name) for arg in inst.args]
+                digest.update(repr((inst.order, inst.inst_opcode.upper(), operands)).encode())
+            self.digest = digest.hexdigest()
+        return self.digest
+
+    def basic_blocks(self):
+        """Returns [(start, end), ...] of basic blocks, they begin at labels and after control transfers"""
+        code_len = len(self.instructions)
+        leaders = {0} | set(self.labels.values())
+        leaders.update(index + 1 for index, inst in enumerate(self.instructions)
+                       if inst.inst_opcode.upper() in self.block_terminators)
+        leaders = sorted(index for index in leaders if index < code_len)
+        return list(zip(leaders, leaders[1:] + [code_len]))
+
+    def compiled_blocks(self):
+        """Returns block functions of BlockCompiler, they are generated once for all runs"""
+        if self.blocks is None:
+            self.blocks = BlockCompiler(self).compile()
+        return self.blocks
+
+    def memoized_code(self):
+        """Returns self.fused_code with CALLs of pure subroutines and their RETURNs replaced by memoized
+        handlers, it is built once for all runs"""
+        if self.memo_code is None:
+            subroutines = CallAnalysis(self).run()
+            code = list(self.fused_code)
+            for index, (handler, args) in enumerate(self.code):
+                if handler is Interpreter.exec_call and args[0] in subroutines:
+                    code[index] = (Interpreter.exec_call_memoized, (args[0], subroutines[args[0]]))
+                    # the CALL must not be run as a part of the fused sequence
+                    if index >= 2 and code[index - 2][0] is Interpreter.exec_createframe_pushframe_call:
+                        code[index - 2] = (Interpreter.exec_createframe_pushframe, ())
+            for subroutine in subroutines.values():
+                for index in subroutine.returns:
+                    code[index] = (Interpreter.exec_return_memoized, ())
+                    if index and code[index - 1][0] is Interpreter.exec_popframe_return:
+                        code[index - 1] = self.code[index - 1]
+            self.memo_code = code
+        return self.memo_code
+
     def sort_instructions(self):
         """Checks for label recurrence and archives them with their instruction number"""
         self.instructions.sort(key=lambda inst: inst.order)
@@ -181,89 +1017,195 @@ class Interpreter:
         """Checks for label recurrence and archives them with their instruction number"""
         inst_num = 0
         for inst in self.instructions:
-            if inst.inst_opcode == 'LABEL':
+            if inst.inst_opcode.upper() == 'LABEL':
                 label = inst.args[0]
                 if label.value in self.labels:
                     exit_error(52)
                 self.labels[label.value] = inst_num
             inst_num += 1
 
+    @staticmethod
+    def operand_matches(arg: Argument, kind: str):
+        """Checks operand against kind of the signature table"""
+        if kind == 'symb':
+            # constants always have a value, type operands of READ never
+            return arg.kind == 'var' or (arg.kind in ('int', 'string', 'bool', 'nil') and arg.value is not None)
+        if kind == 'type':
+            return arg.kind in ('int', 'string', 'bool') and arg.value is None
+        return arg.kind == kind
+
+    def verify_instructions(self):
+        """Checks opcodes, numbers and kinds of operands of all instructions before anything is executed"""
+        for inst in self.instructions:
+            kinds = self.signatures.get(inst.inst_opcode.upper())
+            if kinds is None or len(kinds) != len(inst.args):
+                exit_error(32)
+            for arg, kind in zip(inst.args, kinds):
+                if not self.operand_matches(arg, kind):
+                    exit_error(32)
+
+    def verify_labels(self):
+        """Checks that labels of all jumps and calls are defined"""
+        for inst in self.instructions:
+            if inst.args and inst.args[0].kind == 'label' and inst.args[0].value not in self.labels:
+                exit_error(52)
+
     def check_root(self):
         """check obligatory tag and attribute"""
-        if self.xml_root.tag != 'program' or self.xml_root.attrib['language'] != 'IPPcode22':
+        if self.xml_root.tag != 'program' or self.xml_root.attrib.get('language') != 'IPPcode22':
             exit_error(32)
 
-    def parse_source(self):
-        """Reads source file from a given path or from user input"""
-        lines = []
-        if self.source_is_file:
-            with open(self.source_file, 'r') as f:
-                read_lines = f.readlines()
-            for i in range(len(read_lines)):
-                if read_lines[i] != '':
-                    lines.append(read_lines[i].strip())
-        else:
-            while True:
-                try :
-                    line = input()
-                    line = line.strip()
-                    if line != '':
-                        lines.append(line)
-                except EOFError:
-                    break;
+    @staticmethod
+    def open_source(source=None):
+        """Returns binary stream of source given as a path, bytes, a binary stream or None for stdin"""
+        if source is None:
+            return sys.stdin.buffer
+        if isinstance(source, bytes):
+            return io.BytesIO(source)
+        if isinstance(source, (str, os.PathLike)):
+            try:
+                return open(source, 'rb')
+            except OSError:
+                exit_error(11)
+        return source
+
+    def parse_text(self, source=None):
+        """Parses IPPcode22 source text in a single pass over its lines, without parse.php and XML
+
+        Builds the same instructions and arguments as parse_source does from the XML of parse.php and fails
+        with the same codes as parse.php: 21 for invalid header, 22 for unknown opcode and 23 for any other
+        lexical or syntax error. Opcodes of the STACK extension are accepted too.
+        """
+        stream = self.open_source(source)
+        header = False
+        try:
+            for line in stream:
+                try:
+                    tokens = line.decode().split('#', 1)[0].split()
+                except UnicodeDecodeError:
+                    exit_error(23)
+                if not tokens:
+                    # empty line or comment
+                    continue
+                if not header:
+                    if tokens != ['.IPPcode22']:
+                        exit_error(21)
+                    header = True
+                    continue
+                self.parse_text_instruction(tokens)
+        finally:
+            if stream is not source and stream is not sys.stdin.buffer:
+                stream.close()
+        if not header:
+            exit_error(21)
+        self.argument_pool = {}
+
+    def parse_text_instruction(self, tokens: list):
+        """Parses opcode and operands of one line of source text, instructions are numbered from 1"""
+        opcode = tokens[0].upper()
+        kinds = self.signatures.get(opcode)
+        if kinds is None:
+            exit_error(22)
+        if len(tokens) - 1 != len(kinds):
+            exit_error(23)
+        instruction = Instruction(opcode, len(self.instructions) + 1)
+        for arg_order, (token, kind) in enumerate(zip(tokens[1:], kinds), 1):
+            arg = self.parse_token(token, kind, arg_order)
+            instruction.args.append(self.argument_pool.setdefault((arg.kind, arg.value, arg.name, arg_order), arg))
+        self.instructions.append(instruction)
+
+    def parse_token(self, token: str, kind: str, arg_order: int):
+        """Parses one operand of kind var, symb, label or type from the signature table"""
+        if kind == 'label':
+            if not self.identifier.match(token):
+                exit_error(23)
+            return Argument(kind='label', value=token, arg_order=arg_order)
+        if kind == 'type':
+            if token not in ('int', 'string', 'bool'):
+                exit_error(23)
+            return Argument(kind=token, arg_order=arg_order)
+
+        prefix, separator, text = token.partition('@')
+        if kind == 'symb' and prefix in ('int', 'bool', 'string', 'nil'):
+            if prefix == 'int':
+                value = self.parse_int(text)
+                if value is None:
+                    exit_error(23)
+            elif prefix == 'bool' and text in ('true', 'false'):
+                value = text == 'true'
+            elif prefix == 'nil' and text == 'nil':
+                value = NIL
+            elif prefix == 'string' and not self.invalid_escape.search(text):
+                value = self.escape.sub(lambda match: chr(int(match.group(1))), text)
+            else:
+                exit_error(23)
+            return Argument(kind=prefix, value=value, arg_order=arg_order)
+        if not separator or prefix not in ('GF', 'LF', 'TF') or not self.identifier.match(text):
+            exit_error(23)
+        return Argument(kind='var', name=token, arg_order=arg_order)
+
+    def parse_source(self, source=None):
+        """Streams source XML from a path, bytes, a stream or from standard input (source is None)
+
+        Instructions are built as soon as their elements are complete and the elements are
+        dropped afterwards, so the whole tree is never held in memory.
+        """
+        stream = self.open_source(source)
+        depth = 0
         try:
-            self.xml_root = eT.ElementTree(eT.fromstringlist(lines)).getroot()
+            for event, element in eT.iterparse(stream, events=('start', 'end')):
+                if event == 'start':
+                    if depth == 0:
+                        self.xml_root = element
+                        self.check_root()
+                    depth += 1
+                    continue
+                depth -= 1
+                if depth == 1:
+                    self.parse_instruction_element(element)
+                    # instruction is saved, free its element and all previous ones
+                    self.xml_root.clear()
         except eT.ParseError:
             exit_error(31)
+        finally:
+            if stream is not source and stream is not sys.stdin.buffer:
+                stream.close()
+        # needed only while parsing
+        self.order_numbers = set()
+        self.argument_pool = {}
+        self.xml_root = None
 
-    def get_input_line(self):
-        if self.input_is_file:
-            if not self.input_file_is_opened:
-
-                with open(self.input_file) as f:
-                    self.input_file_content = f.readlines()
-                    for i in range(len(self.input_file_content)):
-                        self.input_file_content[i] = self.input_file_content[i].strip()
-                    self.input_file_is_opened = True
-
-            if self.input_file_line_counter < len(self.input_file_content):
-                line = self.input_file_content[self.input_file_line_counter]
-                self.input_file_line_counter += 1
-                return line
-            else:
-                return None
-        else:
-            return input()
-
-    def parse_element_tree(self):
-        """Parses input XML input and saves its contents into classes Instruction or Argument"""
-        for element in self.xml_root:
-            if element.tag != 'instruction' or 'order' not in element.attrib or 'opcode' not in element.attrib:
-                exit_error(32)
+    def parse_instruction_element(self, element: eT.Element):
+        """Parses one instruction element of input XML and saves its contents into classes Instruction or Argument"""
+        if element.tag != 'instruction' or 'order' not in element.attrib or 'opcode' not in element.attrib:
+            exit_error(32)
 
-            if not element.attrib['order'].isdigit():
-                exit_error(32)
+        if not element.attrib['order'].isdigit():
+            exit_error(32)
 
-            if not self.check_int_in_str(element.attrib['order']):
-                exit_error(32)
-            # checking if there is a recurrence of order numbers or invalid order number
-            if int(element.attrib['order']) in self.order_numbers or int(element.attrib['order']) < 1:
-                exit_error(32)
-            self.order_numbers.append(int(element.attrib['order']))
-            instruction = Instruction(element.attrib['opcode'], int(element.attrib['order']))
+        if not self.check_int_in_str(element.attrib['order']):
+            exit_error(32)
+        # checking if there is a recurrence of order numbers or invalid order number
+        if int(element.attrib['order']) in self.order_numbers or int(element.attrib['order']) < 1:
+            exit_error(32)
+        self.order_numbers.add(int(element.attrib['order']))
+        instruction = Instruction(element.attrib['opcode'], int(element.attrib['order']))
 
-            for argument in element.iter():
-                if argument != element:
-                    self.parse_argument(instruction, argument)
-            instruction.args.sort(key=lambda x: x.arg_order)
+        for argument in element.iter():
+            if argument != element:
+                self.parse_argument(instruction, argument)
+        instruction.args.sort(key=lambda x: x.arg_order)
 
-            counter = 1
-            for arg in instruction.args:
-                if arg.arg_order != counter:
-                    exit_error(32)
-                counter += 1
+        counter = 1
+        for arg in instruction.args:
+            if arg.arg_order != counter:
+                exit_error(32)
+            counter += 1
+        # equal operands share one Argument object, they are never modified after loading
+        instruction.args = [self.argument_pool.setdefault((arg.kind, arg.value, arg.name, arg.arg_order), arg)
+                            for arg in instruction.args]
 
-            self.instructions.append(instruction)
+        self.instructions.append(instruction)
 
     def parse_argument(self, inst: Instruction, arg: eT.Element):
         """Parses and checks argument in the beginning phase of XML parsing"""
@@ -271,65 +1213,1088 @@ class Interpreter:
             exit_error(32)
 
         arg_order = int(arg.tag[3])
+        kind = arg.get('type')
+        text = arg.text or ''
+        # surrounding whitespace is insignificant everywhere except in string literals
+        if kind != 'string':
+            text = text.strip()
 
-        if arg.attrib['type'] == 'var':
+        if kind == 'var':
             # type var      <arg1 type="var">GF@var</arg1>
             # GF@x | LF@x | TF@x
-            if len(arg.text) < 4 or arg.text[:3] not in ('GF@', 'LF@', 'TF@'):
+            if not text:
+                exit_error(32)
+            if len(text) < 4 or text[:3] not in ('GF@', 'LF@', 'TF@'):
                 exit_error(31)
-            inst.args.append(Argument(kind='var', name=arg.text, arg_order=arg_order))
+            inst.args.append(Argument(kind='var', name=text, arg_order=arg_order))
 
-        elif arg.attrib['type'] == 'string':
+        elif kind == 'string':
             # type string   <arg1 type="string">hello world</arg1>
-            if arg.text:
-                for index, subst in enumerate(arg.text.split("\\")):
-                    if index == 0:
-                        arg.text = subst
-                    else:
-                        if int(subst[0:3]) < 0 or int(subst[0:3]) > 999:
-                            exit_error(53)
-                        arg.text = arg.text + chr(int(subst[0:3])) + subst[3:]
-            else:
-                arg.text = ''
-
-            inst.args.append(Argument(kind='string', value=arg.text, arg_order=arg_order))
+            # every backslash starts an escape sequence \ddd
+            if self.invalid_escape.search(text):
+                exit_error(32)
+            value = self.escape.sub(lambda match: chr(int(match.group(1))), text)
+            inst.args.append(Argument(kind='string', value=value, arg_order=arg_order))
 
-        elif arg.attrib['type'] == 'int':
+        elif kind == 'int':
             # type int      <arg1 type="int">123</arg1>
             # check if empty and valid integer
-            if not arg.text or not self.check_int_in_str(arg.text):
+            value = self.parse_int(text)
+            if value is None:
                 exit_error(32)
-            inst.args.append(Argument(kind='int', value=int(arg.text), arg_order=arg_order))
+            inst.args.append(Argument(kind='int', value=value, arg_order=arg_order))
 
-        elif arg.attrib['type'] == 'bool':
+        elif kind == 'bool':
             # type bool     <arg1 type="bool">true</arg1>
-            if arg.text not in ('false', 'true'):
+            if text not in ('false', 'true'):
                 exit_error(31)
-            inst.args.append(Argument(kind='bool', value=arg.text, arg_order=arg_order))
+            inst.args.append(Argument(kind='bool', value=text == 'true', arg_order=arg_order))
 
-        elif arg.attrib['type'] == 'nil':
+        elif kind == 'nil':
             # type label    <arg1 type="nil">nil</arg1>
-            if arg.text != "nil":
+            if text != "nil":
                 exit_error(31)
-            inst.args.append(Argument(kind='nil', value='nil', arg_order=arg_order))
+            inst.args.append(Argument(kind='nil', value=NIL, arg_order=arg_order))
 
-        elif arg.attrib['type'] == 'label':
+        elif kind == 'label':
             # type label    <arg1 type="label">label_name</arg1>
             # empty label name
-            if not arg.text:
+            if not text:
                 exit_error(31)
-            inst.args.append(Argument(kind='label', value=arg.text, arg_order=arg_order))
+            inst.args.append(Argument(kind='label', value=text, arg_order=arg_order))
 
-        elif arg.attrib['type'] == 'type':
+        elif kind == 'type':
             # type type    <arg1 type="type">type_name</arg1>
-            if arg.text not in ('int', 'string', 'bool'):
+            if text not in ('int', 'string', 'bool'):
                 exit_error(31)
-            inst.args.append(Argument(kind=arg.text, arg_order=arg_order))
+            inst.args.append(Argument(kind=text, arg_order=arg_order))
 
-        # unknown argument type
+        # unknown or missing argument type
         else:
             exit_error(32)
 
+    def decode_instructions(self):
+        """Turns every loaded instruction into a pre-bound (handler, operands) pair
+
+        Opcode names are resolved to handler functions once, before execution, so the
+        main loop does not have to do any string work per executed instruction.
+        Label operands of jumps are resolved to instruction indexes, the program is verified, so every
+        opcode has its handler and every label is defined.
+        """
+        self.code = []
+        for inst in self.instructions:
+            opcode = inst.inst_opcode.upper()
+            args = tuple(inst.args)
+            if opcode in ('CALL', 'JUMP', 'JUMPIFEQ', 'JUMPIFNEQ', 'JUMPIFEQS', 'JUMPIFNEQS'):
+                args = (self.labels[args[0].value],) + args[1:]
+            self.code.append((Interpreter.handlers[opcode], args))
+        # operands proven to have the right types are not checked again at runtime
+        self.unchecked = TypeAnalysis(self).run()
+        for index in self.unchecked:
+            self.code[index] = (Interpreter.unchecked_handlers[self.instructions[index].inst_opcode.upper()],
+                                self.code[index][1])
+        self.fuse_instructions()
+
+    def fuse_instructions(self):
+        """Builds self.fused_code, where first instruction of every hot sequence runs the whole sequence
+
+        Following instructions of a sequence stay in place, so return addresses and instruction numbers
+        remain valid and the sequence can be entered in the middle too.
+        """
+        self.fused_code = list(self.code)
+        self.fusions = []
+        opcodes = [inst.inst_opcode.upper() for inst in self.instructions]
+        for index, opcode in enumerate(opcodes):
+            next_opcodes = opcodes[index + 1:index + 3]
+            if next_opcodes[:1] in (['JUMPIFEQ'], ['JUMPIFNEQ']) and opcode in Interpreter.fused_jumpif_handlers:
+                handler, operation = Interpreter.fused_jumpif_handlers[opcode]
+                args = self.code[index][1] + self.code[index + 1][1] + (next_opcodes[0] == 'JUMPIFEQ',)
+                if operation is not None:
+                    args = (operation,) + args
+                length = 2
+            elif opcode == 'CREATEFRAME' and next_opcodes == ['PUSHFRAME', 'CALL']:
+                handler, args, length = Interpreter.exec_createframe_pushframe_call, self.code[index + 2][1], 3
+            elif opcode == 'CREATEFRAME' and next_opcodes[:1] == ['PUSHFRAME']:
+                handler, args, length = Interpreter.exec_createframe_pushframe, (), 2
+            elif opcode == 'POPFRAME' and next_opcodes[:1] == ['RETURN']:
+                handler, args, length = Interpreter.exec_popframe_return, (), 2
+            else:
+                continue
+            self.fused_code[index] = (handler, args)
+            self.fusions.append(('+'.join(opcodes[index:index + length]), self.instructions[index].order))
+
+    def write_fusion_report(self, path: str):
+        """Writes fused sequences as JSON"""
+        patterns = collections.Counter(pattern for pattern, _ in self.fusions)
+        with open(path, 'w') as f:
+            json.dump({
+                'fused': len(self.fusions),
+                'patterns': dict(patterns.most_common()),
+                'sites': [{'pattern': pattern, 'order': order} for pattern, order in self.fusions],
+            }, f, indent=2)
+            f.write('\n')
+
+
+class Optimizer:
+    """Optimizer class
+
+    Peephole optimizer of a loaded Program. Folds operations on constants into MOVE, threads jumps to
+    jumps, removes unreachable code, unused labels, redundant MOVEs and PUSHS/POPS round-trips. Only
+    rewrites which can not change output or error codes of the program are done and rewritten
+    instructions keep their orders. Programs with BREAK keep all instructions in place, because BREAK
+    prints instruction numbers.
+    """
+    # instructions which always initialize their first operand when they succeed
+    writing_opcodes = {'MOVE', 'POPS', 'ADD', 'SUB', 'MUL', 'IDIV', 'LT', 'GT', 'EQ', 'AND', 'OR', 'NOT',
+                       'INT2CHAR', 'STRI2INT', 'CONCAT', 'STRLEN', 'GETCHAR', 'SETCHAR', 'READ', 'TYPE'}
+    # instructions after which local and temporary frames may be different
+    frame_opcodes = {'CREATEFRAME', 'PUSHFRAME', 'POPFRAME', 'CALL', 'RETURN'}
+    # {opcode: operand kinds, ...} of instructions with a label
+    jump_operands = {'CALL': ('label',), 'JUMP': ('label',), 'JUMPIFEQ': ('label', 'symb', 'symb'),
+                     'JUMPIFNEQ': ('label', 'symb', 'symb'), 'JUMPIFEQS': ('label',), 'JUMPIFNEQS': ('label',)}
+    # {opcode: operand kinds, ...} of instructions which are folded when all their symbols are constants
+    foldable = {
+        'ADD': ('var', 'const', 'const'), 'SUB': ('var', 'const', 'const'), 'MUL': ('var', 'const', 'const'),
+        'IDIV': ('var', 'const', 'const'), 'LT': ('var', 'const', 'const'), 'GT': ('var', 'const', 'const'),
+        'EQ': ('var', 'const', 'const'), 'AND': ('var', 'const', 'const'), 'OR': ('var', 'const', 'const'),
+        'NOT': ('var', 'const'), 'INT2CHAR': ('var', 'const'), 'STRI2INT': ('var', 'const', 'const'),
+        'CONCAT': ('var', 'const', 'const'), 'STRLEN': ('var', 'const'), 'GETCHAR': ('var', 'const', 'const'),
+    }
+
+    def __init__(self, program: Program):
+        self.program = program
+        self.instructions = program.instructions
+        self.can_remove = not any(inst.inst_opcode.upper() == 'BREAK' for inst in self.instructions)
+
+    @staticmethod
+    def has_operands(inst: Instruction, *kinds):
+        """Checks that instruction has exactly the operands of given kinds (var, const, symb or label)"""
+        if len(inst.args) != len(kinds):
+            return False
+        for arg, kind in zip(inst.args, kinds):
+            # type operands of READ are stored as Argument(kind=type_name) without value
+            is_const = arg.kind in ('int', 'string', 'bool', 'nil') and arg.value is not None
+            if kind == 'const' and not is_const:
+                return False
+            if kind in ('var', 'label') and arg.kind != kind:
+                return False
+            if kind == 'symb' and not (is_const or arg.kind == 'var'):
+                return False
+        return True
+
+    @staticmethod
+    def rewrite(inst: Instruction, opcode: str, args: list):
+        """Creates new instruction in place of inst, loaded instructions are never modified"""
+        new_inst = Instruction(opcode, inst.order)
+        new_inst.args = [Argument(arg.kind, arg.value, arg.name, arg_order)
+                         for arg_order, arg in enumerate(args, 1)]
+        return new_inst
+
+    def is_jump(self, inst: Instruction):
+        """Checks that instruction is a well-formed CALL, JUMP, JUMPIFEQ or JUMPIFNEQ"""
+        operands = self.jump_operands.get(inst.inst_opcode.upper())
+        return operands is not None and self.has_operands(inst, *operands)
+
+    def find_labels(self):
+        """Returns {label_name: index_of_instruction, ...} the same way as Program.find_labels"""
+        return {inst.args[0].value: index for index, inst in enumerate(self.instructions)
+                if inst.inst_opcode.upper() == 'LABEL' and inst.args}
+
+    def run(self):
+        """Runs all passes until none of them changes the program"""
+        changed = True
+        while changed:
+            changed = self.fold_constants()
+            changed = self.thread_jumps() or changed
+            if self.can_remove:
+                changed = self.simplify_moves() or changed
+                changed = self.remove_unreachable() or changed
+                changed = self.remove_unused_labels() or changed
+        self.program.instructions = self.instructions
+
+    @staticmethod
+    def fold(opcode: str, symbols: list):
+        """Returns (kind, value) of operation on constant (kind, value) symbols, None if it would fail"""
+        (kind1, value1), (kind2, value2) = symbols if len(symbols) == 2 else (symbols[0], (None, None))
+        if opcode in ('ADD', 'SUB', 'MUL', 'IDIV') and kind1 == kind2 == 'int':
+            if opcode == 'ADD':
+                return 'int', value1 + value2
+            if opcode == 'SUB':
+                return 'int', value1 - value2
+            if opcode == 'MUL':
+                return 'int', value1 * value2
+            if value2:
+                return 'int', value1 // value2
+        elif opcode in ('LT', 'GT') and kind1 == kind2 and kind1 != 'nil':
+            return 'bool', value1 < value2 if opcode == 'LT' else value1 > value2
+        elif opcode == 'EQ':
+            return 'bool', kind1 == kind2 and value1 == value2
+        elif opcode in ('AND', 'OR') and kind1 == kind2 == 'bool':
+            return 'bool', value1 and value2 if opcode == 'AND' else value1 or value2
+        elif opcode == 'NOT' and kind1 == 'bool':
+            return 'bool', not value1
+        elif opcode == 'INT2CHAR' and kind1 == 'int' and 0 <= value1 <= 0x10FFFF:
+            return 'string', chr(value1)
+        elif opcode in ('STRI2INT', 'GETCHAR') and kind1 == 'string' and kind2 == 'int':
+            if 0 <= value2 <= len(value1) - 1:
+                return ('int', ord(value1[value2])) if opcode == 'STRI2INT' else ('string', value1[value2])
+        elif opcode == 'CONCAT' and kind1 == kind2 == 'string':
+            return 'string', value1 + value2
+        elif opcode == 'STRLEN' and kind1 == 'string':
+            return 'int', len(value1)
+        return None
+
+    def fold_constants(self):
+        """Replaces operations on constants with MOVE of the result and conditional jumps on constants"""
+        changed = False
+        labels = self.find_labels()
+        new_instructions = []
+        for inst in self.instructions:
+            opcode = inst.inst_opcode.upper()
+            if opcode in self.foldable and self.has_operands(inst, *self.foldable[opcode]):
+                result = self.fold(opcode, [(arg.kind, arg.value) for arg in inst.args[1:]])
+                if result is not None:
+                    inst = self.rewrite(inst, 'MOVE', [inst.args[0], Argument(kind=result[0], value=result[1])])
+                    changed = True
+            elif opcode in ('JUMPIFEQ', 'JUMPIFNEQ') and self.has_operands(inst, 'label', 'const', 'const'):
+                target, symbol1, symbol2 = inst.args
+                # undefined label (52) and invalid operands (53) are left to be reported at runtime
+                if target.value in labels and (symbol1.kind == symbol2.kind or 'nil' in (symbol1.kind, symbol2.kind)):
+                    if (symbol1.value == symbol2.value) == (opcode == 'JUMPIFEQ'):
+                        inst = self.rewrite(inst, 'JUMP', [target])
+                        changed = True
+                    elif self.can_remove:
+                        changed = True
+                        continue
+            new_instructions.append(inst)
+        self.instructions = new_instructions
+        return changed
+
+    def thread_jumps(self):
+        """Retargets jumps and calls to labels followed by JUMP, removes jumps to the next instruction"""
+        changed = False
+        labels = self.find_labels()
+        new_instructions = []
+        for index, inst in enumerate(self.instructions):
+            opcode = inst.inst_opcode.upper()
+            if not self.is_jump(inst):
+                new_instructions.append(inst)
+                continue
+            label = inst.args[0].value
+            visited = {label}
+            while label in labels:
+                next_index = labels[label]
+                while next_index < len(self.instructions) and \
+                        self.instructions[next_index].inst_opcode.upper() == 'LABEL':
+                    next_index += 1
+                if next_index == len(self.instructions):
+                    break
+                next_inst = self.instructions[next_index]
+                if next_inst.inst_opcode.upper() != 'JUMP' or not self.has_operands(next_inst, 'label') or \
+                        next_inst.args[0].value not in labels:
+                    break
+                label = next_inst.args[0].value
+                if label in visited:
+                    # endless loop of jumps, it is kept as it is
+                    label = inst.args[0].value
+                    break
+                visited.add(label)
+            if label != inst.args[0].value:
+                inst = self.rewrite(inst, inst.inst_opcode, [Argument(kind='label', value=label)] + inst.args[1:])
+                changed = True
+            if self.can_remove and opcode == 'JUMP' and label in labels and labels[label] > index and \
+                    all(self.instructions[between].inst_opcode.upper() == 'LABEL'
+                        for between in range(index + 1, labels[label])):
+                changed = True
+                continue
+            new_instructions.append(inst)
+        self.instructions = new_instructions
+        return changed
+
+    def simplify_moves(self):
+        """Removes MOVE of a variable to itself and turns PUSHS a, POPS b into MOVE b a
+
+        Both are done only if the source is a constant or a variable which is known to be initialized,
+        so that no error is lost or reported in a different order.
+        """
+        changed = False
+        # names of variables initialized earlier in the same basic block
+        initialized = set()
+        new_instructions = []
+        index = 0
+        while index < len(self.instructions):
+            inst = self.instructions[index]
+            opcode = inst.inst_opcode.upper()
+            next_inst = self.instructions[index + 1] if index + 1 < len(self.instructions) else None
+            if opcode == 'MOVE' and self.has_operands(inst, 'var', 'var') and \
+                    inst.args[0].name == inst.args[1].name and inst.args[0].name in initialized:
+                changed = True
+                index += 1
+                continue
+            if opcode == 'PUSHS' and self.has_operands(inst, 'symb') and next_inst is not None and \
+                    next_inst.inst_opcode.upper() == 'POPS' and self.has_operands(next_inst, 'var') and \
+                    (inst.args[0].kind != 'var' or inst.args[0].name in initialized):
+                inst = self.rewrite(inst, 'MOVE', [next_inst.args[0], inst.args[0]])
+                opcode = 'MOVE'
+                changed = True
+                index += 1
+
+            if opcode == 'LABEL':
+                initialized.clear()
+            elif opcode in self.frame_opcodes:
+                initialized = {name for name in initialized if name.startswith('GF@')}
+            elif opcode in self.writing_opcodes and inst.args and inst.args[0].kind == 'var':
+                initialized.add(inst.args[0].name)
+            new_instructions.append(inst)
+            index += 1
+        self.instructions = new_instructions
+        return changed
+
+    def remove_unreachable(self):
+        """Removes instructions which can not be reached from the first one"""
+        labels = self.find_labels()
+        count = len(self.instructions)
+        reachable = [False] * count
+        pending = [0] if count else []
+        while pending:
+            index = pending.pop()
+            if index >= count or reachable[index]:
+                continue
+            reachable[index] = True
+            inst = self.instructions[index]
+            opcode = inst.inst_opcode.upper()
+            if self.is_jump(inst):
+                if inst.args[0].value in labels:
+                    pending.append(labels[inst.args[0].value])
+                if opcode == 'JUMP':
+                    continue
+            elif opcode in ('RETURN', 'EXIT'):
+                continue
+            pending.append(index + 1)
+        if all(reachable):
+            return False
+        self.instructions = [inst for inst, is_reachable in zip(self.instructions, reachable) if is_reachable]
+        return True
+
+    def remove_unused_labels(self):
+        """Removes labels which are not a target of any jump or call"""
+        used = {inst.args[0].value for inst in self.instructions
+                if inst.inst_opcode.upper() in self.jump_operands and inst.args and inst.args[0].kind == 'label'}
+        new_instructions = [inst for inst in self.instructions
+                            if inst.inst_opcode.upper() != 'LABEL' or not self.has_operands(inst, 'label')
+                            or inst.args[0].value in used]
+        changed = len(new_instructions) != len(self.instructions)
+        self.instructions = new_instructions
+        return changed
+
+
+class TypeAnalysis:
+    """TypeAnalysis class
+
+    Data-flow analysis of a decoded Program. Builds control flow graph of basic blocks from instructions and
+    labels and infers possible types of variables at the beginning of every block. Types are bit masks,
+    variables are keyed by (frame, pure_name) and (frame, None) marks a frame with unknown contents. Operand
+    checks of an instruction are redundant if its operands have the right types on every path to it.
+    """
+    INT, STRING, BOOL, NIL, UNINITIALIZED = 1, 2, 4, 8, 16
+    ANY = 31
+    # {opcode: type of the value written to the first operand, ...}, MOVE and READ depend on their operands
+    results = {
+        'ADD': INT, 'SUB': INT, 'MUL': INT, 'IDIV': INT, 'STRLEN': INT, 'STRI2INT': INT,
+        'LT': BOOL, 'GT': BOOL, 'EQ': BOOL, 'AND': BOOL, 'OR': BOOL, 'NOT': BOOL,
+        'CONCAT': STRING, 'INT2CHAR': STRING, 'GETCHAR': STRING, 'SETCHAR': STRING, 'TYPE': STRING,
+        'POPS': INT | STRING | BOOL | NIL,
+    }
+    constant_types = {int: INT, str: STRING, bool: BOOL, Nil: NIL}
+    read_types = {'int': INT, 'string': STRING, 'bool': BOOL}
+    # instructions which have unchecked handlers
+    unchecked_opcodes = {'ADD', 'SUB', 'MUL', 'IDIV', 'LT', 'GT', 'EQ', 'JUMPIFEQ', 'JUMPIFNEQ'}
+
+    def __init__(self, program: Program):
+        self.program = program
+        self.instructions = program.instructions
+        self.opcodes = [inst.inst_opcode.upper() for inst in program.instructions]
+        # RETURN may continue after any CALL
+        self.return_sites = [index + 1 for index, opcode in enumerate(self.opcodes) if opcode == 'CALL']
+
+    def run(self):
+        """Returns set of indexes of instructions whose operand checks are redundant"""
+        code_len = len(self.instructions)
+        # instructions which have unchecked handlers, the analysis is skipped if there are none
+        candidates = [index for index, opcode in enumerate(self.opcodes) if opcode in self.unchecked_opcodes]
+        if not candidates:
+            return set()
+        blocks = dict(self.program.basic_blocks())
+        # {start_of_block: {(frame, pure_name): type, ...}, ...} of reached blocks
+        entries = {0: {}} if code_len else {}
+        worklist = list(entries)
+        while worklist:
+            start = worklist.pop()
+            state = dict(entries[start])
+            for index in range(start, blocks[start]):
+                self.transfer(index, state)
+            for successor in self.successors(blocks[start] - 1):
+                if successor < code_len and self.merge(entries, successor, state):
+                    worklist.append(successor)
+
+        unchecked = set()
+        candidates = set(candidates)
+        for start, state in entries.items():
+            if candidates.isdisjoint(range(start, blocks[start])):
+                continue
+            state = dict(state)
+            for index in range(start, blocks[start]):
+                if index in candidates and self.checks_redundant(index, state):
+                    unchecked.add(index)
+                self.transfer(index, state)
+        return unchecked
+
+    @staticmethod
+    def lookup(state: dict, key: tuple):
+        """Type of a variable, any type in a frame with unknown contents, none if it is not defined"""
+        if key in state:
+            return state[key]
+        return TypeAnalysis.ANY if state.get((key[0], None)) else 0
+
+    def merge(self, entries: dict, start: int, state: dict):
+        """Joins state into the entry state of a block, returns True if the entry state changed"""
+        old = entries.get(start)
+        if old is None:
+            entries[start] = dict(state)
+            return True
+        new = {}
+        for key in old.keys() | state.keys():
+            value = self.lookup(old, key) | self.lookup(state, key)
+            if value:
+                new[key] = value
+        if new == old:
+            return False
+        entries[start] = new
+        return True
+
+    def type_of(self, arg: Argument, state: dict):
+        if arg.kind == 'var':
+            return self.lookup(state, (arg.frame, arg.pure_name))
+        return self.constant_types.get(type(arg.value), 0)
+
+    @staticmethod
+    def move_frame(state: dict, source, target):
+        """Moves types of variables of source frame to target frame, target frame is empty if source is None"""
+        moved = {(target, name): value for (frame, name), value in state.items() if frame == source}
+        for key in [key for key in state if key[0] == target]:
+            del state[key]
+        state.update(moved)
+
+    def transfer(self, index: int, state: dict):
+        """Changes state to the state after successful execution of an instruction"""
+        opcode = self.opcodes[index]
+        args = self.instructions[index].args
+        if opcode == 'CREATEFRAME':
+            self.move_frame(state, None, 'TF')
+        elif opcode == 'PUSHFRAME':
+            self.move_frame(state, 'TF', 'LF')
+            self.move_frame(state, None, 'TF')
+        elif opcode == 'POPFRAME':
+            self.move_frame(state, 'LF', 'TF')
+            self.move_frame(state, None, 'LF')
+            # the frame below is not known
+            state[('LF', None)] = self.ANY
+        elif not args or args[0].kind != 'var':
+            return
+        elif opcode == 'DEFVAR':
+            state[(args[0].frame, args[0].pure_name)] = self.UNINITIALIZED
+        elif opcode in Optimizer.writing_opcodes:
+            if opcode == 'MOVE' and len(args) == 2:
+                value = self.type_of(args[1], state) & ~self.UNINITIALIZED
+            elif opcode == 'READ' and len(args) == 2:
+                value = self.read_types.get(args[1].kind, 0) | self.NIL
+            else:
+                value = self.results.get(opcode, self.ANY)
+            if opcode in ('ADD', 'SUB', 'MUL', 'IDIV'):
+                # operands of successful arithmetic are integers
+                for arg in args[1:]:
+                    if arg.kind == 'var':
+                        state[(arg.frame, arg.pure_name)] = self.INT
+            state[(args[0].frame, args[0].pure_name)] = value
+
+    def successors(self, index: int):
+        """Indexes of instructions which may be executed after an instruction"""
+        opcode = self.opcodes[index]
+        if opcode == 'EXIT':
+            return []
+        if opcode == 'RETURN':
+            return self.return_sites
+        if opcode in ('JUMP', 'CALL'):
+            return [self.program.code[index][1][0]]
+        if opcode in Optimizer.jump_operands:
+            return [self.program.code[index][1][0], index + 1]
+        return [index + 1]
+
+    def checks_redundant(self, index: int, state: dict):
+        """Checks that operands of a candidate instruction are initialized and of the right types on every path"""
+        opcode = self.opcodes[index]
+        types = [self.type_of(arg, state) for arg in self.instructions[index].args[1:]]
+        if opcode in ('ADD', 'SUB', 'MUL', 'IDIV'):
+            return types[0] == types[1] == self.INT
+        if opcode in ('LT', 'GT'):
+            return types[0] == types[1] and types[0] in (self.INT, self.STRING, self.BOOL)
+        return types[0] == types[1] and types[0] in (self.INT, self.STRING, self.BOOL, self.NIL)
+
+
+class Subroutine:
+    """Subroutine class
+
+    Summary of a pure subroutine found by CallAnalysis, what its CALL reads and how it changes the data stack.
+    """
+    __slots__ = ('target', 'consumed', 'produced', 'out_tf', 'needs_tf', 'gf_reads', 'returns')
+
+    def __init__(self, target: int, consumed: int, produced: int, out_tf: str, needs_tf: bool, gf_reads: tuple,
+                 returns: frozenset):
+        self.target = target
+        # number of values popped from below the data stack at the call and pushed in their place
+        self.consumed = consumed
+        self.produced = produced
+        # temporary frame after RETURN, the one at the CALL ('entry'), a new one ('local') or none ('invalid')
+        self.out_tf = out_tf
+        # the temporary frame at the CALL is read by the subroutine
+        self.needs_tf = needs_tf
+        # names of global variables read by the subroutine or by subroutines called by it
+        self.gf_reads = gf_reads
+        # indexes of RETURN instructions which end the subroutine
+        self.returns = returns
+
+    def summary(self):
+        return self.consumed, self.produced, self.out_tf, self.needs_tf, self.gf_reads, self.returns
+
+
+class CallAnalysis:
+    """CallAnalysis class
+
+    Finds pure subroutines of a decoded Program, whose CALLs can be memoized. A subroutine starts at a label
+    targeted by CALL and contains every instruction reachable from it up to RETURN, called subroutines are
+    represented by their summaries. It is pure if it has no input or output, does not write global variables,
+    never touches frames of its caller other than the temporary frame at the CALL, leaves the frame stack as
+    it was and changes the data stack by the same number of values on every path. Subroutines are analyzed
+    together until their summaries stop changing, recursive ones included.
+    """
+    # instructions whose effects can not be memoized
+    impure_opcodes = {'READ', 'WRITE', 'DPRINT', 'BREAK', 'EXIT', 'CLEARS'}
+    # {opcode: (popped values, pushed values), ...} of instructions using the data stack
+    stack_effects = {
+        'PUSHS': (0, 1), 'POPS': (1, 0), 'ADDS': (2, 1), 'SUBS': (2, 1), 'MULS': (2, 1), 'IDIVS': (2, 1),
+        'LTS': (2, 1), 'GTS': (2, 1), 'EQS': (2, 1), 'ANDS': (2, 1), 'ORS': (2, 1), 'NOTS': (1, 1),
+        'INT2CHARS': (1, 1), 'STRI2INTS': (2, 1), 'JUMPIFEQS': (2, 0), 'JUMPIFNEQS': (2, 0),
+    }
+    # bounds of frames pushed and of data stack height of a subroutine, deeper ones are not pure
+    max_frames = 8
+    max_height = 64
+    max_rounds = 64
+
+    def __init__(self, program: Program):
+        self.program = program
+        self.instructions = program.instructions
+        self.opcodes = [inst.inst_opcode.upper() for inst in program.instructions]
+
+    def run(self):
+        """Returns {index_of_label: Subroutine, ...} of pure subroutines"""
+        targets = sorted({self.program.code[index][1][0] for index, opcode in enumerate(self.opcodes)
+                          if opcode == 'CALL'})
+        # {target: Subroutine or None if it is not pure, ...}, subroutines not yet summarized are missing
+        summaries = {}
+        # summaries of weird recursions might never settle, all subroutines are impure after too many rounds
+        rounds = 0
+        while True:
+            changed = True
+            while changed:
+                rounds += 1
+                if rounds > self.max_rounds:
+                    return {}
+                changed = False
+                for target in targets:
+                    if target in summaries and summaries[target] is None:
+                        continue
+                    subroutine = self.analyze(target, summaries)
+                    if subroutine is False:
+                        continue
+                    old = summaries.get(target)
+                    if subroutine is None or old is None or subroutine.summary() != old.summary():
+                        summaries[target] = subroutine
+                        changed = True
+            # subroutines which never reach RETURN without themselves are not pure
+            unknown = [target for target in targets if target not in summaries]
+            if not unknown:
+                break
+            summaries.update(dict.fromkeys(unknown))
+        return {target: subroutine for target, subroutine in summaries.items() if subroutine is not None}
+
+    def analyze(self, target: int, summaries: dict):
+        """Summarizes subroutine starting at target, returns None if it is not pure and False if no RETURN
+        is reached yet, because every path to it goes through subroutines which are not summarized"""
+        code_len = len(self.instructions)
+        # {index: (tags of frames pushed by the subroutine, tag of temporary frame, data stack height), ...}
+        states = {target: ((), 'entry', 0)}
+        worklist = [target]
+        low = 0
+        needs_tf = False
+        gf_reads = set()
+        # {index_of_return: (tag of temporary frame, data stack height), ...}
+        returns = {}
+        while worklist:
+            index = worklist.pop()
+            frames, tf, height = states[index]
+            opcode = self.opcodes[index]
+            args = self.instructions[index].args
+            if opcode in self.impure_opcodes:
+                return None
+            for arg, kind in zip(args, Program.signatures[opcode]):
+                if arg.kind != 'var':
+                    continue
+                if arg.frame == 'GF':
+                    if kind == 'var':
+                        return None
+                    gf_reads.add(arg.pure_name)
+                elif arg.frame == 'LF':
+                    if not frames:
+                        return None
+                    needs_tf = needs_tf or frames[-1] == 'entry'
+                elif tf == 'invalid':
+                    return None
+                else:
+                    needs_tf = needs_tf or tf == 'entry'
+
+            successors = [index + 1]
+            if opcode == 'CREATEFRAME':
+                tf = 'local'
+            elif opcode == 'PUSHFRAME':
+                if tf == 'invalid' or len(frames) == self.max_frames:
+                    return None
+                needs_tf = needs_tf or tf == 'entry'
+                frames, tf = frames + (tf,), 'invalid'
+            elif opcode == 'POPFRAME':
+                if not frames:
+                    return None
+                frames, tf = frames[:-1], frames[-1]
+            elif opcode == 'CALL':
+                callee = summaries.get(self.program.code[index][1][0], False)
+                if callee is None:
+                    return None
+                if callee is False:
+                    continue
+                if callee.needs_tf:
+                    if tf == 'invalid':
+                        return None
+                    needs_tf = needs_tf or tf == 'entry'
+                low = min(low, height - callee.consumed)
+                height += callee.produced - callee.consumed
+                gf_reads.update(callee.gf_reads)
+                if callee.out_tf != 'entry':
+                    tf = callee.out_tf
+            elif opcode == 'RETURN':
+                if frames:
+                    return None
+                returns[index] = (tf, height)
+                continue
+            if opcode in self.stack_effects:
+                popped, pushed = self.stack_effects[opcode]
+                low = min(low, height - popped)
+                height += pushed - popped
+            if opcode == 'JUMP':
+                successors = [self.program.code[index][1][0]]
+            elif opcode in Optimizer.jump_operands and opcode != 'CALL':
+                successors.append(self.program.code[index][1][0])
+            if abs(height) > self.max_height:
+                return None
+
+            state = (frames, tf, height)
+            for successor in successors:
+                if successor >= code_len:
+                    # the program would end inside the subroutine
+                    return None
+                if successor not in states:
+                    states[successor] = state
+                    worklist.append(successor)
+                elif states[successor] != state:
+                    return None
+
+        if not returns:
+            return False
+        if len(set(returns.values())) != 1:
+            return None
+        out_tf, height = next(iter(returns.values()))
+        return Subroutine(target, -low, height - low, out_tf, needs_tf or out_tf == 'entry', tuple(sorted(gf_reads)),
+                          frozenset(returns))
+
+
+class BlockCompiler:
+    """BlockCompiler class
+
+    Translates a decoded Program into Python functions, one function per basic block. Blocks begin at
+    labels and after jumps, calls, returns and exits. Frequent instructions are generated inline with
+    variables held in locals and constants as literals, the other ones call their handler. Every function
+    returns index of the next block to run, a block jumping to its own beginning loops inside its function.
+    """
+    # instructions generated inline
+    inlined = {'LABEL', 'DEFVAR', 'MOVE', 'CREATEFRAME', 'PUSHFRAME', 'POPFRAME', 'CALL', 'RETURN', 'ADD', 'SUB',
+               'MUL', 'IDIV', 'LT', 'GT', 'EQ', 'AND', 'OR', 'NOT', 'WRITE', 'JUMP', 'JUMPIFEQ', 'JUMPIFNEQ'}
+    # Python operators of instructions with two operands
+    operators = {'ADD': '+', 'SUB': '-', 'MUL': '*', 'IDIV': '//', 'LT': '<', 'GT': '>', 'EQ': '==',
+                 'AND': 'and', 'OR': 'or', 'JUMPIFEQ': '==', 'JUMPIFNEQ': '!='}
+    # expressions of frames, missing local and temporary frames are errors
+    frames = {'GF': 'gf', 'LF': '(lfs[-1] if lfs else missing_frame())',
+              'TF': '(interp.temp_frame if interp.temp_frame_valid else missing_frame())'}
+
+    def __init__(self, program: Program):
+        self.program = program
+        self.opcodes = [inst.inst_opcode.upper() for inst in program.instructions]
+        # globals of the generated code, handlers and operands of not inlined instructions are added
+        self.namespace = {'exit_error': exit_error, 'missing_frame': self.missing_frame, 'NIL': NIL, 'Nil': Nil,
+                          'StringBuffer': StringBuffer, 'Variable': Variable, 'value_to_str': value_to_str}
+        self.lines = []
+        self.indent = 0
+        # {(frame, pure_name): local_name, ...} of all variables
+        self.var_names = {}
+        # (frame, pure_name) of variables looked up since the beginning of the block or the last frame change
+        self.cached = set()
+        self.temp_count = 0
+
+    @staticmethod
+    def missing_frame():
+        exit_error(55)
+
+    def compile(self):
+        """Returns list of block functions indexed by number of their first instruction, other items are None"""
+        basic_blocks = self.program.basic_blocks()
+        for start, end in basic_blocks:
+            self.compile_block(start, end)
+        exec(compile('\n'.join(self.lines), '<IPPcode22 blocks>', 'exec'), self.namespace)
+        blocks = [None] * len(self.opcodes)
+        for start, _ in basic_blocks:
+            blocks[start] = self.namespace[f'block_{start}']
+        return blocks
+
+    def emit(self, line: str, indent: int = 0):
+        self.lines.append('    ' * (self.indent + indent) + line)
+
+    def compile_block(self, start: int, end: int):
+        """Generates function of instructions from start to end - 1"""
+        # the block jumps to its own beginning
+        loops = self.opcodes[end - 1] in ('JUMP', 'JUMPIFEQ', 'JUMPIFNEQ') and \
+            self.program.code[end - 1][1][0] == start
+        self.cached = set()
+        self.indent = 0
+        self.emit(f'def block_{start}(interp):')
+        self.emit('gf = interp.global_frame', 1)
+        self.emit('lfs = interp.local_frame.stack', 1)
+        self.emit('cs = interp.call_stack.stack', 1)
+        self.emit('write = interp.output.write', 1)
+        self.emit('try:', 1)
+        self.indent = 2
+        if loops:
+            self.emit('while True:')
+            self.indent += 1
+        for index in range(start, end):
+            self.compile_instruction(index, start if loops else None)
+        self.emit(f'return {end}')
+        # frames are dictionaries, so any missing key is an undefined variable
+        self.indent = 1
+        self.emit('except KeyError:')
+        self.emit('exit_error(54)', 1)
+
+    def compile_instruction(self, index: int, loop_start):
+        """Generates code of one instruction, loop_start is the beginning of a looping block or None"""
+        opcode = self.opcodes[index]
+        args = self.program.instructions[index].args
+        # operands proven to have the right types by TypeAnalysis
+        checked = index not in self.program.unchecked
+        self.temp_count = 0
+        if opcode not in self.inlined:
+            self.compile_handler_call(index)
+        elif opcode == 'DEFVAR':
+            key = (args[0].frame, args[0].pure_name)
+            self.emit(f'frame = {self.frames[args[0].frame]}')
+            self.emit(f'if {args[0].pure_name!r} in frame: exit_error(52)')
+            self.emit(f'{self.var_name(key)} = frame[{args[0].pure_name!r}] = Variable(name={args[0].name!r})')
+            self.cached.add(key)
+        elif opcode == 'MOVE':
+            var = self.var(args[0])
+            value = self.value(args[1])
+            self.check_initialized(args[1:], [value])
+            self.emit(f'{var}.value = {value}')
+        elif opcode in ('ADD', 'SUB', 'MUL', 'IDIV'):
+            var = self.var(args[0])
+            # StringBuffer is not int, so it does not have to be materialized
+            values = [self.value(args[1], False), self.value(args[2], False)]
+            if checked:
+                self.check_initialized(args[1:], values)
+                self.check_type(args[1:], values, int)
+            if opcode == 'IDIV':
+                self.emit(f'if not {values[1]}: exit_error(57)')
+            self.emit(f'{var}.value = {values[0]} {self.operators[opcode]} {values[1]}')
+        elif opcode in ('LT', 'GT', 'EQ'):
+            var = self.var(args[0])
+            values = [self.value(args[1]), self.value(args[2])]
+            types = [self.type_of(arg, value) for arg, value in zip(args[1:], values)]
+            if not checked:
+                self.emit(f'{var}.value = {values[0]} {self.operators[opcode]} {values[1]}')
+                return
+            self.check_initialized(args[1:], values)
+            if opcode == 'EQ':
+                self.emit(f'{var}.value = {types[0]} is {types[1]} and {values[0]} == {values[1]}')
+            else:
+                self.emit(f'if {types[0]} is not {types[1]} or {self.is_nil(args[1], values[0])}: exit_error(53)')
+                self.emit(f'{var}.value = {values[0]} {self.operators[opcode]} {values[1]}')
+        elif opcode in ('AND', 'OR', 'NOT'):
+            var = self.var(args[0])
+            values = [self.value(arg, False) for arg in args[1:]]
+            self.check_initialized(args[1:], values)
+            self.check_type(args[1:], values, bool)
+            if opcode == 'NOT':
+                self.emit(f'{var}.value = not {values[0]}')
+            else:
+                self.emit(f'{var}.value = {values[0]} {self.operators[opcode]} {values[1]}')
+        elif opcode == 'WRITE':
+            self.compile_write(args[0])
+        elif opcode == 'CREATEFRAME':
+            self.emit('interp.temp_frame = {}')
+            self.emit('interp.temp_frame_valid = True')
+            self.forget_frames('TF')
+        elif opcode == 'PUSHFRAME':
+            self.emit('if not interp.temp_frame_valid: exit_error(55)')
+            self.emit('lfs.append(interp.temp_frame)')
+            self.emit('interp.temp_frame_valid = False')
+            self.forget_frames('LF', 'TF')
+        elif opcode == 'POPFRAME':
+            self.emit('if not lfs: exit_error(55)')
+            self.emit('interp.temp_frame = lfs.pop()')
+            self.emit('interp.temp_frame_valid = True')
+            self.forget_frames('LF', 'TF')
+        elif opcode == 'CALL':
+            self.emit(f'cs.append({index + 1})')
+            self.compile_jump(self.program.code[index][1][0], loop_start)
+        elif opcode == 'RETURN':
+            self.emit('if not cs: exit_error(56)')
+            self.emit('return cs.pop()')
+        elif opcode == 'JUMP':
+            self.compile_jump(self.program.code[index][1][0], loop_start)
+        elif opcode in ('JUMPIFEQ', 'JUMPIFNEQ'):
+            target = self.program.code[index][1][0]
+            values = [self.value(args[1]), self.value(args[2])]
+            if checked:
+                self.check_initialized(args[1:], values)
+                types = [self.type_of(arg, value) for arg, value in zip(args[1:], values)]
+                self.emit(f'if {types[0]} is not {types[1]} and not {self.is_nil(args[1], values[0])} and '
+                          f'not {self.is_nil(args[2], values[1])}: exit_error(53)')
+            self.emit(f'if {values[0]} {self.operators[opcode]} {values[1]}:')
+            self.indent += 1
+            self.compile_jump(target, loop_start)
+            self.indent -= 1
+
+    def compile_handler_call(self, index: int):
+        """Generates call of the handler of an instruction which is not inlined"""
+        handler, args = self.program.code[index]
+        self.namespace[f'handler_{index}'] = handler
+        self.namespace[f'args_{index}'] = args
+        # BREAK prints the instruction number and handlers of jumps set the next one
+        self.emit(f'interp.inst_num = {index}')
+        self.emit(f'handler_{index}(interp, *args_{index})')
+        if self.opcodes[index] in Program.block_terminators:
+            self.emit('return interp.inst_num')
+
+    def compile_jump(self, target: int, loop_start):
+        if target == loop_start:
+            self.emit('continue')
+        else:
+            self.emit(f'return {target}')
+
+    def compile_write(self, arg: Argument):
+        if arg.kind != 'var':
+            text = arg.value if type(arg.value) is str else '' if arg.value is NIL else value_to_str(arg.value)
+            if text:
+                self.emit(f'write({text!r})')
+            return
+        value = self.value(arg)
+        self.check_initialized([arg], [value])
+        self.emit(f'if type({value}) is str: write({value})')
+        self.emit(f'elif {value} is not NIL: write(value_to_str({value}))')
+
+    def var_name(self, key: tuple):
+        return self.var_names.setdefault(key, f'var{len(self.var_names)}')
+
+    def var(self, arg: Argument):
+        """Returns local name of a variable, generates its lookup if it is not looked up yet"""
+        key = (arg.frame, arg.pure_name)
+        name = self.var_name(key)
+        if key not in self.cached:
+            self.emit(f'{name} = {self.frames[arg.frame]}[{arg.pure_name!r}]')
+            self.cached.add(key)
+        return name
+
+    def value(self, arg: Argument, materialize: bool = True):
+        """Returns expression of the value of a symbol, values of variables are read into temporary locals"""
+        if arg.kind != 'var':
+            return 'NIL' if arg.value is NIL else repr(arg.value)
+        var = self.var(arg)
+        temp = f'value{self.temp_count}'
+        self.temp_count += 1
+        self.emit(f'{temp} = {var}.value')
+        if materialize:
+            self.emit(f'if type({temp}) is StringBuffer: {temp} = {temp}.materialize()')
+        return temp
+
+    @staticmethod
+    def type_of(arg: Argument, value: str):
+        """Returns expression of the type of a symbol, types of constants are known"""
+        return f'type({value})' if arg.kind == 'var' else type(arg.value).__name__
+
+    @staticmethod
+    def is_nil(arg: Argument, value: str):
+        return f'{value} is NIL' if arg.kind == 'var' else repr(arg.value is NIL)
+
+    def check_initialized(self, args: list, values: list):
+        conditions = [f'{value} is None' for arg, value in zip(args, values) if arg.kind == 'var']
+        if conditions:
+            self.emit(f'if {" or ".join(conditions)}: exit_error(56)')
+
+    def check_type(self, args: list, values: list, value_type: type):
+        """Generates type check of symbols, only variables and constants of other types are checked"""
+        conditions = [f'type({value}) is not {value_type.__name__}' if arg.kind == 'var' else 'True'
+                      for arg, value in zip(args, values) if arg.kind == 'var' or type(arg.value) is not value_type]
+        if conditions:
+            self.emit(f'if {" or ".join(conditions)}: exit_error(53)')
+
+    def forget_frames(self, *frames):
+        """Variables of changed frames have to be looked up again"""
+        self.cached = {key for key in self.cached if key[0] not in frames}
+
+
+class RunResult:
+    """RunResult class
+
+    Outcome of one program run, exit code is 0 or the code of EXIT or of the error described by message.
+    """
+    def __init__(self, exit_code: int = 0, message: str = ''):
+        self.exit_code = exit_code
+        self.message = message
+
+    def __repr__(self):
+        return f'RunResult(exit_code={self.exit_code!r}, message={self.message!r})'
+
+
+class Interpreter:
+    """Interpreter class
+
+    Executes a decoded Program, creates and stores all runtime information (frames, stacks,
+    program counter) during execution of IPPcode22.
+    """
+
+    def __init__(self, program: Program, input_source=None, stdout=None, stderr=None, stats=None, trace=None,
+                 compiled=False, budget=None, memo=None, checkpoint=None, resume=None):
+        # limits and snapshots are checked only by the main execution loop, instrumented runs would ignore them
+        if (budget is not None or checkpoint is not None) and (stats is not None or trace is not None):
+            raise ValueError('budget and checkpoint can not be combined with stats or trace')
+        self.program = program
+        # run blocks generated by BlockCompiler, ignored by instrumented runs and runs with a budget or a checkpoint
+        self.compiled = compiled
+        # ExecutionBudget of this run, checked only if given
+        self.budget = budget
+        # CallMemo of this run, used only if given
+        self.memo = memo
+        # Checkpoint of this run and state of a previous run to continue from, used only if given
+        self.checkpoint = checkpoint
+        self.resume = resume
+        # number of executed steps, counted only by runs with a budget or a checkpoint
+        self.steps = 0
+        # step after which strings are counted again by check_limits
+        self.next_string_check = 0
+        # [(handler, operands), ...] decoded by Program, instrumented runs measure every single instruction
+        if stats is not None or trace is not None:
+            self.code = program.code
+        elif memo is not None and not compiled:
+            self.code = program.memoized_code()
+        else:
+            self.code = program.fused_code
+        if budget is not None and budget.max_string_length is not None:
+            self.code = [(Interpreter.exec_concat_limited, args) if handler is Interpreter.exec_concat
+                         else (handler, args) for handler, args in self.code]
+        # buffered program output
+        self.output = OutputBuffer(stdout, stderr)
+        # input for READ, opened lazily by the first READ
+        self.input_reader = InputReader(input_source, self.output)
+
+        # stack of values
+        self.data_stack = DataStack()
+
+        # stack of call frames, basically just a stack of program counter integers
+        self.call_stack = CallStack()
+        self.local_frame = Stack()
+
+        # frames are dictionaries {pure_name: Variable, ...}
+        self.global_frame = {}
+
+        self.temp_frame = {}
+        self.temp_frame_valid = False
+
+        self.inst_num = 0
+        # ExecutionStats of this run, collected only if given
+        self.stats = stats
+        # TraceRecorder of this run, used only if given
+        self.trace = trace
+
+    def run(self):
+        """Executes program and returns RunResult, output is flushed and input closed in any case"""
+        if self.checkpoint is not None:
+            self.checkpoint.start()
+        try:
+            # missing input file fails the run before any instruction is executed
+            self.input_reader.open()
+            if self.resume is not None:
+                self.restore(self.resume)
+            self.execute_code()
+        except InterpretExit as e:
+            return RunResult(e.code, e.message)
+        finally:
+            self.output.flush()
+            self.input_reader.close()
+            if self.checkpoint is not None:
+                self.checkpoint.close()
+        return RunResult()
+
+    def snapshot(self):
+        """Runtime state of the run for Checkpoint, taken between two instructions"""
+        return {
+            'version': __version__,
+            'program': self.program.fingerprint(),
+            'steps': self.steps,
+            'inst_num': self.inst_num,
+            'global_frame': self.global_frame,
+            'temp_frame': self.temp_frame,
+            'temp_frame_valid': self.temp_frame_valid,
+            'local_frames': self.local_frame.stack,
+            'call_stack': self.call_stack.stack,
+            'data_stack': self.data_stack.values,
+            'input': self.input_reader.position(),
+            'output': self.output.position(),
+        }
+
+    def restore(self, state: dict):
+        """Continues from state of snapshot, it must have been taken by the same version and program"""
+        if state.get('version') != __version__ or state.get('program') != self.program.fingerprint():
+            exit_error(11)
+        self.steps = state['steps']
+        self.inst_num = state['inst_num']
+        self.global_frame = state['global_frame']
+        self.temp_frame = state['temp_frame']
+        self.temp_frame_valid = state['temp_frame_valid']
+        self.local_frame.stack = state['local_frames']
+        self.call_stack.stack = state['call_stack']
+        self.data_stack.values = state['data_stack']
+        self.input_reader.restore(*state['input'])
+        self.output.restore(state['output'])
+
+    def get_input_line(self):
+        """Reads next line of input for READ, returns None at the end of input"""
+        return self.input_reader.read_line()
+
     def get_frame(self, arg: Argument):
         """Gets frame of variable"""
         if arg.frame == 'GF':
@@ -342,383 +2307,1102 @@ class Interpreter:
             if self.local_frame.is_empty():
                 exit_error(55)
                 return
-            return self.local_frame.top()[1]
+            return self.local_frame.top()
 
-    def get_value_and_type_of_symbol(self, arg: Argument):
-        """Gets value, type and initialized state from either variable from frame or constant"""
+    def get_value(self, arg: Argument):
+        """Gets value of either variable from frame or constant, None if the variable is not initialized"""
         if arg.kind == 'var':
-            var = self.get_var(arg)
-            return var.value, var.type_v, var.initialized
-
-        elif arg.kind in ('string', 'int', 'bool', 'nil'):
-            return arg.value, arg.kind, True
+            value = self.get_var(arg).value
+            if type(value) is StringBuffer:
+                return value.materialize()
+            return value
+        return arg.value
+
+    def get_value_or_buffer(self, arg: Argument):
+        """The same as get_value, but StringBuffer of a variable is returned as it is"""
+        if arg.kind == 'var':
+            return self.get_var(arg).value
+        return arg.value
 
     def get_var(self, arg):
         """Gets variable object from frame."""
         frame = self.get_frame(arg)
-        for var in frame:
-            if var.pure_name == arg.get_pure_name():
-                return var
-        exit_error(54)
-
-    def check_if_file_exists(self, path: str):
-        """Check for existence and privileges of a file on given path. Used during parsing input arguments."""
         try:
-            with open(path, 'r') as f:
-                pass
-        except IOError:
-            sys.exit(11)
-
-    def parse_input_arguments(self):
-        """Parses input arguments and saves the result into interpret attributes for later use"""
-        parser = argparse.ArgumentParser(description='Helping you', add_help=False)
-        parser.add_argument('--help', dest='help', action='store_true', default=False,
-                            help='show this message')
-        parser.add_argument('--input', type=str, dest='input_file', default=False, required=False)
-        parser.add_argument('--source', type=str, dest='source_file', default=False, required=False)
-        arguments = vars(parser.parse_args())
-
-        # argument checks
-        if arguments['help'] and not arguments['input_file'] and not arguments['source_file']:
-            self.print_help()
-            sys.exit(0)
-        elif arguments['help'] and (arguments['input_file'] or arguments['source_file']):
-            sys.exit(10)
-        # neither --input nor --source was set
-        elif not (arguments['input_file'] or arguments['source_file']):
-            sys.exit(10)
-
-        if arguments['input_file']:
-            self.input_is_file = True
-            self.check_if_file_exists(arguments['input_file'])
-            self.input_file = arguments['input_file']
-
-        if arguments['source_file']:
-            self.source_is_file = True
-            self.check_if_file_exists(arguments['source_file'])
-            self.source_file = arguments['source_file']
+            return frame[arg.pure_name]
+        except KeyError:
+            exit_error(54)
 
     def execute_code(self):
-        """Main function of code execution. To each given opcode executes given commands.
-        Ends when self.instnum is greater when the number of instructions or with 'EXIT' opcode """
-        while True:
-            if self.inst_num > len(self.instructions) - 1:
+        """Main function of code execution. Fetches pre-decoded handler of current instruction and calls it.
+        Ends when self.inst_num is greater than the number of instructions or with 'EXIT' opcode"""
+        if self.stats is not None:
+            self.execute_code_with_stats()
+            return
+        if self.trace is not None:
+            self.execute_code_with_trace()
+            return
+        if self.budget is not None or self.checkpoint is not None:
+            self.execute_code_in_chunks()
+            return
+        if self.compiled:
+            self.execute_compiled()
+            return
+        code = self.code
+        code_len = len(code)
+        while self.inst_num < code_len:
+            handler, args = code[self.inst_num]
+            handler(self, *args)
+
+    def execute_code_in_chunks(self):
+        """Same as execute_code, but runs instructions in chunks, checks self.budget and takes snapshots
+        of self.checkpoint after every chunk"""
+        budget = self.budget
+        checkpoint = self.checkpoint
+        code = self.code
+        code_len = len(code)
+        max_steps = None if budget is None else budget.max_steps
+        deadline = None if budget is None or budget.timeout is None else time.monotonic() + budget.timeout
+        check_interval = min(limits.check_interval for limits in (budget, checkpoint) if limits is not None)
+        steps = self.steps
+        next_snapshot = None if checkpoint is None or not checkpoint.interval else steps + checkpoint.interval
+        while self.inst_num < code_len:
+            chunk_end = steps + check_interval
+            if max_steps is not None:
+                if steps >= max_steps:
+                    exit_error(60)
+                chunk_end = min(chunk_end, max_steps)
+            if next_snapshot is not None:
+                chunk_end = min(chunk_end, next_snapshot)
+            while steps < chunk_end and self.inst_num < code_len:
+                handler, args = code[self.inst_num]
+                handler(self, *args)
+                steps += 1
+            self.steps = steps
+            if self.inst_num >= code_len:
                 break
-
-            curr_inst: Instruction = self.instructions[self.inst_num]
-            opcode = curr_inst.inst_opcode.upper()
-
-            if opcode == 'LABEL':
-                self.inst_num += 1
-            elif opcode == 'DEFVAR':
-                arg = curr_inst.args[0]
-                frame = self.get_frame(arg)
-                frame.append(Variable(name=arg.name))
-                self.inst_num += 1
-            elif opcode == 'MOVE':
-                var: Variable = self.get_var(curr_inst.args[0])
-                symbol = curr_inst.args[1]
-                value, type_v, initialized = self.get_value_and_type_of_symbol(symbol)
-                if not initialized:
-                    exit_error(56)
-                var.type_v, var.value, var.initialized = type_v, value, True
-                self.inst_num += 1
-            elif opcode == 'CALL':
-                label = curr_inst.args[0]
-                self.call_stack.push_value('int', self.inst_num + 1)
-                if label.value not in self.labels:
-                    exit_error(52)
-                self.inst_num = self.labels[label.value]
-            elif opcode == 'RETURN':
-                if self.call_stack.is_empty():
-                    exit_error(56)
-                    return
-                self.inst_num = self.call_stack.pop_value()[1]
-            elif opcode == 'CREATEFRAME':
-                self.temp_frame = []
-                self.temp_frame_valid = True
-                self.inst_num += 1
-            elif opcode == 'PUSHFRAME':
-                if not self.temp_frame_valid:
-                    exit_error(55)
-                self.local_frame.push_value('frame', self.temp_frame)
-                self.temp_frame_valid = False
-                self.inst_num += 1
-            elif opcode == 'POPFRAME':
-                if self.local_frame.is_empty():
-                    exit_error(55)
-                    return
-                self.temp_frame = self.local_frame.pop_value()[1]
-                self.temp_frame_valid = True
-                self.inst_num += 1
-            elif opcode == 'PUSHS':
-                value, type_v, initialized = self.get_value_and_type_of_symbol(curr_inst.args[0])
-                if not initialized:
-                    exit_error(56)
-                self.data_stack.push_value(type_v, value)
-                self.inst_num += 1
-            elif opcode == 'POPS':
-                var: Variable = self.get_var(curr_inst.args[0])
-                if self.data_stack.is_empty():
-                    exit_error(56)
-                var.type_v, var.value = self.data_stack.pop_value()
-                var.initialized = True
-                self.inst_num += 1
-            elif opcode in ('ADD', 'SUB', 'MUL', 'IDIV'):
-                var: Variable = self.get_var(curr_inst.args[0])
-                value1, type_v1, initialized1 = self.get_value_and_type_of_symbol(curr_inst.args[1])
-                value2, type_v2, initialized2 = self.get_value_and_type_of_symbol(curr_inst.args[2])
-                if not initialized1 or not initialized2:
-                    exit_error(56)
-                if type_v1 != 'int' or type_v2 != 'int':
-                    exit_error(53)
-                    return
-                var.type_v = 'int'
-                var.initialized = True
-                if opcode == 'ADD':
-                    var.value = value1 + value2
-                elif opcode == 'SUB':
-                    var.value = value1 - value2
-                elif opcode == 'MUL':
-                    var.value = value1 * value2
-                elif opcode == 'IDIV':
-                    if not value2:
-                        exit_error(57)
-                    var.value = value1 // value2
-                self.inst_num += 1
-            elif opcode in ('LT', 'GT', 'EQ'):
-                var = self.get_var(curr_inst.args[0])
-                value1, type_v1, initialized1 = self.get_value_and_type_of_symbol(curr_inst.args[1])
-                value2, type_v2, initialized2 = self.get_value_and_type_of_symbol(curr_inst.args[2])
-                if not initialized1 or not initialized2:
-                    exit_error(56)
-                if type_v1 not in ('int', 'string', 'bool', 'nil') and type_v2 not in ('int', 'string', 'bool', 'nil'):
-                    exit_error(53)
-                    return
-                var.type_v, var.initialized = 'bool', True
-
-                if (type_v1 == 'nil' or type_v2 == 'nil') and opcode != 'EQ':
-                    exit_error(53)
-
-                if opcode == 'LT':
-                    if type_v1 != type_v2:
-                        exit_error(53)
-                    var.value = 'true' if value1 < value2 else 'false'
-                elif opcode == 'GT':
-                    if type_v1 != type_v2:
-                        exit_error(53)
-                    var.value = 'true' if value1 > value2 else 'false'
-                elif opcode == 'EQ':
-                    var.value = 'true' if value1 == value2 else 'false'
-                self.inst_num += 1
-            elif opcode == 'READ':
-                var: Variable = self.get_var(curr_inst.args[0])
-                value1, type_v1, initialized = self.get_value_and_type_of_symbol(curr_inst.args[1])
-
-                line = self.get_input_line()
-                if line is None:
-                    var.type_v, var.value, var.initialized = 'nil', 'nil', True
-                else:
-                    if type_v1 == 'int':
-                        try:
-                            var.type_v, var.value, var.initialized = 'int', int(line), True
-                        except ValueError:
-                            var.type_v, var.value, var.initialized = 'nil', 'nil', True
-                    elif type_v1 == 'bool':
-                        var.type_v, var.value, var.initialized = 'bool', 'true' if line.lower() == 'true' else 'false', True
-                    elif type_v1 == 'string':
-                        var.type_v, var.value, var.initialized = 'string', line, True
-
-                self.inst_num += 1
-            elif opcode == 'WRITE':
-                value, type_v, initialized = self.get_value_and_type_of_symbol(curr_inst.args[0])
-                if not initialized:
-                    exit_error(56)
-                if type_v == 'nil':
-                    print('', end='')
-                else:
-                    print(value, end='')
-                self.inst_num += 1
-            elif opcode == 'AND':
-                var: Variable = self.get_var(curr_inst.args[0])
-                value1, type_v1, initialized1 = self.get_value_and_type_of_symbol(curr_inst.args[1])
-                value2, type_v2, initialized2 = self.get_value_and_type_of_symbol(curr_inst.args[2])
-                if not initialized1 or not initialized2:
-                    exit_error(56)
-                if type_v1 != type_v2 or type_v1 != 'bool':
-                    exit_error(53)
-                var.type_v = 'bool'
-                var.initialized = True
-                var.value = 'true' if value1 == 'true' and value2 == 'true' else 'false'
-                self.inst_num += 1
-            elif opcode == 'OR':
-                var: Variable = self.get_var(curr_inst.args[0])
-                value1, type_v1, initialized1 = self.get_value_and_type_of_symbol(curr_inst.args[1])
-                value2, type_v2, initialized2 = self.get_value_and_type_of_symbol(curr_inst.args[2])
-                if not initialized1 or not initialized2:
-                    exit_error(56)
-
-                if type_v1 != 'bool' or type_v2 != 'bool':
-                    exit_error(53)
-                var.type_v = 'bool'
-                var.initialized = True
-                var.value = 'true' if value1 == 'true' or value2 == 'true' else 'false'
-                self.inst_num += 1
-            elif opcode == 'NOT':
-                var: Variable = self.get_var(curr_inst.args[0])
-                value, type_v, initialized = self.get_value_and_type_of_symbol(curr_inst.args[1])
-                if not initialized:
-                    exit_error(56)
-                if type_v != 'bool':
-                    exit_error(53)
-                var.type_v = 'bool'
-                var.initialized = True
-                var.value = 'true' if value == 'false' else 'false'
-                self.inst_num += 1
-            elif opcode == 'INT2CHAR':
-                var: Variable = self.get_var(curr_inst.args[0])
-                value, type_v, initialized = self.get_value_and_type_of_symbol(curr_inst.args[1])
-                if not initialized:
-                    exit_error(56)
-                if type_v != 'int':
-                    exit_error(53)
+            if deadline is not None and time.monotonic() > deadline:
+                exit_error(61)
+            if budget is not None:
+                self.check_limits(steps)
+            if checkpoint is not None and (steps == next_snapshot or checkpoint.requested):
+                checkpoint.save(self.snapshot())
+                if next_snapshot is not None:
+                    next_snapshot = steps + checkpoint.interval
+
+    def execute_compiled(self):
+        """Same as execute_code, but runs whole blocks compiled to Python functions, each of them returns
+        number of the next instruction"""
+        blocks = self.program.compiled_blocks()
+        code_len = len(blocks)
+        index = self.inst_num
+        while index < code_len:
+            index = blocks[index](self)
+        self.inst_num = index
+
+    def execute_code_with_stats(self):
+        """Same as execute_code, but measures every executed instruction into self.stats"""
+        stats = self.stats
+        code = self.code
+        code_len = len(code)
+        instructions = self.program.instructions
+        counts = [0] * code_len
+        times = [0.0] * code_len
+        changes_vars = [inst.inst_opcode.upper() not in OPCODES_KEEPING_VARS for inst in instructions]
+        perf_counter = time.perf_counter
+        try:
+            while self.inst_num < code_len:
+                index = self.inst_num
+                handler, args = code[index]
+                start = perf_counter()
                 try:
-                    char = chr(value)
-                except ValueError:
-                    exit_error(58)
-                    return
-                var.type_v, var.value, var.initialized = 'string', char, True
-                self.inst_num += 1
-            elif opcode == 'STRI2INT':
-                var: Variable = self.get_var(curr_inst.args[0])
-                value1, type_v1, initialized1 = self.get_value_and_type_of_symbol(curr_inst.args[1])
-                value2, type_v2, initialized2 = self.get_value_and_type_of_symbol(curr_inst.args[2])
-                if not initialized1 or not initialized2:
-                    exit_error(56)
-                if type_v1 != 'string' or type_v2 != 'int':
-                    exit_error(53)
-                if value2 > len(value1) - 1:
-                    exit_error(58)
+                    handler(self, *args)
+                finally:
+                    times[index] += perf_counter() - start
+                    counts[index] += 1
+                if self.data_stack.stack_len > stats.max_data_stack:
+                    stats.max_data_stack = self.data_stack.stack_len
+                if self.call_stack.stack_len > stats.max_call_stack:
+                    stats.max_call_stack = self.call_stack.stack_len
+                if self.local_frame.stack_len > stats.max_frame_stack:
+                    stats.max_frame_stack = self.local_frame.stack_len
+                if changes_vars[index]:
+                    initialized_vars = self.count_initialized_vars()
+                    if initialized_vars > stats.max_initialized_vars:
+                        stats.max_initialized_vars = initialized_vars
+        finally:
+            stats.add_counts(instructions, counts, times)
+
+    def execute_code_with_trace(self):
+        """Same as execute_code, but logs every executed instruction into self.trace"""
+        trace = self.trace
+        code = self.code
+        code_len = len(code)
+        opcode_ids = trace.start(self.program)
+        orders = [inst.order for inst in self.program.instructions]
+        # constant operands are formatted once, variables are looked up before every execution
+        operands, payloads = [], []
+        for inst in self.program.instructions:
+            inst_operands = []
+            for arg in inst.args:
+                if arg.kind == 'var':
+                    inst_operands.append((arg.frame, arg.pure_name))
+                else:
+                    inst_operands.append((None, arg.kind if arg.value is None
+                                          else f'{arg.kind}@{value_to_str(arg.value)}'))
+            operands.append(inst_operands if any(frame for frame, _ in inst_operands) else None)
+            payloads.append('\x1f'.join(text for _, text in inst_operands).encode()[:255])
+        pack = TraceRecorder.record_format.pack
+        emit = trace.emit
+        try:
+            while self.inst_num < code_len:
+                index = self.inst_num
+                handler, args = code[index]
+                payload = payloads[index] if operands[index] is None else self.trace_operands(operands[index])
+                flags = TraceRecorder.END
                 try:
-                    new_value = ord(value1[value2])
-                except ValueError:
-                    exit_error(53)
-                    return
-                var.type_v, var.value, var.initialized = 'int', new_value, True
-                self.inst_num += 1
-            elif opcode == 'CONCAT':
-                var: Variable = self.get_var(curr_inst.args[0])
-                value1, type_v1, initialized1 = self.get_value_and_type_of_symbol(curr_inst.args[1])
-                value2, type_v2, initialized2 = self.get_value_and_type_of_symbol(curr_inst.args[2])
-                if not initialized1 or not initialized2:
-                    exit_error(56)
-                if type_v1 != 'string' or type_v2 != 'string':
-                    exit_error(53)
-                    return
-                var.type_v, var.value, var.initialized = 'string', value1 + value2, True
-                self.inst_num += 1
-            elif opcode == 'STRLEN':
-                var: Variable = self.get_var(curr_inst.args[0])
-                value, type_v, initialized = self.get_value_and_type_of_symbol(curr_inst.args[1])
-                if not initialized:
-                    exit_error(56)
-                if type_v != 'string':
-                    exit_error(53)
-                    return
-                var.type_v, var.value, var.initialized = 'int', len(value), True
-                self.inst_num += 1
-            elif opcode == 'GETCHAR':
-                var: Variable = self.get_var(curr_inst.args[0])
-                value1, type_v1, initialized1 = self.get_value_and_type_of_symbol(curr_inst.args[1])
-                value2, type_v2, initialized2 = self.get_value_and_type_of_symbol(curr_inst.args[2])
-                if not initialized1 or not initialized2:
-                    exit_error(56)
-                if type_v1 != 'string' or type_v2 != 'int':
-                    exit_error(53)
-                    return
-                if value2 > len(value1) - 1:
-                    exit_error(58)
-                var.type_v, var.value, var.initialized = 'string', value1[value2], True
-                self.inst_num += 1
-            elif opcode == 'SETCHAR':
-                var: Variable = self.get_var(curr_inst.args[0])
-                value1, type_v1, initialized1 = self.get_value_and_type_of_symbol(curr_inst.args[1])
-                value2, type_v2, initialized2 = self.get_value_and_type_of_symbol(curr_inst.args[2])
-
-                if not initialized1 or not initialized2 or not var.initialized:
-                    exit_error(56)
-                if var.type_v != 'string' or type_v1 != 'int' or type_v2 != 'string':
-                    exit_error(53)
-                    return
-                if value1 > len(var.value) - 1 or not value2:
-                    exit_error(58)
-                new_var_val = list(var.value)
-                new_var_val[value1] = value2[0]
-                new_var_val = ''.join(new_var_val)
-                var.type_v, var.value, var.initialized = 'string', new_var_val, True
-                self.inst_num += 1
-            elif opcode == 'DPRINT':
-                value1, type_v1, initialized = self.get_value_and_type_of_symbol(curr_inst.args[0])
-                if not initialized:
-                    exit_error(56)
-                if type_v1 == 'nil':
-                    print('', end='', file=sys.stderr)
+                    handler(self, *args)
+                    flags = 0 if self.inst_num == index + 1 else TraceRecorder.JUMP
+                finally:
+                    emit(pack(orders[index], opcode_ids[index], flags, len(payload)) + payload)
+        finally:
+            trace.close()
+
+    def trace_operands(self, inst_operands: list):
+        """Formats operands of an instruction with current values of its variables, without any checks"""
+        parts = []
+        for frame_name, text in inst_operands:
+            if frame_name is None:
+                parts.append(text)
+                continue
+            frame = None
+            if frame_name == 'GF':
+                frame = self.global_frame
+            elif frame_name == 'LF' and self.local_frame.stack_len:
+                frame = self.local_frame.stack[-1]
+            elif frame_name == 'TF' and self.temp_frame_valid:
+                frame = self.temp_frame
+            var = frame.get(text) if frame is not None else None
+            value = var.value if var is not None else None
+            if type(value) is StringBuffer:
+                value = value.materialize()
+            if value is None:
+                parts.append(f'{frame_name}@{text}')
+            else:
+                parts.append(f'{frame_name}@{text}={TYPE_NAMES[type(value)]}@{value_to_str(value)}')
+        return '\x1f'.join(parts).encode()[:255]
+
+    def count_string_length(self):
+        """Returns (total length of strings in all existing frames, number of visited variables)"""
+        frames = [self.global_frame] + self.local_frame.stack
+        if self.temp_frame_valid:
+            frames.append(self.temp_frame)
+        length = 0
+        visited = 0
+        for frame in frames:
+            visited += len(frame)
+            for var in frame.values():
+                if type(var.value) is str or type(var.value) is StringBuffer:
+                    length += len(var.value)
+        return length, visited
+
+    def check_limits(self, steps: int):
+        """Checks stack and string limits of self.budget, strings are counted after the more steps
+        the more variables were visited last time, so that counting takes a small part of the run"""
+        budget = self.budget
+        if budget.max_data_stack is not None and len(self.data_stack.values) > budget.max_data_stack:
+            exit_error(62)
+        if budget.max_call_stack is not None and len(self.call_stack.stack) > budget.max_call_stack:
+            exit_error(63)
+        if budget.max_string_length is not None and steps >= self.next_string_check:
+            length, visited = self.count_string_length()
+            if length > budget.max_string_length:
+                exit_error(64)
+            self.next_string_check = steps + 16 * visited
+
+    def count_initialized_vars(self):
+        """Counts initialized variables in all existing frames"""
+        frames = [self.global_frame] + self.local_frame.stack
+        if self.temp_frame_valid:
+            frames.append(self.temp_frame)
+        return sum(var.value is not None for frame in frames for var in frame.values())
+
+    def exec_label(self, label):
+        self.inst_num += 1
+
+    def exec_defvar(self, arg):
+        frame = self.get_frame(arg)
+        if arg.pure_name in frame:
+            # redefinition of variable in the same frame
+            exit_error(52)
+        frame[arg.pure_name] = Variable(name=arg.name)
+        self.inst_num += 1
+
+    def exec_move(self, dest, symbol):
+        var: Variable = self.get_var(dest)
+        value = self.get_value(symbol)
+        if value is None:
+            exit_error(56)
+        var.value = value
+        self.inst_num += 1
+
+    def exec_call(self, target):
+        self.call_stack.push_value(self.inst_num + 1)
+        self.inst_num = target
+
+    def exec_return(self):
+        if self.call_stack.is_empty():
+            exit_error(56)
+        self.inst_num = self.call_stack.pop_value()
+
+    def memo_key(self, subroutine: Subroutine):
+        """Key of a CALL of pure subroutine in self.memo, None if the call fails before anything is memoized"""
+        key_value = CallMemo.key_value
+        values = self.data_stack.values
+        if len(values) < subroutine.consumed:
+            return None
+        stack = tuple([key_value(value) for value in values[len(values) - subroutine.consumed:]])
+        if subroutine.needs_tf:
+            if not self.temp_frame_valid:
+                return None
+            frame = tuple([(name, key_value(var.value)) for name, var in self.temp_frame.items()])
+        else:
+            frame = ()
+        global_frame = self.global_frame
+        missing = CallMemo.missing
+        gf_values = tuple([missing if name not in global_frame else key_value(global_frame[name].value)
+                           for name in subroutine.gf_reads])
+        return subroutine.target, stack, frame, gf_values
+
+    def exec_call_memoized(self, target, subroutine):
+        memo = self.memo
+        key = self.memo_key(subroutine)
+        if key is not None:
+            result = memo.results.get(key)
+            if result is not None:
+                memo.results.move_to_end(key)
+                memo.hits += 1
+                frame, stack = result
+                values = self.data_stack.values
+                if subroutine.consumed:
+                    del values[len(values) - subroutine.consumed:]
+                values.extend(stack)
+                if frame is None:
+                    self.temp_frame_valid = False
                 else:
-                    print(value1, end='', file=sys.stderr)
-                self.inst_num += 1
-            elif opcode == 'BREAK':
-                print(f'Instruction number: {self.inst_num}')
+                    self.temp_frame = {pure_name: Variable(name, value) for pure_name, name, value in frame}
+                    self.temp_frame_valid = True
                 self.inst_num += 1
-            elif opcode == 'JUMP':
-                label = curr_inst.args[0]
-                if label.value not in self.labels:
-                    exit_error(52)
-                    return
-                self.inst_num = self.labels[label.value]
-            elif opcode in ('JUMPIFEQ', 'JUMPIFNEQ'):
-                label = curr_inst.args[0]
-                value1, type_v1, initialized1 = self.get_value_and_type_of_symbol(curr_inst.args[1])
-                value2, type_v2, initialized2 = self.get_value_and_type_of_symbol(curr_inst.args[2])
-                if not initialized1 or not initialized2:
-                    exit_error(56)
-                if label.value not in self.labels:
-                    exit_error(52)
-                    return
-                if not (type_v1 == type_v2 or type_v1 == 'nil' or type_v2 == 'nil'):
-                    exit_error(53)
-                else:
-                    if opcode == 'JUMPIFEQ':
-                        if value1 == value2:
-                            self.inst_num = self.labels[label.value]
-                        else:
-                            self.inst_num += 1
-                    elif opcode == 'JUMPIFNEQ':
-                        if value1 != value2:
-                            self.inst_num = self.labels[label.value]
-                        else:
-                            self.inst_num += 1
-            elif opcode == 'EXIT':
-                value, type_v, initialized = self.get_value_and_type_of_symbol(curr_inst.args[0])
-                if not initialized:
-                    exit_error(56)
-                if type_v != 'int':
-                    exit_error(53)
-                if value < 0 or value > 49:
-                    exit_error(57)
-                else:
-                    sys.exit(value)
+                return
+            memo.misses += 1
+            memo.pending.append((self.call_stack.stack_len + 1, key, subroutine))
+        self.call_stack.push_value(self.inst_num + 1)
+        self.inst_num = target
+
+    def exec_return_memoized(self):
+        if self.call_stack.is_empty():
+            exit_error(56)
+        pending = self.memo.pending
+        if pending and pending[-1][0] == self.call_stack.stack_len:
+            _, key, subroutine = pending.pop()
+            if self.temp_frame_valid:
+                frame = tuple([(pure_name, var.name, var.value.materialize() if type(var.value) is StringBuffer
+                                else var.value) for pure_name, var in self.temp_frame.items()])
+            else:
+                frame = None
+            values = self.data_stack.values
+            stack = tuple(values[len(values) - subroutine.produced:]) if subroutine.produced else ()
+            self.memo.store(key, (frame, stack))
+        self.inst_num = self.call_stack.pop_value()
+
+    def exec_createframe(self):
+        self.temp_frame = {}
+        self.temp_frame_valid = True
+        self.inst_num += 1
+
+    def exec_pushframe(self):
+        if not self.temp_frame_valid:
+            exit_error(55)
+        self.local_frame.push_value(self.temp_frame)
+        self.temp_frame_valid = False
+        self.inst_num += 1
 
-            elif opcode == 'TYPE':
-                var: Variable = self.get_var(curr_inst.args[0])
-                value, type_v, initialized = self.get_value_and_type_of_symbol(curr_inst.args[1])
-                if not initialized:
-                    var.type_v, var.value, var.initialized = 'string', '', True
-                else:
-                    var.type_v, var.value, var.initialized = 'string', type_v, True
-                self.inst_num += 1
+    def exec_popframe(self):
+        if self.local_frame.is_empty():
+            exit_error(55)
+        self.temp_frame = self.local_frame.pop_value()
+        self.temp_frame_valid = True
+        self.inst_num += 1
+
+    def exec_pushs(self, symbol):
+        value = self.get_value(symbol)
+        if value is None:
+            exit_error(56)
+        self.data_stack.push_value(value)
+        self.inst_num += 1
+
+    def exec_pops(self, dest):
+        var: Variable = self.get_var(dest)
+        if self.data_stack.is_empty():
+            exit_error(56)
+        var.value = self.data_stack.pop_value()
+        self.inst_num += 1
+
+    def exec_add(self, dest, symbol1, symbol2):
+        var: Variable = self.get_var(dest)
+        value1 = self.get_value(symbol1)
+        value2 = self.get_value(symbol2)
+        if value1 is None or value2 is None:
+            exit_error(56)
+        if type(value1) is not int or type(value2) is not int:
+            exit_error(53)
+        var.value = value1 + value2
+        self.inst_num += 1
+
+    def exec_sub(self, dest, symbol1, symbol2):
+        var: Variable = self.get_var(dest)
+        value1 = self.get_value(symbol1)
+        value2 = self.get_value(symbol2)
+        if value1 is None or value2 is None:
+            exit_error(56)
+        if type(value1) is not int or type(value2) is not int:
+            exit_error(53)
+        var.value = value1 - value2
+        self.inst_num += 1
+
+    def exec_mul(self, dest, symbol1, symbol2):
+        var: Variable = self.get_var(dest)
+        value1 = self.get_value(symbol1)
+        value2 = self.get_value(symbol2)
+        if value1 is None or value2 is None:
+            exit_error(56)
+        if type(value1) is not int or type(value2) is not int:
+            exit_error(53)
+        var.value = value1 * value2
+        self.inst_num += 1
+
+    def exec_idiv(self, dest, symbol1, symbol2):
+        var: Variable = self.get_var(dest)
+        value1 = self.get_value(symbol1)
+        value2 = self.get_value(symbol2)
+        if value1 is None or value2 is None:
+            exit_error(56)
+        if type(value1) is not int or type(value2) is not int:
+            exit_error(53)
+        if not value2:
+            exit_error(57)
+        var.value = value1 // value2
+        self.inst_num += 1
+
+    def exec_lt(self, dest, symbol1, symbol2):
+        var = self.get_var(dest)
+        value1 = self.get_value(symbol1)
+        value2 = self.get_value(symbol2)
+        if value1 is None or value2 is None:
+            exit_error(56)
+        if type(value1) is not type(value2) or value1 is NIL:
+            exit_error(53)
+        var.value = value1 < value2
+        self.inst_num += 1
+
+    def exec_gt(self, dest, symbol1, symbol2):
+        var = self.get_var(dest)
+        value1 = self.get_value(symbol1)
+        value2 = self.get_value(symbol2)
+        if value1 is None or value2 is None:
+            exit_error(56)
+        if type(value1) is not type(value2) or value1 is NIL:
+            exit_error(53)
+        var.value = value1 > value2
+        self.inst_num += 1
+
+    def exec_eq(self, dest, symbol1, symbol2):
+        var = self.get_var(dest)
+        value1 = self.get_value(symbol1)
+        value2 = self.get_value(symbol2)
+        if value1 is None or value2 is None:
+            exit_error(56)
+        # values of different types are never equal (bool True would be equal to int 1)
+        var.value = type(value1) is type(value2) and value1 == value2
+        self.inst_num += 1
+
+    def exec_read(self, dest, type_arg):
+        var: Variable = self.get_var(dest)
+        line = self.get_input_line()
+        if line is None:
+            var.value = NIL
+        elif type_arg.kind == 'int':
+            try:
+                var.value = int(line)
+            except ValueError:
+                var.value = NIL
+        elif type_arg.kind == 'bool':
+            var.value = line.lower() == 'true'
+        elif type_arg.kind == 'string':
+            var.value = line
+        self.inst_num += 1
+
+    def exec_write(self, symbol):
+        value = self.get_value(symbol)
+        if value is None:
+            exit_error(56)
+        if type(value) is str:
+            self.output.write(value)
+        elif value is not NIL:
+            self.output.write(value_to_str(value))
+        self.inst_num += 1
+
+    def exec_and(self, dest, symbol1, symbol2):
+        var: Variable = self.get_var(dest)
+        value1 = self.get_value(symbol1)
+        value2 = self.get_value(symbol2)
+        if value1 is None or value2 is None:
+            exit_error(56)
+        if type(value1) is not bool or type(value2) is not bool:
+            exit_error(53)
+        var.value = value1 and value2
+        self.inst_num += 1
+
+    def exec_or(self, dest, symbol1, symbol2):
+        var: Variable = self.get_var(dest)
+        value1 = self.get_value(symbol1)
+        value2 = self.get_value(symbol2)
+        if value1 is None or value2 is None:
+            exit_error(56)
+        if type(value1) is not bool or type(value2) is not bool:
+            exit_error(53)
+        var.value = value1 or value2
+        self.inst_num += 1
+
+    def exec_not(self, dest, symbol):
+        var: Variable = self.get_var(dest)
+        value = self.get_value(symbol)
+        if value is None:
+            exit_error(56)
+        if type(value) is not bool:
+            exit_error(53)
+        var.value = not value
+        self.inst_num += 1
+
+    def exec_int2char(self, dest, symbol):
+        var: Variable = self.get_var(dest)
+        value = self.get_value(symbol)
+        if value is None:
+            exit_error(56)
+        if type(value) is not int:
+            exit_error(53)
+        try:
+            char = chr(value)
+        except ValueError:
+            exit_error(58)
+            return
+        var.value = char
+        self.inst_num += 1
+
+    def exec_stri2int(self, dest, symbol1, symbol2):
+        var: Variable = self.get_var(dest)
+        value1 = self.get_value_or_buffer(symbol1)
+        value2 = self.get_value(symbol2)
+        if value1 is None or value2 is None:
+            exit_error(56)
+        if (type(value1) is not str and type(value1) is not StringBuffer) or type(value2) is not int:
+            exit_error(53)
+        if value2 > len(value1) - 1:
+            exit_error(58)
+        var.value = ord(value1[value2])
+        self.inst_num += 1
+
+    def exec_concat(self, dest, symbol1, symbol2):
+        var: Variable = self.get_var(dest)
+        value1 = self.get_value_or_buffer(symbol1)
+        value2 = self.get_value(symbol2)
+        if value1 is None or value2 is None:
+            exit_error(56)
+        if (type(value1) is not str and type(value1) is not StringBuffer) or type(value2) is not str:
+            exit_error(53)
+        if value1 is var.value and len(value1) >= STRING_BUFFER_MIN_LEN:
+            # appending to the variable itself, buffers are never shared, equal str is copied into a new one
+            if type(value1) is str:
+                value1 = var.value = StringBuffer(value1)
+            value1.append(value2)
+        elif type(value1) is StringBuffer:
+            var.value = value1.materialize() + value2
+        else:
+            var.value = value1 + value2
+        self.inst_num += 1
+
+    def exec_concat_limited(self, dest, symbol1, symbol2):
+        self.exec_concat(dest, symbol1, symbol2)
+        if len(self.get_var(dest).value) > self.budget.max_string_length:
+            exit_error(64)
+
+    def exec_strlen(self, dest, symbol):
+        var: Variable = self.get_var(dest)
+        value = self.get_value_or_buffer(symbol)
+        if value is None:
+            exit_error(56)
+        if type(value) is not str and type(value) is not StringBuffer:
+            exit_error(53)
+        var.value = len(value)
+        self.inst_num += 1
+
+    def exec_getchar(self, dest, symbol1, symbol2):
+        var: Variable = self.get_var(dest)
+        value1 = self.get_value_or_buffer(symbol1)
+        value2 = self.get_value(symbol2)
+        if value1 is None or value2 is None:
+            exit_error(56)
+        if (type(value1) is not str and type(value1) is not StringBuffer) or type(value2) is not int:
+            exit_error(53)
+        if value2 > len(value1) - 1:
+            exit_error(58)
+        var.value = value1[value2]
+        self.inst_num += 1
+
+    def exec_setchar(self, dest, symbol1, symbol2):
+        var: Variable = self.get_var(dest)
+        value1 = self.get_value(symbol1)
+        value2 = self.get_value(symbol2)
+        string = var.value
+        if value1 is None or value2 is None or string is None:
+            exit_error(56)
+        if (type(string) is not str and type(string) is not StringBuffer) or type(value1) is not int or \
+                type(value2) is not str:
+            exit_error(53)
+        if value1 > len(string) - 1 or not value2:
+            exit_error(58)
+        if type(string) is str:
+            string = var.value = StringBuffer(string)
+        string.set_char(value1, value2[0])
+        self.inst_num += 1
+
+    def exec_dprint(self, symbol):
+        value = self.get_value(symbol)
+        if value is None:
+            exit_error(56)
+        if value is not NIL:
+            self.output.write_err(value_to_str(value))
+        self.inst_num += 1
+
+    def exec_break(self):
+        self.output.write(f'Instruction number: {self.inst_num}\n')
+        self.inst_num += 1
+
+    def exec_jump(self, target):
+        self.inst_num = target
+
+    def exec_jumpifeq(self, target, symbol1, symbol2):
+        value1 = self.get_value(symbol1)
+        value2 = self.get_value(symbol2)
+        if value1 is None or value2 is None:
+            exit_error(56)
+        if type(value1) is not type(value2) and value1 is not NIL and value2 is not NIL:
+            exit_error(53)
+        if value1 == value2:
+            self.inst_num = target
+        else:
+            self.inst_num += 1
+
+    def exec_jumpifneq(self, target, symbol1, symbol2):
+        value1 = self.get_value(symbol1)
+        value2 = self.get_value(symbol2)
+        if value1 is None or value2 is None:
+            exit_error(56)
+        if type(value1) is not type(value2) and value1 is not NIL and value2 is not NIL:
+            exit_error(53)
+        if value1 != value2:
+            self.inst_num = target
+        else:
+            self.inst_num += 1
+
+    def exec_exit(self, symbol):
+        value = self.get_value(symbol)
+        if value is None:
+            exit_error(56)
+        if type(value) is not int:
+            exit_error(53)
+        if value < 0 or value > 49:
+            exit_error(57)
+        raise InterpretExit(value)
+
+    def exec_type(self, dest, symbol):
+        var: Variable = self.get_var(dest)
+        value = self.get_value(symbol)
+        var.value = '' if value is None else TYPE_NAMES[type(value)]
+        self.inst_num += 1
+
+    # STACK extension, operands are popped from the data stack (the second one from the top) and the result
+    # is pushed back, checks are the same as of the instructions working with variables
+
+    def exec_clears(self):
+        self.data_stack.clear()
+        self.inst_num += 1
+
+    def exec_adds(self):
+        value1, value2 = self.data_stack.pop_two()
+        if type(value1) is not int or type(value2) is not int:
+            exit_error(53)
+        self.data_stack.push_value(value1 + value2)
+        self.inst_num += 1
+
+    def exec_subs(self):
+        value1, value2 = self.data_stack.pop_two()
+        if type(value1) is not int or type(value2) is not int:
+            exit_error(53)
+        self.data_stack.push_value(value1 - value2)
+        self.inst_num += 1
+
+    def exec_muls(self):
+        value1, value2 = self.data_stack.pop_two()
+        if type(value1) is not int or type(value2) is not int:
+            exit_error(53)
+        self.data_stack.push_value(value1 * value2)
+        self.inst_num += 1
+
+    def exec_idivs(self):
+        value1, value2 = self.data_stack.pop_two()
+        if type(value1) is not int or type(value2) is not int:
+            exit_error(53)
+        if not value2:
+            exit_error(57)
+        self.data_stack.push_value(value1 // value2)
+        self.inst_num += 1
+
+    def exec_lts(self):
+        value1, value2 = self.data_stack.pop_two()
+        if type(value1) is not type(value2) or value1 is NIL:
+            exit_error(53)
+        self.data_stack.push_value(value1 < value2)
+        self.inst_num += 1
+
+    def exec_gts(self):
+        value1, value2 = self.data_stack.pop_two()
+        if type(value1) is not type(value2) or value1 is NIL:
+            exit_error(53)
+        self.data_stack.push_value(value1 > value2)
+        self.inst_num += 1
+
+    def exec_eqs(self):
+        value1, value2 = self.data_stack.pop_two()
+        self.data_stack.push_value(type(value1) is type(value2) and value1 == value2)
+        self.inst_num += 1
+
+    def exec_ands(self):
+        value1, value2 = self.data_stack.pop_two()
+        if type(value1) is not bool or type(value2) is not bool:
+            exit_error(53)
+        self.data_stack.push_value(value1 and value2)
+        self.inst_num += 1
+
+    def exec_ors(self):
+        value1, value2 = self.data_stack.pop_two()
+        if type(value1) is not bool or type(value2) is not bool:
+            exit_error(53)
+        self.data_stack.push_value(value1 or value2)
+        self.inst_num += 1
+
+    def exec_nots(self):
+        value = self.data_stack.pop_value()
+        if type(value) is not bool:
+            exit_error(53)
+        self.data_stack.push_value(not value)
+        self.inst_num += 1
+
+    def exec_int2chars(self):
+        value = self.data_stack.pop_value()
+        if type(value) is not int:
+            exit_error(53)
+        try:
+            char = chr(value)
+        except ValueError:
+            exit_error(58)
+            return
+        self.data_stack.push_value(char)
+        self.inst_num += 1
+
+    def exec_stri2ints(self):
+        value1, value2 = self.data_stack.pop_two()
+        if type(value1) is not str or type(value2) is not int:
+            exit_error(53)
+        if value2 > len(value1) - 1:
+            exit_error(58)
+        self.data_stack.push_value(ord(value1[value2]))
+        self.inst_num += 1
+
+    def exec_jumpifeqs(self, target):
+        value1, value2 = self.data_stack.pop_two()
+        if type(value1) is not type(value2) and value1 is not NIL and value2 is not NIL:
+            exit_error(53)
+        if value1 == value2:
+            self.inst_num = target
+        else:
+            self.inst_num += 1
+
+    def exec_jumpifneqs(self, target):
+        value1, value2 = self.data_stack.pop_two()
+        if type(value1) is not type(value2) and value1 is not NIL and value2 is not NIL:
+            exit_error(53)
+        if value1 != value2:
+            self.inst_num = target
+        else:
+            self.inst_num += 1
+
+    # fused handlers, each of them runs a sequence of instructions with the same checks in the same order
+
+    def exec_arithmetic_jumpif(self, operation, dest, symbol1, symbol2, target, symbol3, symbol4, when_equal):
+        # ADD, SUB or MUL followed by JUMPIFEQ or JUMPIFNEQ
+        var: Variable = self.get_var(dest)
+        value1 = self.get_value(symbol1)
+        value2 = self.get_value(symbol2)
+        if value1 is None or value2 is None:
+            exit_error(56)
+        if type(value1) is not int or type(value2) is not int:
+            exit_error(53)
+        var.value = operation(value1, value2)
+
+        value1 = self.get_value(symbol3)
+        value2 = self.get_value(symbol4)
+        if value1 is None or value2 is None:
+            exit_error(56)
+        if type(value1) is not type(value2) and value1 is not NIL and value2 is not NIL:
+            exit_error(53)
+        if (value1 == value2) == when_equal:
+            self.inst_num = target
+        else:
+            self.inst_num += 2
+
+    def exec_compare_jumpif(self, operation, dest, symbol1, symbol2, target, symbol3, symbol4, when_equal):
+        # LT or GT followed by JUMPIFEQ or JUMPIFNEQ
+        var = self.get_var(dest)
+        value1 = self.get_value(symbol1)
+        value2 = self.get_value(symbol2)
+        if value1 is None or value2 is None:
+            exit_error(56)
+        if type(value1) is not type(value2) or value1 is NIL:
+            exit_error(53)
+        var.value = operation(value1, value2)
+
+        value1 = self.get_value(symbol3)
+        value2 = self.get_value(symbol4)
+        if value1 is None or value2 is None:
+            exit_error(56)
+        if type(value1) is not type(value2) and value1 is not NIL and value2 is not NIL:
+            exit_error(53)
+        if (value1 == value2) == when_equal:
+            self.inst_num = target
+        else:
+            self.inst_num += 2
+
+    def exec_eq_jumpif(self, dest, symbol1, symbol2, target, symbol3, symbol4, when_equal):
+        # EQ followed by JUMPIFEQ or JUMPIFNEQ
+        var = self.get_var(dest)
+        value1 = self.get_value(symbol1)
+        value2 = self.get_value(symbol2)
+        if value1 is None or value2 is None:
+            exit_error(56)
+        var.value = type(value1) is type(value2) and value1 == value2
+
+        value1 = self.get_value(symbol3)
+        value2 = self.get_value(symbol4)
+        if value1 is None or value2 is None:
+            exit_error(56)
+        if type(value1) is not type(value2) and value1 is not NIL and value2 is not NIL:
+            exit_error(53)
+        if (value1 == value2) == when_equal:
+            self.inst_num = target
+        else:
+            self.inst_num += 2
+
+    def exec_getchar_jumpif(self, dest, symbol1, symbol2, target, symbol3, symbol4, when_equal):
+        # GETCHAR followed by JUMPIFEQ or JUMPIFNEQ
+        var: Variable = self.get_var(dest)
+        value1 = self.get_value_or_buffer(symbol1)
+        value2 = self.get_value(symbol2)
+        if value1 is None or value2 is None:
+            exit_error(56)
+        if (type(value1) is not str and type(value1) is not StringBuffer) or type(value2) is not int:
+            exit_error(53)
+        if value2 > len(value1) - 1:
+            exit_error(58)
+        var.value = value1[value2]
+
+        value1 = self.get_value(symbol3)
+        value2 = self.get_value(symbol4)
+        if value1 is None or value2 is None:
+            exit_error(56)
+        if type(value1) is not type(value2) and value1 is not NIL and value2 is not NIL:
+            exit_error(53)
+        if (value1 == value2) == when_equal:
+            self.inst_num = target
+        else:
+            self.inst_num += 2
 
-            else:
-                # unknown instruction
-                exit_error(32)
+    def exec_createframe_pushframe(self):
+        self.temp_frame = {}
+        self.local_frame.push_value(self.temp_frame)
+        self.temp_frame_valid = False
+        self.inst_num += 2
 
-interpret = Interpreter()
+    def exec_createframe_pushframe_call(self, target):
+        self.temp_frame = {}
+        self.local_frame.push_value(self.temp_frame)
+        self.temp_frame_valid = False
+        self.call_stack.push_value(self.inst_num + 3)
+        self.inst_num = target
+
+    def exec_popframe_return(self):
+        if self.local_frame.is_empty():
+            exit_error(55)
+        self.temp_frame = self.local_frame.pop_value()
+        self.temp_frame_valid = True
+        if self.call_stack.is_empty():
+            exit_error(56)
+        self.inst_num = self.call_stack.pop_value()
+
+    # instructions whose operands have the right types on every path, values of integer operands are never
+    # StringBuffer, so they do not have to be materialized
+
+    def exec_add_unchecked(self, dest, symbol1, symbol2):
+        var: Variable = self.get_var(dest)
+        var.value = self.get_value_or_buffer(symbol1) + self.get_value_or_buffer(symbol2)
+        self.inst_num += 1
+
+    def exec_sub_unchecked(self, dest, symbol1, symbol2):
+        var: Variable = self.get_var(dest)
+        var.value = self.get_value_or_buffer(symbol1) - self.get_value_or_buffer(symbol2)
+        self.inst_num += 1
+
+    def exec_mul_unchecked(self, dest, symbol1, symbol2):
+        var: Variable = self.get_var(dest)
+        var.value = self.get_value_or_buffer(symbol1) * self.get_value_or_buffer(symbol2)
+        self.inst_num += 1
+
+    def exec_idiv_unchecked(self, dest, symbol1, symbol2):
+        var: Variable = self.get_var(dest)
+        value1 = self.get_value_or_buffer(symbol1)
+        value2 = self.get_value_or_buffer(symbol2)
+        if not value2:
+            exit_error(57)
+        var.value = value1 // value2
+        self.inst_num += 1
+
+    def exec_lt_unchecked(self, dest, symbol1, symbol2):
+        var: Variable = self.get_var(dest)
+        var.value = self.get_value(symbol1) < self.get_value(symbol2)
+        self.inst_num += 1
+
+    def exec_gt_unchecked(self, dest, symbol1, symbol2):
+        var: Variable = self.get_var(dest)
+        var.value = self.get_value(symbol1) > self.get_value(symbol2)
+        self.inst_num += 1
+
+    def exec_eq_unchecked(self, dest, symbol1, symbol2):
+        var: Variable = self.get_var(dest)
+        var.value = self.get_value(symbol1) == self.get_value(symbol2)
+        self.inst_num += 1
+
+    def exec_jumpifeq_unchecked(self, target, symbol1, symbol2):
+        if self.get_value(symbol1) == self.get_value(symbol2):
+            self.inst_num = target
+        else:
+            self.inst_num += 1
+
+    def exec_jumpifneq_unchecked(self, target, symbol1, symbol2):
+        if self.get_value(symbol1) != self.get_value(symbol2):
+            self.inst_num = target
+        else:
+            self.inst_num += 1
+
+    # {opcode: (fused handler, operation), ...} of instructions fused with following JUMPIFEQ or JUMPIFNEQ
+    fused_jumpif_handlers = {
+        'ADD': (exec_arithmetic_jumpif, operator.add), 'SUB': (exec_arithmetic_jumpif, operator.sub),
+        'MUL': (exec_arithmetic_jumpif, operator.mul),
+        'LT': (exec_compare_jumpif, operator.lt), 'GT': (exec_compare_jumpif, operator.gt),
+        'EQ': (exec_eq_jumpif, None), 'GETCHAR': (exec_getchar_jumpif, None),
+    }
+
+    # {opcode: handler, ...} of instructions whose operand checks were proven redundant by TypeAnalysis
+    unchecked_handlers = {
+        'ADD': exec_add_unchecked, 'SUB': exec_sub_unchecked, 'MUL': exec_mul_unchecked,
+        'IDIV': exec_idiv_unchecked, 'LT': exec_lt_unchecked, 'GT': exec_gt_unchecked, 'EQ': exec_eq_unchecked,
+        'JUMPIFEQ': exec_jumpifeq_unchecked, 'JUMPIFNEQ': exec_jumpifneq_unchecked,
+    }
+
+    # {opcode: handler, ...}, used by decode_instructions
+    handlers = {
+        'LABEL': exec_label, 'DEFVAR': exec_defvar, 'MOVE': exec_move,
+        'CALL': exec_call, 'RETURN': exec_return,
+        'CREATEFRAME': exec_createframe, 'PUSHFRAME': exec_pushframe, 'POPFRAME': exec_popframe,
+        'PUSHS': exec_pushs, 'POPS': exec_pops,
+        'ADD': exec_add, 'SUB': exec_sub, 'MUL': exec_mul, 'IDIV': exec_idiv,
+        'LT': exec_lt, 'GT': exec_gt, 'EQ': exec_eq,
+        'AND': exec_and, 'OR': exec_or, 'NOT': exec_not,
+        'INT2CHAR': exec_int2char, 'STRI2INT': exec_stri2int,
+        'READ': exec_read, 'WRITE': exec_write,
+        'CONCAT': exec_concat, 'STRLEN': exec_strlen, 'GETCHAR': exec_getchar, 'SETCHAR': exec_setchar,
+        'TYPE': exec_type, 'DPRINT': exec_dprint, 'BREAK': exec_break,
+        'JUMP': exec_jump, 'JUMPIFEQ': exec_jumpifeq, 'JUMPIFNEQ': exec_jumpifneq, 'EXIT': exec_exit,
+        'CLEARS': exec_clears, 'ADDS': exec_adds, 'SUBS': exec_subs, 'MULS': exec_muls, 'IDIVS': exec_idivs,
+        'LTS': exec_lts, 'GTS': exec_gts, 'EQS': exec_eqs, 'ANDS': exec_ands, 'ORS': exec_ors, 'NOTS': exec_nots,
+        'INT2CHARS': exec_int2chars, 'STRI2INTS': exec_stri2ints,
+        'JUMPIFEQS': exec_jumpifeqs, 'JUMPIFNEQS': exec_jumpifneqs,
+    }
+
+
+def run_program(source=None, input_source=None, stdout=None, stderr=None, use_cache=False, cache_dir=CACHE_DIR,
+                stats=None, trace=None, optimize=False, dump_optimized=None, fusion_report=None, compiled=False,
+                source_format='xml', budget=None, memo=None, checkpoint=None, resume=None):
+    """Loads and runs program in one step, errors of loading are returned as RunResult too
+
+    Optimized program and fused sequences of instructions are written to dump_optimized and fusion_report
+    paths before the program is run if they are given. The run continues from snapshot file given as resume.
+    """
+    try:
+        program = Program.load(source, use_cache=use_cache, cache_dir=cache_dir,
+                               optimize=optimize or bool(dump_optimized), source_format=source_format)
+        if resume is not None:
+            resume = Checkpoint.load(resume)
+    except InterpretExit as e:
+        return RunResult(e.code, e.message)
+    if dump_optimized:
+        program.write_xml(dump_optimized)
+    if fusion_report:
+        program.write_fusion_report(fusion_report)
+    return program.run(input_source, stdout, stderr, stats, trace, compiled, budget, memo, checkpoint, resume)
+
+
+# input arguments which are limits of ExecutionBudget
+BUDGET_ARGUMENTS = ('max_steps', 'timeout', 'max_data_stack', 'max_call_stack', 'max_string_length')
+
+
+def print_help():
+    print("Usage: interpret.py [--help] {[--input=<input_file>] [--source=<source_file>]}"
+          " [--cache] [--cache-dir=<directory>] [--stats=<file>]"
+          " [--trace=<file> [--trace-ring=<records>]] [--optimize] [--dump-optimized=<file>]"
+          " [--fusion-report=<file>] [--compile] [--source-format=xml|ippcode]"
+          " [--memoize [--memo-size=<entries>] [--memo-report=<file>]]"
+          " [--checkpoint=<file> [--checkpoint-every=<steps>]] [--resume=<file>]"
+          " [--max-steps=<steps>] [--timeout=<seconds>] [--max-data-stack=<values>]"
+          " [--max-call-stack=<calls>] [--max-string-length=<characters>]")
+    print("Exceeded limits end the run with code 60 (steps), 61 (timeout), 62 (data stack), 63 (call stack)"
+          " or 64 (string length).")
+
+
+def check_if_file_exists(path: str):
+    """Check for existence and privileges of a file on given path. Used during parsing input arguments."""
+    try:
+        with open(path, 'r') as f:
+            pass
+    except IOError:
+        sys.exit(11)
+
+
+def parse_input_arguments():
+    """Parses and checks input arguments, returns them as a dictionary"""
+    parser = argparse.ArgumentParser(description='Helping you', add_help=False)
+    parser.add_argument('--help', dest='help', action='store_true', default=False,
+                        help='show this message')
+    parser.add_argument('--input', type=str, dest='input_file', default=False, required=False)
+    parser.add_argument('--source', type=str, dest='source_file', default=False, required=False)
+    parser.add_argument('--cache', dest='cache', action='store_true', default=False)
+    parser.add_argument('--no-cache', dest='no_cache', action='store_true', default=False)
+    parser.add_argument('--cache-dir', type=str, dest='cache_dir', default=False, required=False)
+    parser.add_argument('--stats', type=str, dest='stats_file', default=False, required=False)
+    parser.add_argument('--trace', type=str, dest='trace_file', default=False, required=False)
+    parser.add_argument('--trace-ring', type=int, dest='trace_ring', default=0, required=False)
+    parser.add_argument('--optimize', dest='optimize', action='store_true', default=False)
+    parser.add_argument('--dump-optimized', type=str, dest='dump_optimized', default=False, required=False)
+    parser.add_argument('--fusion-report', type=str, dest='fusion_report', default=False, required=False)
+    parser.add_argument('--compile', dest='compiled', action='store_true', default=False)
+    parser.add_argument('--source-format', type=str, dest='source_format', default='xml', required=False)
+    parser.add_argument('--memoize', dest='memoize', action='store_true', default=False)
+    parser.add_argument('--memo-size', type=int, dest='memo_size', default=MEMO_MAX_SIZE, required=False)
+    parser.add_argument('--memo-report', type=str, dest='memo_report', default=False, required=False)
+    parser.add_argument('--checkpoint', type=str, dest='checkpoint_file', default=False, required=False)
+    parser.add_argument('--checkpoint-every', type=int, dest='checkpoint_every', default=0, required=False)
+    parser.add_argument('--resume', type=str, dest='resume_file', default=False, required=False)
+    parser.add_argument('--max-steps', type=int, dest='max_steps', default=None, required=False)
+    parser.add_argument('--timeout', type=float, dest='timeout', default=None, required=False)
+    parser.add_argument('--max-data-stack', type=int, dest='max_data_stack', default=None, required=False)
+    parser.add_argument('--max-call-stack', type=int, dest='max_call_stack', default=None, required=False)
+    parser.add_argument('--max-string-length', type=int, dest='max_string_length', default=None, required=False)
+    arguments = vars(parser.parse_args())
+
+    # argument checks
+    if arguments['help'] and not arguments['input_file'] and not arguments['source_file']:
+        print_help()
+        sys.exit(0)
+    elif arguments['help'] and (arguments['input_file'] or arguments['source_file']):
+        sys.exit(10)
+    # neither --input nor --source was set
+    elif not (arguments['input_file'] or arguments['source_file']):
+        sys.exit(10)
+    # the program cache is off unless --cache or --cache-dir is given, --no-cache is kept for old scripts
+    if arguments['no_cache'] and (arguments['cache'] or arguments['cache_dir']):
+        sys.exit(10)
+    # statistics, trace and compiled blocks use different execution loops
+    if sum(bool(arguments[key]) for key in ('stats_file', 'trace_file', 'compiled')) > 1:
+        sys.exit(10)
+    if arguments['trace_ring'] < 0 or (arguments['trace_ring'] and not arguments['trace_file']):
+        sys.exit(10)
+    if arguments['source_format'] not in SOURCE_FORMATS:
+        sys.exit(10)
+    # memoized CALLs are run only by the main execution loop
+    if arguments['memoize'] and (arguments['stats_file'] or arguments['trace_file'] or arguments['compiled']):
+        sys.exit(10)
+    if arguments['memo_size'] < 1 or (arguments['memo_report'] and not arguments['memoize']):
+        sys.exit(10)
+    # snapshots are taken and restored only by the main execution loop
+    if (arguments['checkpoint_file'] or arguments['resume_file']) and \
+            (arguments['stats_file'] or arguments['trace_file'] or arguments['compiled']):
+        sys.exit(10)
+    if arguments['checkpoint_every'] < 0 or (arguments['checkpoint_every'] and not arguments['checkpoint_file']):
+        sys.exit(10)
+    # limits are checked only by the main execution loop
+    limits = [arguments[key] for key in BUDGET_ARGUMENTS if arguments[key] is not None]
+    if limits and (arguments['stats_file'] or arguments['trace_file'] or arguments['compiled']):
+        sys.exit(10)
+    if any(limit <= 0 for limit in limits):
+        sys.exit(10)
+
+    if arguments['input_file']:
+        check_if_file_exists(arguments['input_file'])
+
+    if arguments['source_file']:
+        check_if_file_exists(arguments['source_file'])
+
+    if arguments['resume_file']:
+        check_if_file_exists(arguments['resume_file'])
+    return arguments
+
+
+def main():
+    """Command line entry point, runs program given by input arguments and exits with its exit code"""
+    arguments = parse_input_arguments()
+    stats = ExecutionStats() if arguments['stats_file'] else None
+    trace = TraceRecorder(arguments['trace_file'], arguments['trace_ring']) if arguments['trace_file'] else None
+    memo = CallMemo(arguments['memo_size']) if arguments['memoize'] else None
+    budget = None
+    if any(arguments[key] is not None for key in BUDGET_ARGUMENTS):
+        budget = ExecutionBudget(**{key: arguments[key] for key in BUDGET_ARGUMENTS})
+    checkpoint = None
+    if arguments['checkpoint_file']:
+        checkpoint = Checkpoint(arguments['checkpoint_file'], arguments['checkpoint_every'] or None)
+    result = run_program(arguments['source_file'] or None, arguments['input_file'] or None,
+                         use_cache=arguments['cache'] or bool(arguments['cache_dir']),
+                         cache_dir=arguments['cache_dir'] or CACHE_DIR,
+                         stats=stats, trace=trace, optimize=arguments['optimize'],
+                         dump_optimized=arguments['dump_optimized'] or None,
+                         fusion_report=arguments['fusion_report'] or None, compiled=arguments['compiled'],
+                         source_format=arguments['source_format'], budget=budget, memo=memo, checkpoint=checkpoint,
+                         resume=arguments['resume_file'] or None)
+    if stats is not None:
+        stats.write(arguments['stats_file'])
+    if arguments['memo_report']:
+        memo.write(arguments['memo_report'])
+    if result.message:
+        print(result.message, file=sys.stderr)
+    sys.exit(result.exit_code)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,358 @@
+##
+# Copyright 2022
+#
+# @file interpret_server.py
+# @author xkrato61 Pavel Kratochvil
+#
+# @brief Runs interpret.py jobs received as JSON lines on stdin/stdout or a Unix socket in a pool of warm workers
+#
+##
+
+import argparse
+import collections
+import concurrent.futures
+import functools
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import queue
+import socketserver
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import interpret
+
+# exit codes of this script
+ERROR_PARAMS = 10
+ERROR_SOCKET = 12
+
+# seconds a worker gets after the timeout of its job before it is killed
+KILL_GRACE = 1.0
+# seconds after which a job without timeout is killed, so that it can not block its worker forever
+KILL_TIMEOUT = 300.0
+
+# limits of a job, the same as arguments of interpret.ExecutionBudget, timeout is in seconds and may be float
+LIMITS = ('max_steps', 'timeout', 'max_data_stack', 'max_call_stack', 'max_string_length')
+
+
+def handle_error(err_number):
+    """Prints error message to stderr and exits with given code"""
+    messages = {
+        ERROR_PARAMS: "Invalid or colliding input arguments.",
+        ERROR_SOCKET: "Socket can not be opened.",
+    }
+    print(messages[err_number], file=sys.stderr)
+    sys.exit(err_number)
+
+
+class ProgramLRU:
+    """ProgramLRU class
+
+    Loaded programs of one worker keyed by hash of their source, the least recently used one is dropped
+    when there are more than max_size of them.
+    """
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.programs = collections.OrderedDict()
+
+    def get(self, key: str):
+        program = self.programs.get(key)
+        if program is not None:
+            self.programs.move_to_end(key)
+        return program
+
+    def put(self, key: str, program):
+        self.programs[key] = program
+        if len(self.programs) > self.max_size:
+            self.programs.popitem(last=False)
+
+
+def run_job(job: dict, programs: ProgramLRU):
+    """Loads (or takes from programs) and runs program of a job inside a worker, returns the response"""
+    start = time.perf_counter()
+    stdout, stderr = io.StringIO(), io.StringIO()
+    key = hashlib.sha256(f'{job["source_format"]}:{job["source"]}'.encode()).hexdigest()
+    program = programs.get(key)
+    cached = program is not None
+    try:
+        if program is None:
+            program = interpret.Program.load(job['source'].encode(), source_format=job['source_format'])
+            programs.put(key, program)
+        # a budget makes the run check its limits, runs without any limit keep the faster main loop
+        budget = None
+        if any(job[name] is not None for name in LIMITS):
+            budget = interpret.ExecutionBudget(**{name: job[name] for name in LIMITS})
+        result = program.run(io.StringIO(job['input']), stdout, stderr, budget=budget)
+    except interpret.InterpretExit as e:
+        result = interpret.RunResult(e.code, e.message)
+    except Exception as e:
+        # crash of the interpreter itself, the same as a traceback of interpret.py process
+        result = interpret.RunResult(1, f'{type(e).__name__}: {e}')
+    if result.message:
+        stderr.write(result.message + '\n')
+    return {
+        'id': job['id'],
+        'exit_code': result.exit_code,
+        'stdout': stdout.getvalue(),
+        'stderr': stderr.getvalue(),
+        'cached': cached,
+        'duration': round(time.perf_counter() - start, 6),
+    }
+
+
+def worker_main(connection, cache_size: int):
+    """Entry point of a worker process, runs jobs received from connection until it gets None"""
+    programs = ProgramLRU(cache_size)
+    while True:
+        try:
+            job = connection.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        if job is None:
+            return
+        connection.send(run_job(job, programs))
+
+
+class Worker:
+    """Worker class
+
+    One warm worker process and the thread which feeds it jobs from the queue of the pool. A process which
+    does not finish its job in time or which dies is replaced by a new one.
+    """
+    def __init__(self, pool):
+        self.pool = pool
+        self.process = None
+        self.connection = None
+        self.start_process()
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    def start_process(self):
+        self.connection, child_connection = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=worker_main, args=(child_connection, self.pool.cache_size),
+                                               daemon=True)
+        self.process.start()
+        child_connection.close()
+
+    def restart_process(self):
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+        self.start_process()
+
+    def serve(self):
+        while True:
+            item = self.pool.jobs.get()
+            if item is None:
+                break
+            job, future = item
+            future.set_result(self.execute(job))
+        try:
+            self.connection.send(None)
+        except OSError:
+            pass
+        self.process.join()
+        self.connection.close()
+
+    def execute(self, job: dict):
+        """Sends job to the process and waits for its response, kills the process after timeout of the job
+        or after kill timeout of the pool if the job has none"""
+        wait = (self.pool.kill_timeout if job['timeout'] is None else job['timeout']) + KILL_GRACE
+        try:
+            self.connection.send(job)
+            if self.connection.poll(wait):
+                return self.connection.recv()
+            code = 61
+        except (EOFError, OSError):
+            code = 1
+        self.restart_process()
+        message = interpret.err_nums[61] if code == 61 else 'Worker process died.'
+        return {'id': job['id'], 'exit_code': code, 'stdout': '', 'stderr': message + '\n', 'cached': False,
+                'duration': None}
+
+
+class WorkerPool:
+    """WorkerPool class
+
+    Validates jobs and runs them on size warm workers. Limits of a job are limited by limits of the pool,
+    which are given as {name: limit, ...} of LIMITS. A job without timeout is killed after kill_timeout.
+    """
+    def __init__(self, size: int, cache_size: int, limits: dict, kill_timeout: float = KILL_TIMEOUT):
+        self.cache_size = cache_size
+        self.limits = limits
+        self.kill_timeout = kill_timeout
+        self.jobs = queue.Queue()
+        self.workers = [Worker(self) for _ in range(size)]
+
+    @staticmethod
+    def limit(job_value, pool_value):
+        """The smaller of two limits, None is no limit"""
+        if job_value is None or pool_value is None:
+            return pool_value if job_value is None else job_value
+        return min(job_value, pool_value)
+
+    def check_request(self, request):
+        """Turns request into a job, returns (job, None) or (None, error message)"""
+        if not isinstance(request, dict):
+            return None, 'Request is not an object.'
+        job = {
+            'id': request.get('id'),
+            'source': request.get('source'),
+            'source_format': request.get('source_format', 'xml'),
+            'input': request.get('input', ''),
+        }
+        for name in LIMITS:
+            job[name] = request.get(name)
+        if not isinstance(job['source'], str) or not isinstance(job['input'], str):
+            return None, 'Source and input must be strings.'
+        if job['source_format'] not in interpret.SOURCE_FORMATS:
+            return None, 'Unknown source format.'
+        for name in LIMITS:
+            kind = (int, float) if name == 'timeout' else int
+            if job[name] is not None and (not isinstance(job[name], kind) or isinstance(job[name], bool)
+                                          or job[name] <= 0):
+                return None, f'Invalid {name}.'
+            job[name] = self.limit(job[name], self.limits.get(name))
+        return job, None
+
+    def submit_line(self, line):
+        """Submits job given as one JSON line, returns Future of its response"""
+        future = concurrent.futures.Future()
+        try:
+            request = json.loads(line)
+        except ValueError:
+            future.set_result({'id': None, 'error': 'Invalid JSON.'})
+            return future
+        job, error = self.check_request(request)
+        if job is None:
+            future.set_result({'id': request.get('id') if isinstance(request, dict) else None, 'error': error})
+        else:
+            self.jobs.put((job, future))
+        return future
+
+    def close(self):
+        for _ in self.workers:
+            self.jobs.put(None)
+        for worker in self.workers:
+            worker.thread.join()
+
+
+def serve_lines(pool: WorkerPool, lines, write):
+    """Submits every non-empty line as a job, responses are written as soon as they are ready"""
+    lock = threading.Lock()
+    # one event per job, it is set after the response was written (or the client went away)
+    written = []
+
+    def respond(future, event):
+        try:
+            with lock:
+                write(json.dumps(future.result()) + '\n')
+        except (OSError, ValueError):
+            pass
+        finally:
+            event.set()
+
+    for line in lines:
+        if line.strip():
+            written.append(threading.Event())
+            pool.submit_line(line).add_done_callback(functools.partial(respond, event=written[-1]))
+    for event in written:
+        event.wait()
+
+
+def serve_stdio(pool: WorkerPool):
+    def write(text):
+        sys.stdout.write(text)
+        sys.stdout.flush()
+    serve_lines(pool, sys.stdin, write)
+
+
+class ConnectionHandler(socketserver.StreamRequestHandler):
+    """ConnectionHandler class
+
+    One client of the Unix socket, it sends jobs as JSON lines and gets responses on the same connection.
+    """
+    def handle(self):
+        def write(text):
+            self.wfile.write(text.encode())
+            self.wfile.flush()
+        try:
+            serve_lines(self.server.pool, (line.decode(errors='replace') for line in self.rfile), write)
+        except ConnectionResetError:
+            pass
+
+
+def serve_socket(pool: WorkerPool, path: str):
+    if os.path.exists(path):
+        os.unlink(path)
+    try:
+        server = socketserver.ThreadingUnixStreamServer(path, ConnectionHandler)
+    except OSError:
+        handle_error(ERROR_SOCKET)
+    server.daemon_threads = True
+    server.pool = pool
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.unlink(path)
+
+
+def parse_input_arguments():
+    """Parses and checks input arguments, returns them as a dictionary"""
+    parser = argparse.ArgumentParser(description='Runs interpret.py jobs in a pool of warm workers. Every job '
+                                                 'is a JSON line {"id", "source", "source_format", "input", '
+                                                 '"max_steps", "timeout", "max_data_stack", "max_call_stack", '
+                                                 '"max_string_length"}, every response a JSON line '
+                                                 '{"id", "exit_code", "stdout", "stderr", "cached", "duration"}.')
+    parser.add_argument('--socket', default=None, help='listen on Unix socket instead of stdin and stdout')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='number of worker processes, defaults to number of cores')
+    parser.add_argument('--cache-size', dest='cache_size', type=int, default=32,
+                        help='number of loaded programs kept by every worker, defaults to 32')
+    parser.add_argument('--max-steps', dest='max_steps', type=int, default=None,
+                        help='maximum number of executed instructions of one job')
+    parser.add_argument('--timeout', type=float, default=None, help='time limit of one job in seconds')
+    parser.add_argument('--kill-timeout', dest='kill_timeout', type=float, default=KILL_TIMEOUT,
+                        help='seconds after which a worker running a job without timeout is killed, '
+                             f'defaults to {KILL_TIMEOUT:g}')
+    parser.add_argument('--max-data-stack', dest='max_data_stack', type=int, default=None,
+                        help='maximum number of values on the data stack of one job')
+    parser.add_argument('--max-call-stack', dest='max_call_stack', type=int, default=None,
+                        help='maximum depth of the call stack of one job')
+    parser.add_argument('--max-string-length', dest='max_string_length', type=int, default=None,
+                        help='maximum total length of strings in variables of one job')
+    try:
+        arguments = vars(parser.parse_args())
+    except SystemExit as e:
+        if e.code:
+            handle_error(ERROR_PARAMS)
+        raise
+    if arguments['workers'] < 1 or arguments['cache_size'] < 1 or arguments['kill_timeout'] <= 0:
+        handle_error(ERROR_PARAMS)
+    if any(arguments[name] is not None and arguments[name] <= 0 for name in LIMITS):
+        handle_error(ERROR_PARAMS)
+    return arguments
+
+
+def main():
+    arguments = parse_input_arguments()
+    pool = WorkerPool(arguments['workers'], arguments['cache_size'], {name: arguments[name] for name in LIMITS},
+                      arguments['kill_timeout'])
+    try:
+        if arguments['socket']:
+            serve_socket(pool, arguments['socket'])
+        else:
+            serve_stdio(pool)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.close()
+
+
+if __name__ == '__main__':
+    main()
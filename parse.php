@@ -106,7 +106,7 @@ function instructionParseConst(string $arg, int $argOrder,bool $symbol = false):
         case "int":
             if (preg_match("/^[+-]?[\d]+$/", $parts[1])) {
                 $result = 1;
-            } else if (preg_match("/^0x[0-9a-fA-F]*$/", $parts[1])) {
+            } else if (preg_match("/^0x[0-9a-fA-F]+$/", $parts[1])) {
                 $result = 1;
             } else if (preg_match("/^0[1-7][0-7]*$/", $parts[1])) {
                 $result = 1;
@@ -0,0 +1,356 @@
+##
+# Copyright 2022
+#
+# @file run_tests.py
+# @author xkrato61 Pavel Kratochvil
+#
+# @brief Runs interpret.py tests (.src/.in/.out/.rc/.args) in parallel and generates HTML/JSON report
+#
+##
+
+import argparse
+import concurrent.futures
+import html
+import importlib.util
+import io
+import json
+import os
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+
+# errors of this script, the same as in test.php
+ERROR_PARAMS = 10
+ERROR_DIRECTORY = 41
+ERROR_INT_PATH = -4
+
+
+def handle_error(err_number):
+    """Prints error message to stderr and exits with exit code of given error"""
+    # {error: (exit code, message), ...}
+    messages = {
+        ERROR_PARAMS: (10, "Invalid or colliding input arguments."),
+        ERROR_DIRECTORY: (41, "Test directory does not exist."),
+        ERROR_INT_PATH: (41, "Interpret script does not exist."),
+    }
+    code, message = messages[err_number]
+    print(message, file=sys.stderr)
+    sys.exit(code)
+
+
+class TestCase:
+    """TestCase class
+
+    One test found in test directory and its result after it was run.
+    """
+    def __init__(self, path_to_test: str):
+        # path without extension, e.g. tests/write/write_nil
+        self.path_to_test = path_to_test
+        self.name = os.path.basename(path_to_test)
+        self.expected_code = 0
+        # extra interpret.py arguments of every run of the test, only the last run is evaluated
+        self.runs = [[]]
+        self.interpret_code = None
+        self.output_match = False
+        self.stderr = ''
+        self.duration = 0.0
+
+    @property
+    def passed(self):
+        # output is compared only for tests which are expected to end successfully
+        return self.interpret_code == self.expected_code and (self.expected_code != 0 or self.output_match)
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'path': self.path_to_test,
+            'expected_code': self.expected_code,
+            'interpret_code': self.interpret_code,
+            'output_match': self.output_match,
+            'passed': self.passed,
+            'stderr': self.stderr,
+            'duration': round(self.duration, 6),
+        }
+
+
+def add_missing_files(path_to_test: str):
+    """Creates missing .rc (code 0), .in and .out (both empty) files the same way test.php does"""
+    for suffix, content in (('.rc', '0'), ('.in', ''), ('.out', '')):
+        if not os.path.exists(path_to_test + suffix):
+            with open(path_to_test + suffix, 'w') as f:
+                f.write(content)
+
+
+def read_runs(path_to_test: str):
+    """Reads extra interpret.py arguments of runs from optional .args file, one run per non-empty line
+
+    {tmp} in arguments is replaced by a temporary directory shared by all runs of the test, so that a run
+    can use files (e.g. checkpoints) written by the previous one.
+    """
+    if not os.path.exists(path_to_test + '.args'):
+        return [[]]
+    with open(path_to_test + '.args') as f:
+        runs = [shlex.split(line) for line in f if line.strip()]
+    return runs or [[]]
+
+
+def find_tests(directory: str, recursive: bool):
+    """Finds all .src files in directory, adds missing files and returns sorted test cases"""
+    paths = []
+    if recursive:
+        for root, _, files in os.walk(directory):
+            paths.extend(os.path.join(root, f) for f in files if f.endswith('.src'))
+    else:
+        paths.extend(os.path.join(directory, f) for f in os.listdir(directory)
+                     if f.endswith('.src') and os.path.isfile(os.path.join(directory, f)))
+
+    test_cases = []
+    for path in sorted(paths):
+        test_case = TestCase(path[:-len('.src')])
+        add_missing_files(test_case.path_to_test)
+        with open(test_case.path_to_test + '.rc') as f:
+            test_case.expected_code = int(f.read().strip() or 0)
+        test_case.runs = read_runs(test_case.path_to_test)
+        test_cases.append(test_case)
+    return test_cases
+
+
+def read_expected_output(path_to_test: str):
+    with open(path_to_test + '.out', 'rb') as f:
+        return f.read()
+
+
+def run_cold(interpret_path: str, path_to_test: str, timeout: float, runs=([],)):
+    """Runs one test in new interpret.py processes, one per run, returns (code, stdout, stderr, duration)
+    of the last run"""
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        for arguments in runs:
+            command = [sys.executable, interpret_path, '--source=' + path_to_test + '.src',
+                       '--input=' + path_to_test + '.in'] + [argument.replace('{tmp}', tmp) for argument in arguments]
+            try:
+                process = subprocess.run(command, capture_output=True, timeout=timeout)
+                code, stdout, stderr = process.returncode, process.stdout, process.stderr
+            except subprocess.TimeoutExpired as e:
+                code, stdout, stderr = None, e.stdout or b'', b'Timeout expired.'
+                break
+    return code, stdout, stderr, time.perf_counter() - start
+
+
+# interpret module imported once by every warm worker process
+warm_interpret = None
+
+
+def init_warm_worker(interpret_path: str):
+    """Imports interpret.py into the worker process"""
+    global warm_interpret
+    spec = importlib.util.spec_from_file_location('interpret', interpret_path)
+    warm_interpret = importlib.util.module_from_spec(spec)
+    sys.modules['interpret'] = warm_interpret
+    spec.loader.exec_module(warm_interpret)
+
+
+def run_warm(path_to_test: str, timeout: float):
+    """Runs one test inside an already started worker, returns (code, stdout, stderr, duration)
+
+    The time limit is checked by ExecutionBudget of the run, code is None if it expired as for run_cold.
+    """
+    stdout, stderr = io.StringIO(), io.StringIO()
+    budget = warm_interpret.ExecutionBudget(timeout=timeout) if timeout is not None else None
+    start = time.perf_counter()
+    try:
+        with open(path_to_test + '.in') as input_file:
+            result = warm_interpret.run_program(path_to_test + '.src', input_file, stdout, stderr, budget=budget)
+        code = result.exit_code
+        if budget is not None and code == 61:
+            code = None
+            stderr.write('Timeout expired.\n')
+        elif result.message:
+            stderr.write(result.message + '\n')
+    except Exception as e:
+        # crash of the interpreter itself, the same as a traceback of interpret.py process
+        code = 1
+        stderr.write(f'{type(e).__name__}: {e}\n')
+    duration = time.perf_counter() - start
+    return code, stdout.getvalue().encode(), stderr.getvalue().encode(), duration
+
+
+class Tester:
+    """Tester class
+
+    Runs found test cases on a pool of workers and evaluates their results.
+    """
+    def __init__(self, test_cases: list, interpret_path: str, jobs: int, warm: bool, timeout: float):
+        self.test_cases = test_cases
+        self.interpret_path = interpret_path
+        self.jobs = jobs
+        self.warm = warm
+        self.timeout = timeout
+        self.duration = 0.0
+
+    def run(self):
+        start = time.perf_counter()
+        if self.warm:
+            executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.jobs, initializer=init_warm_worker, initargs=(self.interpret_path,))
+        else:
+            # workers only wait for their interpret.py processes, threads are enough
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.jobs)
+        with executor:
+            futures = {self.submit(executor, test_case): test_case for test_case in self.test_cases}
+            for future in concurrent.futures.as_completed(futures):
+                self.evaluate(futures[future], *future.result())
+        self.duration = time.perf_counter() - start
+
+    def submit(self, executor, test_case: TestCase):
+        # arguments of .args files select options of the command line, such tests are always run cold
+        if self.warm and test_case.runs == [[]]:
+            return executor.submit(run_warm, test_case.path_to_test, self.timeout)
+        return executor.submit(run_cold, self.interpret_path, test_case.path_to_test, self.timeout, test_case.runs)
+
+    @staticmethod
+    def evaluate(test_case: TestCase, code, stdout: bytes, stderr: bytes, duration: float):
+        test_case.interpret_code = code
+        test_case.output_match = stdout == read_expected_output(test_case.path_to_test)
+        test_case.stderr = stderr.decode(errors='replace').strip()
+        test_case.duration = duration
+
+
+class Report:
+    """Report class
+
+    Summary of all test results in the form of HTML page or JSON document.
+    """
+    style = """
+        body { font-family: Arial, Helvetica, sans-serif; }
+        table { border-collapse: collapse; margin: 0 auto 20px auto; }
+        td, th { border: 1px solid #ddd; padding: 5px; text-align: center; }
+        th { background-color: #04AA6D; }
+        tr:nth-child(even) { background-color: #f2f2f2; }
+        .ok { color: #04AA6D; font-weight: bold; }
+        .fail { color: #d11; font-weight: bold; }
+    """
+
+    def __init__(self, tester: Tester):
+        self.tester = tester
+        self.total = len(tester.test_cases)
+        self.successful = sum(1 for test_case in tester.test_cases if test_case.passed)
+
+    def percentage(self):
+        return int(self.successful / self.total * 100) if self.total else 0
+
+    def to_json(self):
+        return json.dumps({
+            'summary': {
+                'total': self.total,
+                'successful': self.successful,
+                'failed': self.total - self.successful,
+                'percentage': self.percentage(),
+                'duration': round(self.tester.duration, 3),
+                'jobs': self.tester.jobs,
+                'warm': self.tester.warm,
+            },
+            'tests': [test_case.to_dict() for test_case in self.tester.test_cases],
+        }, indent=2)
+
+    def to_html(self):
+        rows = []
+        for number, test_case in enumerate(self.tester.test_cases, 1):
+            result = '<span class="ok">OK</span>' if test_case.passed else '<span class="fail">FAIL</span>'
+            output = 'OK' if test_case.output_match else 'FAIL'
+            rows.append(f"""
+            <tr>
+                <td>{number}</td>
+                <td>{html.escape(test_case.name)}</td>
+                <td>{html.escape(test_case.path_to_test)}</td>
+                <td>{test_case.expected_code}</td>
+                <td>{test_case.interpret_code}</td>
+                <td>{result}</td>
+                <td>{output if test_case.expected_code == 0 else '-'}</td>
+                <td>{test_case.duration * 1000:.1f}</td>
+                <td>{html.escape(test_case.stderr)}</td>
+            </tr>""")
+        return f"""<html lang="en">
+<head>
+    <meta charset="utf-8">
+    <title>IPP Test Report</title>
+    <style>{self.style}</style>
+</head>
+<body>
+    <h1>Test Report</h1>
+    <table>
+        <tr><th>Total tests</th><th>Successful</th><th>Failed</th><th>Percentage successful</th><th>Time [s]</th></tr>
+        <tr>
+            <td>{self.total}</td>
+            <td>{self.successful}</td>
+            <td>{self.total - self.successful}</td>
+            <td>{self.percentage()}%</td>
+            <td>{self.tester.duration:.2f}</td>
+        </tr>
+    </table>
+    <table>
+        <tr>
+            <th>No.</th><th>Test File Name</th><th>Path to test file</th><th>Expected result code</th>
+            <th>RC interpret</th><th>Final result</th><th>Interpret output match</th><th>Time [ms]</th>
+            <th>Error message</th>
+        </tr>{''.join(rows)}
+    </table>
+</body>
+</html>
+"""
+
+
+def parse_input_arguments():
+    """Parses and checks input arguments, returns them as a dictionary"""
+    default_interpret = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'interpret.py')
+    parser = argparse.ArgumentParser(description='Runs interpret.py tests in parallel.')
+    parser.add_argument('--directory', default='./', help='path to test files directory, defaults to ./')
+    parser.add_argument('--recursive', action='store_true', help='looks for tests in all subdirectories')
+    parser.add_argument('--int-script', dest='int_script', default=default_interpret,
+                        help='path to interpret.py script')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                        help='number of workers, defaults to number of cores')
+    parser.add_argument('--warm', action='store_true',
+                        help='run tests inside long-lived workers with interpret.py imported once')
+    parser.add_argument('--timeout', type=float, default=None, help='time limit of one test in seconds')
+    parser.add_argument('--html', default=None, help='write HTML report to file instead of stdout')
+    parser.add_argument('--json', default=None, help='write JSON report to file')
+    try:
+        arguments = vars(parser.parse_args())
+    except SystemExit as e:
+        if e.code:
+            handle_error(ERROR_PARAMS)
+        raise
+
+    if arguments['jobs'] < 1 or (arguments['timeout'] is not None and arguments['timeout'] <= 0):
+        handle_error(ERROR_PARAMS)
+    if not os.path.isdir(arguments['directory']):
+        handle_error(ERROR_DIRECTORY)
+    if not os.path.isfile(arguments['int_script']):
+        handle_error(ERROR_INT_PATH)
+    return arguments
+
+
+def main():
+    arguments = parse_input_arguments()
+    test_cases = find_tests(arguments['directory'], arguments['recursive'])
+    tester = Tester(test_cases, os.path.abspath(arguments['int_script']), arguments['jobs'],
+                    arguments['warm'], arguments['timeout'])
+    tester.run()
+    report = Report(tester)
+
+    if arguments['html']:
+        with open(arguments['html'], 'w') as f:
+            f.write(report.to_html())
+    else:
+        sys.stdout.write(report.to_html())
+    if arguments['json']:
+        with open(arguments['json'], 'w') as f:
+            f.write(report.to_json())
+    sys.exit(0 if report.successful == report.total else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+##
+# Copyright 2022
+#
+# @file helpers.py
+# @author xkrato61 Pavel Kratochvil
+#
+# @brief Helpers shared by unittest tests of interpret.py and the scripts around it
+#
+##
+
+import os
+import subprocess
+import sys
+
+# directory with interpret.py and the other scripts
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INTERPRET_PATH = os.path.join(REPO_DIR, 'interpret.py')
+
+# tests import interpret.py and the scripts as modules
+if REPO_DIR not in sys.path:
+    sys.path.insert(0, REPO_DIR)
+
+
+def program_xml(*instructions):
+    """Returns XML of a program in the format of parse.php, instructions are (opcode, (type, text), ...) tuples"""
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', '<program language="IPPcode22">']
+    for order, (opcode, *args) in enumerate(instructions, 1):
+        lines.append(f'  <instruction order="{order}" opcode="{opcode}">')
+        for number, (kind, text) in enumerate(args, 1):
+            lines.append(f'    <arg{number} type="{kind}">{text}</arg{number}>')
+        lines.append('  </instruction>')
+    lines.append('</program>')
+    return ('\n'.join(lines) + '\n').encode()
+
+
+def run_script(script: str, *arguments, stdin: str = '', timeout: float = 60):
+    """Runs a script of the repository in a new process and returns its CompletedProcess with text output"""
+    return subprocess.run([sys.executable, os.path.join(REPO_DIR, script), *arguments], input=stdin,
+                          capture_output=True, text=True, timeout=timeout)
+
+
+def run_interpret(*arguments, stdin: str = '', timeout: float = 60):
+    """Runs interpret.py in a new process and returns its CompletedProcess with text output"""
+    return run_script('interpret.py', *arguments, stdin=stdin, timeout=timeout)
@@ -0,0 +1,88 @@
+##
+# Copyright 2022
+#
+# @file test_cache.py
+# @author xkrato61 Pavel Kratochvil
+#
+# @brief Tests of the on-disk program cache (--cache, --cache-dir)
+#
+##
+
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from helpers import program_xml, run_interpret
+
+import interpret
+
+SOURCE = program_xml(
+    ('DEFVAR', ('var', 'GF@x')),
+    ('MOVE', ('var', 'GF@x'), ('int', '41')),
+    ('ADD', ('var', 'GF@x'), ('var', 'GF@x'), ('int', '1')),
+    ('WRITE', ('var', 'GF@x')),
+)
+
+
+class ProgramCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmp.name, 'cache')
+        self.key = interpret.ProgramCache.source_key(SOURCE)
+        self.entry_path = interpret.ProgramCache(self.cache_dir).entry_path(self.key)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def load_and_run(self):
+        program = interpret.Program.load(SOURCE, use_cache=True, cache_dir=self.cache_dir)
+        stdout = io.StringIO()
+        result = program.run(stdout=stdout)
+        return result.exit_code, stdout.getvalue()
+
+    def test_hit(self):
+        self.assertEqual(self.load_and_run(), (0, '42'))
+        self.assertTrue(os.path.exists(self.entry_path))
+        self.assertEqual(os.stat(self.cache_dir).st_mode & 0o777, 0o700)
+        # cached program is used without parsing the source again
+        with mock.patch.object(interpret.Program, 'parse_source', side_effect=AssertionError('cache miss')):
+            self.assertEqual(self.load_and_run(), (0, '42'))
+
+    def test_corrupt_entry_ignored(self):
+        os.makedirs(self.cache_dir, mode=0o700)
+        with open(self.entry_path, 'wb') as f:
+            f.write(b'not a pickle')
+        self.assertEqual(self.load_and_run(), (0, '42'))
+        # corrupt entry is replaced by the parsed program
+        self.assertIsNotNone(interpret.ProgramCache(self.cache_dir).load(self.key))
+
+    def test_untrusted_directory_not_used(self):
+        os.makedirs(self.cache_dir)
+        os.chmod(self.cache_dir, 0o777)
+        self.assertEqual(self.load_and_run(), (0, '42'))
+        self.assertFalse(os.path.exists(self.entry_path))
+
+    def test_eviction(self):
+        cache = interpret.ProgramCache(self.cache_dir, max_size=1)
+        program = interpret.Program.load(SOURCE)
+        cache.store(self.key, program.instructions, program.labels)
+        # a single entry over max_size is evicted right away
+        self.assertFalse(os.path.exists(self.entry_path))
+        self.assertEqual(cache.read_size(), 0)
+
+    def test_command_line(self):
+        source_path = os.path.join(self.tmp.name, 'program.src')
+        with open(source_path, 'wb') as f:
+            f.write(SOURCE)
+        for _ in range(2):
+            process = run_interpret('--source=' + source_path, '--cache-dir=' + self.cache_dir)
+            self.assertEqual((process.returncode, process.stdout), (0, '42'))
+        self.assertEqual(len([name for name in os.listdir(self.cache_dir) if name.endswith('.ippc')]), 1)
+        process = run_interpret('--source=' + source_path, '--cache', '--no-cache')
+        self.assertEqual(process.returncode, 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
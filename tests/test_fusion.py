@@ -0,0 +1,93 @@
+##
+# Copyright 2022
+#
+# @file test_fusion.py
+# @author xkrato61 Pavel Kratochvil
+#
+# @brief Tests of fused instruction sequences on programs of tests/fusion
+#
+##
+
+import glob
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from helpers import program_xml, run_interpret
+
+import interpret
+
+FUSION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fusion')
+
+
+class FusionTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_same_results_as_unfused(self):
+        """Fused programs end with the same code and the same output up to an error as unfused ones"""
+        # runs with statistics execute every single instruction
+        stats_path = os.path.join(self.tmp.name, 'stats.json')
+        for path in sorted(glob.glob(os.path.join(FUSION_DIR, '*.src'))):
+            path_to_test = path[:-4]
+            with open(path_to_test + '.out') as f:
+                expected_output = f.read()
+            with open(path_to_test + '.rc') as f:
+                expected_code = int(f.read())
+            for arguments in ((), ('--stats=' + stats_path,)):
+                with self.subTest(test=os.path.basename(path_to_test), arguments=arguments):
+                    process = run_interpret('--source=' + path, '--input=' + path_to_test + '.in', *arguments)
+                    self.assertEqual((process.returncode, process.stdout), (expected_code, expected_output))
+
+    def test_enter_in_the_middle(self):
+        """Instructions of a sequence after the first one run unfused if the sequence is entered in the middle"""
+        program = interpret.Program.load(program_xml(
+            ('DEFVAR', ('var', 'GF@x')),
+            ('MOVE', ('var', 'GF@x'), ('int', '1')),
+            ('ADD', ('var', 'GF@x'), ('var', 'GF@x'), ('int', '1')),
+            ('JUMPIFEQ', ('label', 'end'), ('var', 'GF@x'), ('int', '1')),
+            ('WRITE', ('var', 'GF@x')),
+            ('CREATEFRAME',),
+            ('PUSHFRAME',),
+            ('CALL', ('label', 'end')),
+            ('LABEL', ('label', 'end')),
+        ))
+        self.assertEqual(program.fusions, [('ADD+JUMPIFEQ', 3), ('CREATEFRAME+PUSHFRAME+CALL', 6)])
+        # JUMPIFEQ without the ADD before it compares x as it is
+        stdout = io.StringIO()
+        interpreter = interpret.Interpreter(program, stdout=stdout)
+        interpreter.global_frame['x'] = interpret.Variable('x', 5)
+        interpreter.inst_num = 3
+        self.assertEqual(interpreter.run().exit_code, 0)
+        self.assertEqual(stdout.getvalue(), '5')
+        # PUSHFRAME without the CREATEFRAME before it has no temporary frame to push
+        interpreter = interpret.Interpreter(program, stdout=io.StringIO())
+        interpreter.inst_num = 6
+        self.assertEqual(interpreter.run().exit_code, 55)
+
+    def test_fusion_report(self):
+        report_path = os.path.join(self.tmp.name, 'report.json')
+        process = run_interpret('--source=' + os.path.join(FUSION_DIR, 'call_return.src'),
+                                '--fusion-report=' + report_path)
+        self.assertEqual((process.returncode, process.stdout), (0, '6'))
+        with open(report_path) as f:
+            report = json.load(f)
+        self.assertEqual(report['fused'], 5)
+        self.assertEqual(report['patterns'], {'CREATEFRAME+PUSHFRAME+CALL': 2, 'ADD+JUMPIFNEQ': 1,
+                                              'CREATEFRAME+PUSHFRAME': 1, 'POPFRAME+RETURN': 1})
+        self.assertEqual([site['order'] for site in report['sites']], [4, 8, 10, 13, 23])
+
+    def test_label_breaks_sequence(self):
+        """CREATEFRAME and PUSHFRAME with a label between them are not fused"""
+        with open(os.path.join(FUSION_DIR, 'label_in_sequence.src'), 'rb') as f:
+            program = interpret.Program.load(f.read())
+        self.assertEqual(program.fusions, [('CREATEFRAME+PUSHFRAME', 3)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+##
+# Copyright 2022
+#
+# @file test_ippcode.py
+# @author xkrato61 Pavel Kratochvil
+#
+# @brief Tests of the IPPcode22 source text front-end (--source-format=ippcode) against the XML one
+#
+##
+
+import os
+import unittest
+
+from helpers import run_interpret
+
+import interpret
+
+IPPCODE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ippcode')
+# program.src is IPPcode22 source text, program.xml is its XML in the format of parse.php
+TEXT_PATH = os.path.join(IPPCODE_DIR, 'program.src')
+XML_PATH = os.path.join(IPPCODE_DIR, 'program.xml')
+INPUT_PATH = os.path.join(IPPCODE_DIR, 'program.in')
+
+
+def instructions(program: interpret.Program):
+    return [(inst.order, inst.inst_opcode, [(arg.kind, arg.value, arg.name, arg.arg_order) for arg in inst.args])
+            for inst in program.instructions]
+
+
+class IppcodeTest(unittest.TestCase):
+    def test_same_instructions(self):
+        text_program = interpret.Program.load(TEXT_PATH, source_format='ippcode')
+        xml_program = interpret.Program.load(XML_PATH)
+        self.assertEqual(instructions(text_program), instructions(xml_program))
+        self.assertEqual(text_program.labels, xml_program.labels)
+
+    def test_same_output(self):
+        text_process = run_interpret('--source=' + TEXT_PATH, '--input=' + INPUT_PATH, '--source-format=ippcode')
+        xml_process = run_interpret('--source=' + XML_PATH, '--input=' + INPUT_PATH)
+        self.assertEqual(text_process.returncode, 0)
+        self.assertEqual((text_process.returncode, text_process.stdout), (xml_process.returncode, xml_process.stdout))
+
+    def test_program_on_stdin(self):
+        with open(TEXT_PATH) as f:
+            source = f.read()
+        process = run_interpret('--input=' + INPUT_PATH, '--source-format=ippcode', stdin=source)
+        with open(os.path.join(IPPCODE_DIR, 'program.out')) as f:
+            self.assertEqual((process.returncode, process.stdout), (0, f.read()))
+
+    def test_unknown_format(self):
+        self.assertEqual(run_interpret('--source=' + TEXT_PATH, '--source-format=text').returncode, 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
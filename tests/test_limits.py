@@ -0,0 +1,66 @@
+##
+# Copyright 2022
+#
+# @file test_limits.py
+# @author xkrato61 Pavel Kratochvil
+#
+# @brief Tests of execution budgets given through the API and the command line
+#
+##
+
+import io
+import os
+import tempfile
+import unittest
+
+from helpers import program_xml, run_interpret
+
+import interpret
+
+ENDLESS_SOURCE = program_xml(
+    ('LABEL', ('label', 'loop')),
+    ('JUMP', ('label', 'loop')),
+)
+
+
+class LimitsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.program = interpret.Program.load(ENDLESS_SOURCE)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_budget(self):
+        for compiled in (False, True):
+            with self.subTest(compiled=compiled):
+                # compiled is ignored by runs with a budget
+                budget = interpret.ExecutionBudget(max_steps=100, check_interval=10)
+                result = self.program.run(stdout=io.StringIO(), compiled=compiled, budget=budget)
+                self.assertEqual(result.exit_code, 60)
+
+    def test_instrumented_run_rejects_limits(self):
+        path = os.path.join(self.tmp.name, 'file')
+        limits = ({'budget': interpret.ExecutionBudget(max_steps=100)}, {'checkpoint': interpret.Checkpoint(path)})
+        instruments = ({'stats': interpret.ExecutionStats()}, {'trace': interpret.TraceRecorder(path)})
+        for limit in limits:
+            for instrument in instruments:
+                with self.subTest(limit=limit, instrument=instrument):
+                    with self.assertRaises(ValueError):
+                        self.program.run(stdout=io.StringIO(), **limit, **instrument)
+        self.assertFalse(os.path.exists(path))
+
+    def test_command_line_rejects_limits(self):
+        source_path = os.path.join(self.tmp.name, 'program.src')
+        with open(source_path, 'wb') as f:
+            f.write(ENDLESS_SOURCE)
+        path = os.path.join(self.tmp.name, 'file')
+        for arguments in (('--max-steps=100', '--stats=' + path), ('--timeout=1', '--trace=' + path),
+                          ('--max-steps=100', '--compile'), ('--checkpoint=' + path, '--stats=' + path),
+                          ('--max-steps=0',), ('--timeout=-1',)):
+            with self.subTest(arguments=arguments):
+                self.assertEqual(run_interpret('--source=' + source_path, *arguments).returncode, 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+##
+# Copyright 2022
+#
+# @file test_optimize.py
+# @author xkrato61 Pavel Kratochvil
+#
+# @brief Tests of the peephole optimizer (--optimize) on programs of tests/optimize
+#
+##
+
+import glob
+import os
+import unittest
+
+from helpers import run_interpret
+
+import interpret
+
+OPTIMIZE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'optimize')
+
+
+def optimized(name: str):
+    """Returns [(order, opcode), ...] of optimized program of tests/optimize"""
+    with open(os.path.join(OPTIMIZE_DIR, name + '.src'), 'rb') as f:
+        program = interpret.Program.load(f.read(), optimize=True)
+    return [(inst.order, inst.inst_opcode) for inst in program.instructions]
+
+
+def operands(name: str, order: int):
+    """Returns names of variables and values of constants of optimized instruction with given order"""
+    with open(os.path.join(OPTIMIZE_DIR, name + '.src'), 'rb') as f:
+        program = interpret.Program.load(f.read(), optimize=True)
+    inst = next(inst for inst in program.instructions if inst.order == order)
+    return [arg.name if arg.kind == 'var' else arg.value for arg in inst.args]
+
+
+class OptimizerTest(unittest.TestCase):
+    def test_fold_constants(self):
+        instructions = optimized('fold_constants')
+        # every operation on constants is a MOVE of its result, JUMPIFEQ and JUMPIFNEQ on constants are gone
+        self.assertEqual({opcode for _, opcode in instructions}, {'DEFVAR', 'MOVE', 'WRITE'})
+        self.assertEqual(operands('fold_constants', 2), ['GF@x', 42])
+        self.assertEqual(operands('fold_constants', 22), ['GF@x', 'A'])
+        self.assertEqual(operands('fold_constants', 26), ['GF@x', 'foo bar'])
+
+    def test_thread_jumps(self):
+        self.assertEqual(operands('thread_jumps', 3), ['third'])
+        self.assertEqual(operands('thread_jumps', 15), ['sub_body'])
+        self.assertEqual(operands('thread_jumps', 17), ['third', 'GF@n', 3])
+        self.assertEqual(operands('thread_jumps', 18), ['back'])
+        orders = [order for order, _ in optimized('thread_jumps')]
+        # JUMP first, JUMP second and JUMP sub_body are threaded, JUMP next jumps to the next instruction
+        self.assertFalse({8, 11, 13, 19} & set(orders))
+
+    def test_simplify_moves(self):
+        instructions = optimized('simplify_moves')
+        orders = [order for order, _ in instructions]
+        # MOVE GF@x GF@x is removed, PUSHS/POPS pairs become MOVEs
+        self.assertNotIn(5, orders)
+        self.assertEqual(operands('simplify_moves', 6), ['GF@y', 'a b'])
+        self.assertEqual(operands('simplify_moves', 8), ['GF@z', 'GF@x'])
+        self.assertEqual(operands('simplify_moves', 18), ['GF@x', 'LF@t'])
+        # LF@t is not known to be initialized after PUSHFRAME
+        self.assertEqual(operands('simplify_moves', 17), ['LF@t', 'LF@t'])
+
+    def test_remove_unreachable_and_unused_labels(self):
+        instructions = optimized('remove_unreachable')
+        self.assertEqual(instructions, [(1, 'DEFVAR'), (3, 'MOVE'), (10, 'WRITE'), (11, 'CALL'), (12, 'WRITE'),
+                                        (13, 'EXIT'), (15, 'LABEL'), (17, 'WRITE'), (18, 'RETURN')])
+
+    def test_break_keeps_instructions(self):
+        self.assertEqual([order for order, _ in optimized('break')], list(range(1, 8)))
+
+    def test_errors_kept(self):
+        # instructions which fail are not rewritten
+        self.assertIn((4, 'ADD'), optimized('error_53'))
+        self.assertIn((4, 'MOVE'), optimized('error_54'))
+        self.assertEqual(optimized('error_56')[3:5], [(4, 'PUSHS'), (5, 'POPS')])
+        self.assertIn((3, 'MOVE'), optimized('error_56_move'))
+        self.assertIn((7, 'IDIV'), optimized('error_57'))
+        self.assertIn((4, 'GETCHAR'), optimized('error_58'))
+
+    def test_same_results(self):
+        """Optimized programs end with the same code and the same output up to an error"""
+        for path in sorted(glob.glob(os.path.join(OPTIMIZE_DIR, '*.src'))):
+            path_to_test = path[:-4]
+            with open(path_to_test + '.out') as f:
+                expected_output = f.read()
+            with open(path_to_test + '.rc') as f:
+                expected_code = int(f.read())
+            for arguments in ((), ('--optimize',)):
+                with self.subTest(test=os.path.basename(path_to_test), arguments=arguments):
+                    process = run_interpret('--source=' + path, '--input=' + path_to_test + '.in', *arguments)
+                    self.assertEqual((process.returncode, process.stdout), (expected_code, expected_output))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+##
+# Copyright 2022
+#
+# @file test_run_tests.py
+# @author xkrato61 Pavel Kratochvil
+#
+# @brief Tests of the parallel test runner run_tests.py
+#
+##
+
+import json
+import os
+import tempfile
+import unittest
+
+from helpers import program_xml, run_script
+
+WRITE_PROGRAM = program_xml(
+    ('DEFVAR', ('var', 'GF@x')),
+    ('MOVE', ('var', 'GF@x'), ('int', '1')),
+    ('ADD', ('var', 'GF@x'), ('var', 'GF@x'), ('int', '1')),
+    ('WRITE', ('var', 'GF@x')),
+)
+ENDLESS_PROGRAM = program_xml(
+    ('LABEL', ('label', 'loop')),
+    ('JUMP', ('label', 'loop')),
+)
+
+
+class RunTestsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tmp.name, 'tests')
+        os.mkdir(self.directory)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def add_test(self, name: str, source: bytes, out: str = '', rc: int = 0, args: str = None):
+        path = os.path.join(self.directory, name)
+        with open(path + '.src', 'wb') as f:
+            f.write(source)
+        with open(path + '.out', 'w') as f:
+            f.write(out)
+        with open(path + '.rc', 'w') as f:
+            f.write(str(rc))
+        if args is not None:
+            with open(path + '.args', 'w') as f:
+                f.write(args)
+
+    def run_tests(self, *arguments):
+        """Runs run_tests.py on the test directory, returns its exit code and {test name: result, ...}"""
+        json_path = os.path.join(self.tmp.name, 'report.json')
+        process = run_script('run_tests.py', '--directory=' + self.directory, '--json=' + json_path,
+                             '--html=' + os.path.join(self.tmp.name, 'report.html'), *arguments)
+        with open(json_path) as f:
+            report = json.load(f)
+        return process.returncode, {test['name']: test for test in report['tests']}
+
+    def test_passing_and_failing(self):
+        self.add_test('ok', WRITE_PROGRAM, out='2')
+        self.add_test('wrong_output', WRITE_PROGRAM, out='3')
+        self.add_test('wrong_code', WRITE_PROGRAM, rc=53)
+        for arguments in ((), ('--warm',)):
+            code, tests = self.run_tests(*arguments)
+            self.assertEqual(code, 1)
+            self.assertTrue(tests['ok']['passed'])
+            self.assertFalse(tests['wrong_output']['passed'])
+            self.assertEqual(tests['wrong_code']['interpret_code'], 0)
+            self.assertFalse(tests['wrong_code']['passed'])
+
+    def test_args_share_tmp_directory(self):
+        # the first run writes the program to {tmp}, the second one runs it instead of .src
+        self.add_test('dump', WRITE_PROGRAM, out='2',
+                      args='--dump-optimized={tmp}/program.xml\n\n--source={tmp}/program.xml\n')
+        # only the last run is evaluated
+        self.add_test('last_run', WRITE_PROGRAM, rc=10, args='\n--stats=x --trace=y\n')
+        for arguments in ((), ('--warm',)):
+            code, tests = self.run_tests(*arguments)
+            self.assertEqual(code, 0)
+            self.assertTrue(tests['dump']['passed'])
+            self.assertEqual(tests['last_run']['interpret_code'], 10)
+
+    def test_timeout(self):
+        self.add_test('endless', ENDLESS_PROGRAM)
+        for arguments in ((), ('--warm',)):
+            code, tests = self.run_tests('--timeout=1', *arguments)
+            self.assertEqual(code, 1)
+            # exceeded time limit of a warm run (exit code 61) is reported the same as a killed cold run
+            self.assertIsNone(tests['endless']['interpret_code'])
+            self.assertEqual(tests['endless']['stderr'], 'Timeout expired.')
+            self.assertFalse(tests['endless']['passed'])
+
+    def test_missing_interpreter(self):
+        process = run_script('run_tests.py', '--directory=' + self.directory,
+                             '--int-script=' + os.path.join(self.tmp.name, 'interpret.py'))
+        self.assertEqual(process.returncode, 41)
+        process = run_script('run_tests.py', '--directory=' + os.path.join(self.tmp.name, 'missing'))
+        self.assertEqual(process.returncode, 41)
+        process = run_script('run_tests.py', '--directory=' + self.directory, '--jobs=0')
+        self.assertEqual(process.returncode, 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+##
+# Copyright 2022
+#
+# @file test_server.py
+# @author xkrato61 Pavel Kratochvil
+#
+# @brief Tests of the server mode interpret_server.py
+#
+##
+
+import json
+import unittest
+
+from helpers import program_xml, run_script
+
+import interpret_server
+
+SOURCE = program_xml(
+    ('DEFVAR', ('var', 'GF@x')),
+    ('READ', ('var', 'GF@x'), ('type', 'int')),
+    ('MUL', ('var', 'GF@x'), ('var', 'GF@x'), ('int', '2')),
+    ('WRITE', ('var', 'GF@x')),
+).decode()
+ENDLESS_SOURCE = program_xml(
+    ('LABEL', ('label', 'loop')),
+    ('JUMP', ('label', 'loop')),
+).decode()
+
+
+class ServerTest(unittest.TestCase):
+    def setUp(self):
+        self.pools = []
+
+    def tearDown(self):
+        for pool in self.pools:
+            pool.close()
+
+    def start_pool(self, limits=None, kill_timeout=interpret_server.KILL_TIMEOUT):
+        pool = interpret_server.WorkerPool(1, 4, limits or {}, kill_timeout)
+        self.pools.append(pool)
+        return pool
+
+    @staticmethod
+    def submit(pool, **request):
+        return pool.submit_line(json.dumps(request)).result(timeout=60)
+
+    def test_run_and_cache(self):
+        pool = self.start_pool()
+        response = self.submit(pool, id=1, source=SOURCE, input='21\n')
+        self.assertEqual((response['id'], response['exit_code'], response['stdout']), (1, 0, '42'))
+        self.assertFalse(response['cached'])
+        # the same source is not loaded again, a different input gives a different output
+        response = self.submit(pool, id=2, source=SOURCE, input='5\n')
+        self.assertEqual((response['exit_code'], response['stdout'], response['cached']), (0, '10', True))
+
+    def test_invalid_requests(self):
+        pool = self.start_pool()
+        for request, error in (({'id': 1, 'source': SOURCE, 'max_steps': 0}, 'Invalid max_steps.'),
+                               ({'id': 2, 'source': SOURCE, 'max_call_stack': 1.5}, 'Invalid max_call_stack.'),
+                               ({'id': 3, 'source': SOURCE, 'timeout': True}, 'Invalid timeout.'),
+                               ({'id': 4, 'source': SOURCE, 'timeout': '1'}, 'Invalid timeout.'),
+                               ({'id': 5, 'source': 1}, 'Source and input must be strings.'),
+                               ({'id': 6, 'source': SOURCE, 'source_format': 'php'}, 'Unknown source format.')):
+            with self.subTest(request=request):
+                self.assertEqual(self.submit(pool, **request), {'id': request['id'], 'error': error})
+        self.assertEqual(pool.submit_line('{').result(), {'id': None, 'error': 'Invalid JSON.'})
+        self.assertEqual(pool.submit_line('[]').result(), {'id': None, 'error': 'Request is not an object.'})
+
+    def test_limits(self):
+        pool = self.start_pool(limits={'max_steps': 100})
+        # limit of the pool applies to jobs without their own one
+        response = self.submit(pool, id=1, source=ENDLESS_SOURCE)
+        self.assertEqual(response['exit_code'], 60)
+        response = self.submit(pool, id=2, source=ENDLESS_SOURCE, max_steps=1000000, timeout=0.2)
+        self.assertEqual(response['exit_code'], 60)
+        # time limit is checked by the run itself, the worker process is kept
+        pool = self.start_pool()
+        process = pool.workers[0].process
+        response = self.submit(pool, id=3, source=ENDLESS_SOURCE, timeout=0.2)
+        self.assertEqual(response['exit_code'], 61)
+        self.assertIs(pool.workers[0].process, process)
+
+    def test_stuck_job_replaces_worker(self):
+        pool = self.start_pool(kill_timeout=0.5)
+        process = pool.workers[0].process
+        response = self.submit(pool, id=1, source=ENDLESS_SOURCE)
+        self.assertEqual((response['exit_code'], response['duration']), (61, None))
+        self.assertIsNot(pool.workers[0].process, process)
+        self.assertFalse(process.is_alive())
+        # the new process runs following jobs
+        response = self.submit(pool, id=2, source=SOURCE, input='1\n')
+        self.assertEqual((response['exit_code'], response['stdout'], response['cached']), (0, '2', False))
+
+    def test_stdio(self):
+        lines = [json.dumps({'id': number, 'source': SOURCE, 'input': f'{number}\n'}) for number in range(3)]
+        process = run_script('interpret_server.py', '--workers=2', stdin='\n'.join(lines + ['{}']) + '\n')
+        self.assertEqual(process.returncode, 0)
+        responses = sorted((json.loads(line) for line in process.stdout.splitlines()), key=lambda r: str(r['id']))
+        self.assertEqual([(response['id'], response['stdout']) for response in responses[:3]],
+                         [(0, '0'), (1, '2'), (2, '4')])
+        self.assertEqual(responses[3], {'id': None, 'error': 'Source and input must be strings.'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+##
+# Copyright 2022
+#
+# @file test_trace.py
+# @author xkrato61 Pavel Kratochvil
+#
+# @brief Tests of execution traces (--trace, --trace-ring) and their decoder trace_decode.py
+#
+##
+
+import os
+import tempfile
+import unittest
+
+from helpers import program_xml, run_interpret, run_script
+
+# loop of 10 iterations closed by a stack jump, every iteration calls a subroutine
+SOURCE = program_xml(
+    ('DEFVAR', ('var', 'GF@i')),
+    ('MOVE', ('var', 'GF@i'), ('int', '0')),
+    ('LABEL', ('label', 'loop')),
+    ('CALL', ('label', 'inc')),
+    ('PUSHS', ('var', 'GF@i')),
+    ('PUSHS', ('int', '10')),
+    ('JUMPIFNEQS', ('label', 'loop')),
+    ('WRITE', ('var', 'GF@i')),
+    ('EXIT', ('int', '0')),
+    ('LABEL', ('label', 'inc')),
+    ('ADD', ('var', 'GF@i'), ('var', 'GF@i'), ('int', '1')),
+    ('RETURN',),
+)
+# DEFVAR, MOVE, 10 iterations of 8 instructions, WRITE and EXIT
+STEPS = 84
+
+
+class TraceTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source_path = os.path.join(self.tmp.name, 'program.src')
+        with open(self.source_path, 'wb') as f:
+            f.write(SOURCE)
+        self.trace_path = os.path.join(self.tmp.name, 'trace.bin')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def trace(self, *arguments):
+        process = run_interpret('--source=' + self.source_path, '--trace=' + self.trace_path, *arguments)
+        self.assertEqual((process.returncode, process.stdout), (0, '10'))
+
+    def decode(self, *arguments):
+        process = run_script('trace_decode.py', self.trace_path, *arguments)
+        self.assertEqual(process.returncode, 0, process.stderr)
+        return process.stdout.splitlines()
+
+    def test_plain(self):
+        self.trace()
+        lines = self.decode()
+        self.assertEqual(len(lines), STEPS)
+        self.assertEqual(lines[1].split(), ['1', '2', 'MOVE', 'GF@i', 'int@0'])
+        self.assertEqual(lines[3].split(), ['3', '4', 'CALL', 'label@inc', '->', 'jump'])
+        self.assertEqual(lines[-1].split(), [str(STEPS - 1), '9', 'EXIT', 'int@0', '->', 'end'])
+
+    def test_summary(self):
+        self.trace()
+        lines = self.decode('--summary')
+        self.assertEqual(lines[0], f'Executed instructions: {STEPS}')
+        loops = lines[lines.index('Top loops:') + 1].split()
+        # loop closed by JUMPIFNEQS is taken back 9 times
+        self.assertEqual(loops[:6], ['loop', 'orders', '3-7', 'iterations', '9', 'steps'])
+        calls = lines[lines.index('Top called labels:') + 1].split()
+        self.assertEqual(calls, ['inc', 'calls', '10'])
+
+    def test_ring(self):
+        self.trace('--trace-ring=5')
+        lines = self.decode()
+        self.assertEqual([line.split()[2] for line in lines], ['PUSHS', 'PUSHS', 'JUMPIFNEQS', 'WRITE', 'EXIT'])
+        lines = self.decode('--summary', '--top=1')
+        self.assertEqual(lines[:2], ['Executed instructions: 5', '(only the last 5 records were kept)'])
+
+    def test_invalid_trace(self):
+        with open(self.trace_path, 'wb') as f:
+            f.write(b'not a trace')
+        self.assertEqual(run_script('trace_decode.py', self.trace_path).returncode, 12)
+        os.remove(self.trace_path)
+        self.assertEqual(run_script('trace_decode.py', self.trace_path).returncode, 11)
+
+
+if __name__ == '__main__':
+    unittest.main()
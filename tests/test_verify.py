@@ -0,0 +1,42 @@
+##
+# Copyright 2022
+#
+# @file test_verify.py
+# @author xkrato61 Pavel Kratochvil
+#
+# @brief Tests of verification of loaded programs on programs of tests/verify
+#
+##
+
+import glob
+import os
+import unittest
+
+from helpers import run_interpret
+
+import interpret
+
+VERIFY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'verify')
+
+
+class VerifyTest(unittest.TestCase):
+    def test_invalid_programs(self):
+        """Invalid programs fail when they are loaded, before any instruction writes its output"""
+        for path in sorted(glob.glob(os.path.join(VERIFY_DIR, '*.src'))):
+            with open(path[:-4] + '.rc') as f:
+                expected_code = int(f.read())
+            if not expected_code:
+                continue
+            with self.subTest(test=os.path.basename(path)):
+                with open(path, 'rb') as f:
+                    source = f.read()
+                with self.assertRaises(interpret.InterpretExit) as context:
+                    interpret.Program.load(source)
+                self.assertEqual(context.exception.code, expected_code)
+                for arguments in ((), ('--optimize',), ('--compile',)):
+                    process = run_interpret('--source=' + path, *arguments)
+                    self.assertEqual((process.returncode, process.stdout), (expected_code, ''))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+##
+# Copyright 2022
+#
+# @file trace_decode.py
+# @author xkrato61 Pavel Kratochvil
+#
+# @brief Decodes execution traces written by interpret.py --trace to text and hot path summaries
+#
+##
+
+import argparse
+import collections
+import json
+import struct
+import sys
+
+# exit codes of this script
+ERROR_PARAMS = 10
+ERROR_FILE = 11
+ERROR_FORMAT = 12
+
+# flags of a record, the same as TraceRecorder.JUMP and TraceRecorder.END in interpret.py
+FLAG_JUMP = 1
+FLAG_END = 2
+
+# jump opcodes of traces whose header does not list them
+JUMP_OPCODES = ('JUMP', 'JUMPIFEQ', 'JUMPIFNEQ', 'JUMPIFEQS', 'JUMPIFNEQS')
+
+
+def handle_error(err_number):
+    """Prints error message to stderr and exits with given code"""
+    messages = {
+        ERROR_PARAMS: "Invalid or colliding input arguments.",
+        ERROR_FILE: "Trace file can not be opened.",
+        ERROR_FORMAT: "Invalid trace file.",
+    }
+    print(messages[err_number], file=sys.stderr)
+    sys.exit(err_number)
+
+
+class TraceReader:
+    """TraceReader class
+
+    Reads header and records of a trace file.
+    """
+    def __init__(self, file):
+        self.file = file
+        if file.read(4) != b'IPPT':
+            handle_error(ERROR_FORMAT)
+        try:
+            header_len, = struct.unpack('<I', file.read(4))
+            self.header = json.loads(file.read(header_len))
+            self.record = struct.Struct(self.header['record'])
+        except (struct.error, ValueError, KeyError):
+            handle_error(ERROR_FORMAT)
+        self.opcodes = self.header['opcodes']
+        self.jump_opcodes = set(self.header.get('jumps', JUMP_OPCODES))
+        # {order: label, ...}
+        self.labels = {order: label for label, order in self.header['labels'].items()}
+
+    def __iter__(self):
+        """Yields (order, opcode, flags, operands) of every record"""
+        read = self.file.read
+        unpack = self.record.unpack
+        size = self.record.size
+        while True:
+            chunk = read(size)
+            if not chunk:
+                return
+            if len(chunk) != size:
+                handle_error(ERROR_FORMAT)
+            order, opcode_id, flags, payload_len = unpack(chunk)
+            payload = read(payload_len).decode(errors='replace')
+            yield order, self.opcodes[opcode_id], flags, payload.split('\x1f') if payload else []
+
+
+def print_text(reader: TraceReader, out):
+    """Prints one line per executed instruction"""
+    for step, (order, opcode, flags, operands) in enumerate(reader):
+        line = f'{step:>10} {order:>6} {opcode:<11} {" ".join(operands)}'
+        if flags & FLAG_JUMP:
+            line += '  -> jump'
+        if flags & FLAG_END:
+            line += '  -> end'
+        out.write(line.rstrip() + '\n')
+
+
+def print_summary(reader: TraceReader, top: int, out):
+    """Prints executed instructions per opcode and order, the hottest loops and the most called labels"""
+    opcode_counts = collections.Counter()
+    order_counts = collections.Counter()
+    # {(target_order, source_order): count, ...} of taken backward jumps
+    back_edges = collections.Counter()
+    calls = collections.Counter()
+    steps = 0
+    previous = None
+    for order, opcode, flags, _ in reader:
+        steps += 1
+        opcode_counts[opcode] += 1
+        order_counts[order] += 1
+        if previous is not None and previous[2] & FLAG_JUMP:
+            if previous[1] in reader.jump_opcodes and order <= previous[0]:
+                back_edges[order, previous[0]] += 1
+            elif previous[1] == 'CALL':
+                calls[order] += 1
+        previous = order, opcode, flags
+
+    out.write(f'Executed instructions: {steps}\n')
+    if reader.header.get('ring_size'):
+        out.write(f'(only the last {reader.header["ring_size"]} records were kept)\n')
+
+    out.write('\nTop opcodes:\n')
+    for opcode, count in opcode_counts.most_common(top):
+        out.write(f'  {opcode:<11} {count:>12} {count / steps * 100:6.2f}%\n')
+
+    out.write('\nTop instructions:\n')
+    for order, count in order_counts.most_common(top):
+        out.write(f'  order {order:<6} {count:>12} {count / steps * 100:6.2f}%\n')
+
+    # a loop is a taken backward jump, its body are all orders between the target and the jump
+    loops = []
+    for (target, source), iterations in back_edges.items():
+        body_steps = sum(count for order, count in order_counts.items() if target <= order <= source)
+        label = reader.labels.get(target, f'order {target}')
+        loops.append((body_steps, iterations, label, target, source))
+    loops.sort(reverse=True)
+    out.write('\nTop loops:\n')
+    for body_steps, iterations, label, target, source in loops[:top]:
+        out.write(f'  {label:<20} orders {target}-{source}  iterations {iterations:>10}'
+                  f'  steps {body_steps:>12} {body_steps / steps * 100:6.2f}%\n')
+
+    out.write('\nTop called labels:\n')
+    for target, count in calls.most_common(top):
+        out.write(f'  {reader.labels.get(target, f"order {target}"):<20} calls {count:>10}\n')
+
+
+def parse_input_arguments():
+    """Parses and checks input arguments, returns them as a dictionary"""
+    parser = argparse.ArgumentParser(description='Decodes interpret.py execution traces.')
+    parser.add_argument('trace', help='trace file written by interpret.py --trace')
+    parser.add_argument('--summary', action='store_true', help='print hot path summary instead of all steps')
+    parser.add_argument('--top', type=int, default=10, help='number of summary entries, defaults to 10')
+    try:
+        arguments = vars(parser.parse_args())
+    except SystemExit as e:
+        if e.code:
+            handle_error(ERROR_PARAMS)
+        raise
+    if arguments['top'] < 1:
+        handle_error(ERROR_PARAMS)
+    return arguments
+
+
+def main():
+    arguments = parse_input_arguments()
+    try:
+        file = open(arguments['trace'], 'rb')
+    except IOError:
+        handle_error(ERROR_FILE)
+    with file:
+        reader = TraceReader(file)
+        try:
+            if arguments['summary']:
+                print_summary(reader, arguments['top'], sys.stdout)
+            else:
+                print_text(reader, sys.stdout)
+        except BrokenPipeError:
+            sys.stderr.close()
+
+
+if __name__ == '__main__':
+    main()